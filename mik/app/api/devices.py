@@ -1,16 +1,21 @@
-from flask import Blueprint, request, jsonify, render_template
+from flask import Blueprint, request, jsonify, render_template, Response, stream_with_context, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 import logging
 import re
+import json
+import time
 from mik.app.database.crud import (
     get_all_devices, 
     get_device_by_id, 
     create_device, 
     update_device,
-    delete_device
+    delete_device,
+    get_network_scan,
+    get_network_scans,
+    get_scan_results
 )
 from mik.app.core.mikrotik import connect_to_device, get_device_metrics, backup_config
-from mik.app.core.discovery import scan_network
+from mik.app.core.scan_jobs import scan_jobs
 from mik.app.utils.network import validate_ip_address, validate_subnet
 from mik.app.utils.security import sanitize_input
 
@@ -225,10 +230,10 @@ def backup_device_config(device_id):
         logger.error(f"Error backing up device configuration: {str(e)}")
         return jsonify({"error": f"Error backing up device configuration: {str(e)}"}), 500
 
-@devices_bp.route('/scan', methods=['POST'])
+@devices_bp.route('/scan', methods=['POST'], strict_slashes=False)
 @jwt_required()
 def scan_for_devices():
-    """Scan network for MikroTik devices"""
+    """Start a background scan of a network for MikroTik devices"""
     data = request.json
     
     # Validate subnet
@@ -240,35 +245,127 @@ def scan_for_devices():
     if not validate_subnet(subnet):
         return jsonify({"error": "Invalid subnet format. Use CIDR notation (e.g., 192.168.1.0/24)"}), 400
     
+    from mik.app.config import Config
+    max_addresses = getattr(Config, 'DISCOVERY_MAX_ADDRESSES', 65536)
+    max_concurrency = getattr(Config, 'DISCOVERY_CONCURRENCY', 1024)
+    
     # Validate subnet size for security (prevent scanning large networks)
     try:
         import ipaddress
         network = ipaddress.IPv4Network(subnet, strict=False)
-        if network.num_addresses > 256:  # Limit to /24 or smaller
-            return jsonify({"error": "Subnet too large. Please use a /24 or smaller subnet"}), 400
+        if network.num_addresses > max_addresses:
+            return jsonify({"error": f"Subnet too large. At most {max_addresses} addresses can be scanned"}), 400
     except Exception as e:
         logger.error(f"Error validating subnet: {str(e)}")
         return jsonify({"error": "Invalid subnet format"}), 400
     
-    # Optional parameters validation
-    max_workers = data.get('max_workers', 10)
-    if not isinstance(max_workers, int) or max_workers < 1 or max_workers > 50:
-        return jsonify({"error": "max_workers must be an integer between 1 and 50"}), 400
+    # Optional parameters validation; max_workers limits the probe connections in flight
+    max_workers = data.get('max_workers', max_concurrency)
+    if not isinstance(max_workers, int) or max_workers < 1 or max_workers > max_concurrency:
+        return jsonify({"error": f"max_workers must be an integer between 1 and {max_concurrency}"}), 400
     
     timeout = data.get('timeout', 2)
     if not isinstance(timeout, (int, float)) or timeout < 0.5 or timeout > 10:
         return jsonify({"error": "timeout must be a number between 0.5 and 10 seconds"}), 400
     
+    skip_known = data.get('skip_known', False)
+    if not isinstance(skip_known, bool):
+        return jsonify({"error": "skip_known must be a boolean"}), 400
+    
     try:
         current_user = get_jwt_identity()
-        logger.info(f"Network scan initiated by {current_user} for subnet {subnet}")
+        job = scan_jobs.start(current_app._get_current_object(), subnet, concurrency=max_workers,
+                              timeout=timeout, skip_known=skip_known, requested_by=str(current_user))
+        if job is None:
+            return jsonify({"error": "Too many network scans are running. Please try again later"}), 429
         
-        devices = scan_network(subnet, max_workers=max_workers)
-        return jsonify({"devices": devices})
+        logger.info(f"Network scan {job.id} initiated by {current_user} for subnet {subnet}")
+        return jsonify(job.progress()), 202
     except Exception as e:
         logger.error(f"Error scanning network: {str(e)}")
         return jsonify({"error": f"Error scanning network: {str(e)}"}), 500
 
+@devices_bp.route('/scan', methods=['GET'], strict_slashes=False)
+@jwt_required()
+def get_scans():
+    """Get the most recent network scans"""
+    limit = request.args.get('limit', 20, type=int)
+    if limit < 1 or limit > 100:
+        return jsonify({"error": "Limit parameter must be between 1 and 100"}), 400
+    
+    scan_jobs.fail_orphans()
+    return jsonify([scan.to_dict() for scan in get_network_scans(limit)])
+
+@devices_bp.route('/scan/<job_id>', methods=['GET'], strict_slashes=False)
+@jwt_required()
+def get_scan(job_id):
+    """Get the progress of a network scan and the devices found from `offset` on"""
+    offset = request.args.get('offset', 0, type=int)
+    if offset < 0:
+        return jsonify({"error": "Offset parameter must not be negative"}), 400
+    
+    job = scan_jobs.get(job_id)
+    if job is not None:
+        with job.changed:
+            result = job.progress()
+            result["devices"] = job.devices[offset:]
+        return jsonify(result)
+    
+    # Scans of other workers, or finished a while ago, are read from the database
+    scan = get_network_scan(job_id)
+    if not scan:
+        return jsonify({"error": "Scan not found"}), 404
+    if scan.status == 'running' and scan_jobs.fail_orphans():
+        # The process running it stopped; report the scan as failed
+        scan = get_network_scan(job_id)
+    
+    result = scan.to_dict()
+    result["devices"] = [device.to_dict() for device in get_scan_results(job_id, offset=offset)]
+    return jsonify(result)
+
+@devices_bp.route('/scan/<job_id>/stream', methods=['GET'], strict_slashes=False)
+@jwt_required()
+def stream_scan(job_id):
+    """Stream a running scan as NDJSON: found devices, progress and the final state"""
+    job = scan_jobs.get(job_id)
+    if job is None:
+        if get_network_scan(job_id):
+            return jsonify({"error": "Scan is not running in this worker. Use GET /scan/<job_id>"}), 409
+        return jsonify({"error": "Scan not found"}), 404
+    
+    seen = request.args.get('offset', 0, type=int)
+    
+    def generate():
+        nonlocal seen
+        last_progress = 0
+        while True:
+            devices, progress = job.wait(seen, timeout=1)
+            seen += len(devices)
+            for device in devices:
+                yield json.dumps({"type": "device", "device": device}) + "\n"
+            if progress["status"] != 'running':
+                yield json.dumps({"type": "finished", "scan": progress}) + "\n"
+                return
+            # Progress at most once a second however fast devices are found
+            now = time.monotonic()
+            if now - last_progress >= 1:
+                last_progress = now
+                yield json.dumps({"type": "progress", "scan": progress}) + "\n"
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@devices_bp.route('/scan/<job_id>/cancel', methods=['POST'], strict_slashes=False)
+@jwt_required()
+def cancel_scan(job_id):
+    """Stop a running network scan; devices found so far are kept"""
+    if not scan_jobs.cancel(job_id):
+        if scan_jobs.get(job_id) or get_network_scan(job_id):
+            return jsonify({"error": "Scan is not running"}), 409
+        return jsonify({"error": "Scan not found"}), 404
+    
+    logger.info(f"Network scan {job_id} cancelled by {get_jwt_identity()}")
+    return jsonify({"message": "Scan cancellation requested"})
+
 @devices_bp.route('/<int:device_id>/command', methods=['POST'])
 @jwt_required()
 def send_command(device_id):
@@ -1,19 +1,32 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
+import json
 import logging
 from datetime import datetime, timedelta
 from mik.app.database.crud import (
     get_device_by_id,
     get_all_devices,
     get_metrics_for_device,
+    get_interface_series,
+    get_client_events,
     get_recent_alerts,
     create_alert_rule,
     get_alert_rules,
     update_alert_rule,
-    delete_alert_rule
+    delete_alert_rule,
+    INTERFACE_SAMPLE_FIELDS
 )
 from mik.app.core.mikrotik import get_device_metrics, get_device_clients, get_interface_traffic
-from mik.app.utils.time_series import get_time_series_data
+from mik.app.core.metrics_store import latest_metrics
+from mik.app.core.client_tables import (
+    open_client_table,
+    page_rows,
+    decode_cursor,
+    CLIENT_TABLE_SOURCES,
+    FILTER_FIELDS,
+    SORT_FIELDS
+)
+from mik.app.utils.time_series import get_time_series_data, get_interface_time_series, DOWNSAMPLE_METHODS
 
 # Configure logger
 logger = logging.getLogger(__name__)
@@ -52,18 +65,84 @@ def get_metrics_history(device_id):
     if hours < 1 or hours > 168:  # Max 7 days
         return jsonify({"error": "Hours parameter must be between 1 and 168"}), 400
     
+    # Optional downsampling so payload size doesn't grow with the time range
+    max_points = request.args.get('max_points', type=int)
+    if max_points is not None and (max_points < 10 or max_points > 5000):
+        return jsonify({"error": "max_points parameter must be between 10 and 5000"}), 400
+    
+    downsample = request.args.get('downsample', 'lttb')
+    if downsample not in DOWNSAMPLE_METHODS:
+        return jsonify({"error": f"Invalid downsample method. Must be one of: {', '.join(DOWNSAMPLE_METHODS)}"}), 400
+    
     # Define time range
     end_time = datetime.now()
     start_time = end_time - timedelta(hours=hours)
     
     try:
         # Get time series data
-        data = get_time_series_data(device_id, metric, start_time, end_time)
+        data = get_time_series_data(device_id, metric, start_time, end_time,
+                                    max_points=max_points, downsample=downsample)
         return jsonify(data)
     except Exception as e:
         logger.error(f"Error getting metrics history: {str(e)}")
         return jsonify({"error": f"Error getting metrics history: {str(e)}"}), 500
 
+@monitoring_bp.route('/interfaces/<int:device_id>', methods=['GET'])
+@jwt_required()
+def get_interface_series_route(device_id):
+    """Get the interfaces of a device with recorded traffic history"""
+    device = get_device_by_id(device_id)
+    if not device:
+        return jsonify({"error": "Device not found"}), 404
+    
+    try:
+        return jsonify([series.to_dict() for series in get_interface_series(device_id)])
+    except Exception as e:
+        logger.error(f"Error getting interface series: {str(e)}")
+        return jsonify({"error": f"Error getting interface series: {str(e)}"}), 500
+
+@monitoring_bp.route('/interfaces/<int:device_id>/history', methods=['GET'])
+@jwt_required()
+def get_interface_history(device_id):
+    """Get recorded traffic history of one interface"""
+    device = get_device_by_id(device_id)
+    if not device:
+        return jsonify({"error": "Device not found"}), 404
+    
+    interface = request.args.get('interface')
+    if not interface:
+        return jsonify({"error": "Interface parameter is required"}), 400
+    
+    field = request.args.get('metric', 'rx_bps')
+    if field not in INTERFACE_SAMPLE_FIELDS:
+        return jsonify({"error": f"Invalid metric. Must be one of: {', '.join(INTERFACE_SAMPLE_FIELDS)}"}), 400
+    
+    hours = int(request.args.get('hours', 24))
+    
+    # Validate hours parameter
+    if hours < 1 or hours > 168:  # Max 7 days
+        return jsonify({"error": "Hours parameter must be between 1 and 168"}), 400
+    
+    max_points = request.args.get('max_points', type=int)
+    if max_points is not None and (max_points < 10 or max_points > 5000):
+        return jsonify({"error": "max_points parameter must be between 10 and 5000"}), 400
+    
+    downsample = request.args.get('downsample', 'lttb')
+    if downsample not in DOWNSAMPLE_METHODS:
+        return jsonify({"error": f"Invalid downsample method. Must be one of: {', '.join(DOWNSAMPLE_METHODS)}"}), 400
+    
+    # Interface samples are stored with UTC timestamps
+    end_time = datetime.utcnow()
+    start_time = end_time - timedelta(hours=hours)
+    
+    try:
+        data = get_interface_time_series(device_id, interface, field, start_time, end_time,
+                                         max_points=max_points, downsample=downsample)
+        return jsonify(data)
+    except Exception as e:
+        logger.error(f"Error getting interface history: {str(e)}")
+        return jsonify({"error": f"Error getting interface history: {str(e)}"}), 500
+
 @monitoring_bp.route('/clients/<int:device_id>', methods=['GET'])
 @jwt_required()
 def get_clients_route(device_id):
@@ -79,6 +158,118 @@ def get_clients_route(device_id):
         logger.error(f"Error getting device clients: {str(e)}")
         return jsonify({"error": f"Error getting device clients: {str(e)}"}), 500
 
+@monitoring_bp.route('/clients/<int:device_id>/<table>', methods=['GET'])
+@jwt_required()
+def get_client_table_route(device_id, table):
+    """Get one page of a DHCP lease or registration table, or stream all of it
+
+    Exact-match filters (e.g. ?status=bound) are evaluated by the router, the
+    free-text ?q= filter while streaming. Only one page is held in memory.
+    With format=ndjson rows are written as they are read; limit=0 then streams
+    the whole table unsorted.
+    """
+    device = get_device_by_id(device_id)
+    if not device:
+        return jsonify({"error": "Device not found"}), 404
+    
+    if table not in CLIENT_TABLE_SOURCES:
+        return jsonify({"error": f"Invalid table. Must be one of: {', '.join(CLIENT_TABLE_SOURCES)}"}), 400
+    
+    output = request.args.get('format', 'json')
+    if output not in ('json', 'ndjson'):
+        return jsonify({"error": "Format must be json or ndjson"}), 400
+    
+    limit = request.args.get('limit', 100, type=int)
+    if limit > 1000 or limit < (0 if output == 'ndjson' else 1):
+        return jsonify({"error": "Limit parameter must be between 1 and 1000 (0 streams everything as ndjson)"}), 400
+    
+    sort = request.args.get('sort', 'mac_address')
+    if sort not in SORT_FIELDS:
+        return jsonify({"error": f"Invalid sort field. Must be one of: {', '.join(SORT_FIELDS)}"}), 400
+    
+    order = request.args.get('order', 'asc')
+    if order not in ('asc', 'desc'):
+        return jsonify({"error": "Order must be asc or desc"}), 400
+    
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            decode_cursor(cursor, sort)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+    
+    filters = {field: request.args[field] for field in FILTER_FIELDS if request.args.get(field)}
+    
+    try:
+        stream = open_client_table(device, table, filters=filters, search=request.args.get('q'))
+    except Exception as e:
+        logger.error(f"Error reading client table: {str(e)}")
+        return jsonify({"error": f"Error reading client table: {str(e)}"}), 500
+    if stream is None:
+        return jsonify({"error": "Could not connect to device"}), 502
+    
+    if output == 'json':
+        try:
+            with stream:
+                items, next_cursor = page_rows(stream, sort=sort, descending=order == 'desc',
+                                               limit=limit, cursor=cursor)
+            return jsonify({"items": items, "next_cursor": next_cursor, "limit": limit})
+        except Exception as e:
+            logger.error(f"Error reading client table: {str(e)}")
+            return jsonify({"error": f"Error reading client table: {str(e)}"}), 500
+    
+    def generate():
+        try:
+            if limit:
+                items, next_cursor = page_rows(stream, sort=sort, descending=order == 'desc',
+                                               limit=limit, cursor=cursor)
+                stream.close()
+                for item in items:
+                    yield json.dumps(item) + "\n"
+                yield json.dumps({"next_cursor": next_cursor}) + "\n"
+            else:
+                for item in stream:
+                    yield json.dumps(item) + "\n"
+        except Exception as e:
+            # Headers are already sent; report the failure as the last line
+            logger.error(f"Error streaming client table: {str(e)}")
+            yield json.dumps({"error": f"Error reading client table: {str(e)}"}) + "\n"
+    
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    response.call_on_close(stream.close)
+    return response
+
+@monitoring_bp.route('/client-events/<int:device_id>', methods=['GET'])
+@jwt_required()
+def get_client_events_route(device_id):
+    """Get client join/leave/change history of a device, newest first"""
+    device = get_device_by_id(device_id)
+    if not device:
+        return jsonify({"error": "Device not found"}), 404
+    
+    event = request.args.get('event')
+    if event and event not in ('join', 'leave', 'change'):
+        return jsonify({"error": "Event must be join, leave or change"}), 400
+    
+    hours = int(request.args.get('hours', 24))
+    if hours < 1 or hours > 720:  # Max 30 days
+        return jsonify({"error": "Hours parameter must be between 1 and 720"}), 400
+    
+    limit = request.args.get('limit', 100, type=int)
+    if limit < 1 or limit > 1000:
+        return jsonify({"error": "Limit parameter must be between 1 and 1000"}), 400
+    
+    # Client events are stored with UTC timestamps
+    start_time = datetime.utcnow() - timedelta(hours=hours)
+    
+    try:
+        events = get_client_events(device_id, mac_address=request.args.get('mac'), event=event,
+                                   start_time=start_time, limit=limit)
+        return jsonify([client_event.to_dict() for client_event in events])
+    except Exception as e:
+        logger.error(f"Error getting client events: {str(e)}")
+        return jsonify({"error": f"Error getting client events: {str(e)}"}), 500
+
 @monitoring_bp.route('/traffic/<int:device_id>', methods=['GET'])
 @jwt_required()
 def get_traffic_route(device_id):
@@ -102,45 +293,44 @@ def get_traffic_route(device_id):
 @jwt_required()
 def get_dashboard_metrics():
     """Get summary metrics for dashboard"""
+    from mik.app.config import Config
+    
     try:
         devices = get_all_devices()
         summary = {
             "total_devices": len(devices),
             "online_devices": 0,
             "device_status": [],
-            "recent_alerts": []
+            "recent_alerts": [],
+            "generated_at": datetime.utcnow().isoformat()
         }
         
-        # Check status of each device
+        # Served from the collector's latest samples; no RouterOS calls here
+        samples = latest_metrics.snapshot()
+        stale_after = 2 * Config.MONITORING_INTERVAL
+        
         for device in devices:
-            try:
-                metrics = get_device_metrics(device)
-                online = metrics.get('online', False)
-                
-                device_status = {
-                    "id": device.id,
-                    "name": device.name,
-                    "online": online,
-                    "cpu_load": metrics.get('cpu_load', 0) if online else 0,
-                    "memory_usage": metrics.get('memory_usage', 0) if online else 0,
-                    "uptime": metrics.get('uptime', '') if online else ''
-                }
-                
-                summary["device_status"].append(device_status)
-                
-                if online:
-                    summary["online_devices"] += 1
-            except Exception as e:
-                logger.error(f"Error getting metrics for device {device.id}: {str(e)}")
-                device_status = {
-                    "id": device.id,
-                    "name": device.name,
-                    "online": False,
-                    "cpu_load": 0,
-                    "memory_usage": 0,
-                    "uptime": ''
-                }
-                summary["device_status"].append(device_status)
+            sample = samples.get(device.id)
+            metrics = sample.metrics if sample else {}
+            online = bool(metrics.get('online', False))
+            age = sample.age() if sample else None
+            
+            device_status = {
+                "id": device.id,
+                "name": device.name,
+                "online": online,
+                "cpu_load": metrics.get('cpu_load', 0) if online else 0,
+                "memory_usage": metrics.get('memory_usage', 0) if online else 0,
+                "uptime": metrics.get('uptime', '') if online else '',
+                "updated_at": sample.updated_at.isoformat() if sample else None,
+                "age_seconds": round(age, 1) if age is not None else None,
+                "stale": age is None or age > stale_after
+            }
+            
+            summary["device_status"].append(device_status)
+            
+            if online:
+                summary["online_devices"] += 1
         
         # Get recent alerts
         alerts = get_recent_alerts(limit=5)
@@ -1,9 +1,8 @@
-from flask import Blueprint, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import jwt_required
 import logging
-from mik.app.database.crud import get_all_devices, get_device_by_id
-from mik.app.core.discovery import discover_topology
-from mik.app.utils.network import validate_subnet
+from mik.app.database.crud import get_device_by_id
+from mik.app.core.topology import topology_graph
 import traceback
 
 # Configure logger
@@ -15,43 +14,24 @@ topology_bp = Blueprint('topology_bp', __name__, url_prefix='/api/topology')
 @topology_bp.route('/map', methods=['GET'])
 @jwt_required()
 def get_network_map():
-    """Get network topology map data"""
+    """Get network topology map data
+    
+    The graph is maintained in the background. Pass the graph_id and version
+    of a previous response as ?graph_id=...&since=... to get only the changes;
+    the full map is returned when the changes are no longer available.
+    """
+    since = request.args.get('since', type=int)
+    graph_id = request.args.get('graph_id')
+    
     try:
-        # Get all devices
-        devices = get_all_devices()
-        device_list = [device.to_dict() for device in devices]
-        
-        # Discover topology
-        topology_data = discover_topology(devices)
-        
-        # Format response
-        response = {
-            "nodes": [],
-            "links": []
-        }
+        topology_graph.sync()
         
-        # Add nodes (devices)
-        for device in device_list:
-            node = {
-                "id": device["id"],
-                "name": device["name"],
-                "ip_address": device["ip_address"],
-                "type": "router",
-                "model": device.get("model", "Unknown"),
-                "group": 1  # Default group
-            }
-            response["nodes"].append(node)
+        if since is not None:
+            changes = topology_graph.changes_since(since, graph_id)
+            if changes is not None:
+                return jsonify(changes)
         
-        # Add links from topology data
-        for link in topology_data:
-            response["links"].append({
-                "source": link["source_id"],
-                "target": link["target_id"],
-                "value": link.get("bandwidth", 1),  # Link thickness based on bandwidth
-                "interface_name": link.get("interface_name", "")
-            })
-        
-        return jsonify(response)
+        return jsonify(topology_graph.snapshot())
     
     except Exception as e:
         logger.error(f"Error generating network map: {str(e)}")
@@ -68,41 +48,10 @@ def get_device_neighbors(device_id):
         if not device:
             return jsonify({"error": "Device not found"}), 404
         
-        # Get all devices
-        all_devices = get_all_devices()
-        
-        # Discover topology focusing on this device
-        topology_data = discover_topology([device], all_devices)
-        
-        # Format response to include device details
-        neighbors = []
-        for link in topology_data:
-            # If this device is the source
-            if link["source_id"] == device_id:
-                target_device = get_device_by_id(link["target_id"])
-                if target_device:
-                    neighbors.append({
-                        "device_id": target_device.id,
-                        "name": target_device.name,
-                        "ip_address": target_device.ip_address,
-                        "interface": link.get("source_interface", ""),
-                        "remote_interface": link.get("target_interface", "")
-                    })
-            # If this device is the target
-            elif link["target_id"] == device_id:
-                source_device = get_device_by_id(link["source_id"])
-                if source_device:
-                    neighbors.append({
-                        "device_id": source_device.id,
-                        "name": source_device.name,
-                        "ip_address": source_device.ip_address,
-                        "interface": link.get("target_interface", ""),
-                        "remote_interface": link.get("source_interface", "")
-                    })
-        
-        return jsonify(neighbors)
+        topology_graph.sync()
+        return jsonify(topology_graph.neighbors(device_id))
     
     except Exception as e:
         logger.error(f"Error getting device neighbors: {str(e)}")
         logger.error(traceback.format_exc())
-        return jsonify({"error": f"Error getting device neighbors: {str(e)}"}), 500
\ No newline at end of file
+        return jsonify({"error": f"Error getting device neighbors: {str(e)}"}), 500
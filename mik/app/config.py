@@ -53,11 +53,60 @@ class Config:
     # Monitoring configuration
     MONITORING_INTERVAL = 60  # seconds
     ALERT_CHECK_INTERVAL = 30  # seconds
+    ALERT_RULE_INDEX_REFRESH = int(os.environ.get("ALERT_RULE_INDEX_REFRESH", "300"))  # seconds between full rule reloads
+    MONITORING_MAX_WORKERS = int(os.environ.get("MONITORING_MAX_WORKERS", "32"))
+    MONITORING_CYCLE_DEADLINE = int(os.environ.get("MONITORING_CYCLE_DEADLINE", "50"))  # seconds, below MONITORING_INTERVAL
+    LIVE_TABLE_INTERVAL = int(os.environ.get("LIVE_TABLE_INTERVAL", "10"))  # seconds between live interface/client table polls
+    CLIENT_TRACKING = os.environ.get("CLIENT_TRACKING", "1") == "1"
+    CLIENT_TRACKING_INTERVAL = int(os.environ.get("CLIENT_TRACKING_INTERVAL", "60"))  # seconds between client join/leave polls
+    
+    # Metrics history rollups (bucket width in seconds -> retention in days)
+    ROLLUP_RETENTION_DAYS = {
+        60: 7,
+        300: 30,
+        3600: 365,
+        86400: 1825
+    }
+    ROLLUP_RESOLUTIONS = tuple(sorted(ROLLUP_RETENTION_DAYS))
+    HISTORY_MAX_POINTS = int(os.environ.get("HISTORY_MAX_POINTS", "1000"))
     
     # MikroTik API configuration
     MIKROTIK_CONNECTION_TIMEOUT = int(os.environ.get("MIKROTIK_CONNECTION_TIMEOUT", "10"))
     MIKROTIK_COMMAND_TIMEOUT = int(os.environ.get("MIKROTIK_COMMAND_TIMEOUT", "15"))
+    MIKROTIK_STATIC_INFO_TTL = int(os.environ.get("MIKROTIK_STATIC_INFO_TTL", "3600"))  # seconds identity/board/version are cached
     
+    # Interface traffic collection and rates from counter deltas
+    INTERFACE_RATE_MAX_BPS = int(os.environ.get("INTERFACE_RATE_MAX_BPS", str(400 * 10 ** 9)))  # higher deltas are counter resets
+    INTERFACE_COUNTER_BITS = int(os.environ.get("INTERFACE_COUNTER_BITS", "64"))  # 32 only for counters known to wrap at 2**32
+    INTERFACE_TRAFFIC_COLLECTION = os.environ.get("INTERFACE_TRAFFIC_COLLECTION", "1") == "1"
+    INTERFACE_TRAFFIC_TYPES = os.environ.get("INTERFACE_TRAFFIC_TYPES", "ether,wlan,bridge,vlan,bonding,pppoe-out").split(",")
+    INTERFACE_COUNTER_MAX_AGE = int(os.environ.get("INTERFACE_COUNTER_MAX_AGE", "3600"))  # seconds before an unseen interface is forgotten
+
+    # Network discovery scans
+    DISCOVERY_CONCURRENCY = int(os.environ.get("DISCOVERY_CONCURRENCY", "1024"))  # probe connections in flight
+    DISCOVERY_MAX_ADDRESSES = int(os.environ.get("DISCOVERY_MAX_ADDRESSES", "65536"))  # largest scannable subnet (/16)
+    DISCOVERY_MAX_JOBS = int(os.environ.get("DISCOVERY_MAX_JOBS", "2"))  # scans running at once
+    DISCOVERY_KNOWN_TTL = int(os.environ.get("DISCOVERY_KNOWN_TTL", "86400"))  # seconds a found host counts as known
+    DISCOVERY_FLUSH_INTERVAL = int(os.environ.get("DISCOVERY_FLUSH_INTERVAL", "2"))  # seconds between result writes
+    DISCOVERY_JOB_RETENTION = int(os.environ.get("DISCOVERY_JOB_RETENTION", "3600"))  # seconds finished jobs stay in memory
+    DISCOVERY_ORPHAN_TIMEOUT = int(os.environ.get("DISCOVERY_ORPHAN_TIMEOUT", "60"))  # seconds without progress writes before a running scan counts as interrupted
+
+    # Topology graph
+    TOPOLOGY_REFRESH_INTERVAL = int(os.environ.get("TOPOLOGY_REFRESH_INTERVAL", "900"))  # seconds between refreshes of one device
+    TOPOLOGY_RETRY_INTERVAL = int(os.environ.get("TOPOLOGY_RETRY_INTERVAL", "60"))  # first retry after a failed refresh
+    TOPOLOGY_CHECK_INTERVAL = int(os.environ.get("TOPOLOGY_CHECK_INTERVAL", "30"))  # seconds between checks for due devices
+    TOPOLOGY_SYNC_INTERVAL = int(os.environ.get("TOPOLOGY_SYNC_INTERVAL", "5"))  # seconds readers reuse the in-memory graph
+    TOPOLOGY_MAX_WORKERS = int(os.environ.get("TOPOLOGY_MAX_WORKERS", "8"))
+    TOPOLOGY_MAX_GATEWAY_CHECKS = int(os.environ.get("TOPOLOGY_MAX_GATEWAY_CHECKS", "64"))  # route counts per device refresh
+    TOPOLOGY_CHANGELOG_SIZE = int(os.environ.get("TOPOLOGY_CHANGELOG_SIZE", "1000"))  # graph changes kept for deltas
+
+    # MikroTik API connection pool
+    MIKROTIK_POOL_MAX_PER_DEVICE = int(os.environ.get("MIKROTIK_POOL_MAX_PER_DEVICE", "2"))
+    MIKROTIK_POOL_MAX_TOTAL = int(os.environ.get("MIKROTIK_POOL_MAX_TOTAL", "1000"))
+    MIKROTIK_POOL_IDLE_TIMEOUT = int(os.environ.get("MIKROTIK_POOL_IDLE_TIMEOUT", "300"))  # seconds
+    MIKROTIK_POOL_HEALTH_CHECK_INTERVAL = int(os.environ.get("MIKROTIK_POOL_HEALTH_CHECK_INTERVAL", "30"))  # seconds
+    MIKROTIK_POOL_ACQUIRE_TIMEOUT = int(os.environ.get("MIKROTIK_POOL_ACQUIRE_TIMEOUT", "30"))  # seconds
+
     # Email configuration
     MAIL_SERVER = os.environ.get("MAIL_SERVER")
     MAIL_PORT = int(os.environ.get("MAIL_PORT", 587))
@@ -69,3 +118,17 @@ class Config:
     # Telegram configuration
     TELEGRAM_BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN")
     TELEGRAM_CHAT_ID = os.environ.get("TELEGRAM_CHAT_ID")
+    
+    # Alert notification delivery
+    NOTIFY_QUEUE_SIZE = int(os.environ.get("NOTIFY_QUEUE_SIZE", "1000"))
+    NOTIFY_RATE_LIMITS = {  # messages per minute per channel, 0 for no limit
+        "email": int(os.environ.get("NOTIFY_EMAIL_RATE", "30")),
+        "telegram": int(os.environ.get("NOTIFY_TELEGRAM_RATE", "20"))
+    }
+    NOTIFY_RATE_BURST = int(os.environ.get("NOTIFY_RATE_BURST", "5"))
+    NOTIFY_MAX_RETRIES = int(os.environ.get("NOTIFY_MAX_RETRIES", "5"))
+    NOTIFY_RETRY_BACKOFF = int(os.environ.get("NOTIFY_RETRY_BACKOFF", "2"))  # seconds, doubled per attempt
+    NOTIFY_DIGEST_MAX = int(os.environ.get("NOTIFY_DIGEST_MAX", "50"))  # alerts per digest message
+    NOTIFY_SMTP_TIMEOUT = int(os.environ.get("NOTIFY_SMTP_TIMEOUT", "15"))  # seconds
+    NOTIFY_SMTP_IDLE_TIMEOUT = int(os.environ.get("NOTIFY_SMTP_IDLE_TIMEOUT", "60"))  # seconds
+    NOTIFY_HTTP_TIMEOUT = int(os.environ.get("NOTIFY_HTTP_TIMEOUT", "10"))  # seconds
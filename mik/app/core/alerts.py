@@ -1,98 +1,187 @@
 import logging
-import smtplib
-import requests
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import threading
+from collections import deque
 from datetime import datetime
 from app.database.crud import (
-    get_all_alert_rules,
-    create_alert,
     get_device_by_id,
+    create_alert,
+    get_open_alert,
+    resolve_alert,
     get_settings
 )
-from app.core.mikrotik import get_device_metrics
+from mik.app.core.metrics_store import latest_metrics
+from app.core.rule_index import alert_rule_index
+from app.core.notifications import Notification, get_notification_dispatcher
 
 # Configure logger
 logger = logging.getLogger(__name__)
 
-def check_alerts():
-    """Check all alert rules and trigger alerts if needed"""
+# Sequence number of the last sample evaluated per device
+_evaluated_seq = {}
+
+# Serialises evaluation between the collector hook and the periodic task
+_evaluation_lock = threading.Lock()
+
+class RuleState:
+    """Sliding window and firing state of one alert rule on one device
+    
+    Samples are kept in a ring buffer covering the rule duration and the
+    window sum is updated incrementally as samples enter and leave.
+    """
+    __slots__ = ('samples', 'total', 'first_seen', 'firing', 'alert_id')
+    
+    def __init__(self):
+        self.samples = deque()
+        self.total = 0.0
+        self.first_seen = None
+        self.firing = False
+        self.alert_id = None
+    
+    def add(self, when, value, duration):
+        """Add a sample taken at monotonic time `when` and return the window average"""
+        if self.first_seen is None:
+            self.first_seen = when
+        
+        self.samples.append((when, value))
+        self.total += value
+        
+        # A zero duration keeps only the latest sample
+        cutoff = when - duration
+        while len(self.samples) > 1 and self.samples[0][0] <= cutoff:
+            _, old_value = self.samples.popleft()
+            self.total -= old_value
+        
+        return self.total / len(self.samples)
+    
+    def window_complete(self, duration):
+        """Whether enough history has been seen to judge the whole duration"""
+        return self.samples[-1][0] - self.first_seen >= duration
+
+# (rule_id, device_id) -> RuleState
+_rule_states = {}
+
+def _get_rule_state(rule, device_id):
+    """Get the evaluation state of a rule, restoring firing state from open alerts"""
+    key = (rule.id, device_id)
+    state = _rule_states.get(key)
+    if state is None:
+        state = RuleState()
+        open_alert = get_open_alert(rule.id, device_id)
+        if open_alert:
+            state.firing = True
+            state.alert_id = open_alert.id
+        _rule_states[key] = state
+    return state
+
+def check_alerts(samples=None):
+    """Check enabled alert rules against the latest collected samples
+    
+    Rules are evaluated against the samples the metrics collector already
+    gathered, so alerting makes no RouterOS calls of its own. Each sample is
+    evaluated once, whether it arrives through the collector hook or the
+    periodic alert task.
+    
+    Args:
+        samples (dict, optional): device_id -> MetricSample. Defaults to the
+            contents of the latest metrics store.
+    """
+    if samples is None:
+        samples = latest_metrics.snapshot()
+    
+    with _evaluation_lock:
+        _evaluate_samples(samples)
+
+def _evaluate_samples(samples):
+    """Evaluate rules for samples not seen before (caller holds _evaluation_lock)"""
     try:
-        # Get all enabled alert rules
-        rules = get_all_alert_rules(enabled_only=True)
-        
-        # Get application settings
-        settings = get_settings()
-        
-        for rule in rules:
-            try:
-                # Skip rules for non-existent devices
-                device = get_device_by_id(rule.device_id)
-                if not device:
-                    logger.warning(f"Alert rule {rule.id} references non-existent device {rule.device_id}")
-                    continue
-                
-                # Get current metrics
-                metrics = get_device_metrics(device)
-                
-                # Skip offline devices
-                if not metrics.get('online', False):
-                    logger.debug(f"Device {device.name} is offline, skipping alert check")
-                    continue
-                
-                # Get metric value based on rule
-                metric_value = None
-                
-                if rule.metric == 'cpu_load':
-                    metric_value = metrics.get('cpu_load', 0)
-                elif rule.metric == 'memory_usage':
-                    metric_value = metrics.get('memory_usage', 0)
-                elif rule.metric == 'disk_usage':
-                    metric_value = metrics.get('disk_usage', 0)
-                # Add more metrics as needed
-                
+        # Only consider samples that have not been evaluated yet
+        pending = {
+            device_id: sample for device_id, sample in samples.items()
+            if sample.seq > _evaluated_seq.get(device_id, 0)
+        }
+        for device_id, sample in pending.items():
+            _evaluated_seq[device_id] = sample.seq
+        
+        if not pending:
+            return
+        
+        # Pick up rule changes; windows of changed, deleted or disabled rules start over
+        changed = alert_rule_index.refresh()
+        if changed:
+            for key in [key for key in _rule_states if key[0] in changed]:
+                del _rule_states[key]
+        
+        settings = None
+        
+        for device_id, sample in pending.items():
+            # Only the rules bound to this device are looked at
+            rules_by_metric = alert_rule_index.rules_for(device_id)
+            if not rules_by_metric:
+                continue
+            
+            # Skip offline devices
+            if not sample.online:
+                logger.debug(f"Device {device_id} is offline, skipping alert check")
+                continue
+            
+            for metric, rules in rules_by_metric.items():
+                metric_value = sample.metrics.get(metric)
                 if metric_value is None:
-                    logger.warning(f"Metric {rule.metric} not available for device {device.name}")
+                    logger.debug(f"Metric {metric} not available for device {device_id}")
                     continue
                 
-                # Check threshold condition
-                alert_triggered = False
-                
-                if rule.condition == '>':
-                    alert_triggered = metric_value > rule.threshold
-                elif rule.condition == '<':
-                    alert_triggered = metric_value < rule.threshold
-                elif rule.condition == '>=':
-                    alert_triggered = metric_value >= rule.threshold
-                elif rule.condition == '<=':
-                    alert_triggered = metric_value <= rule.threshold
-                elif rule.condition == '==':
-                    alert_triggered = metric_value == rule.threshold
-                
-                if alert_triggered:
-                    # Create alert record
-                    alert = create_alert(
-                        rule_id=rule.id,
-                        device_id=device.id,
-                        metric=rule.metric,
-                        value=metric_value,
-                        threshold=rule.threshold,
-                        condition=rule.condition
-                    )
-                    
-                    # Prepare alert message
-                    message = rule.message_template or generate_alert_message(rule, device, metric_value)
-                    
-                    # Send notifications
-                    if rule.notify_email and settings.get('email_enabled', False):
-                        send_email_alert(rule, device, metric_value, message, settings)
-                    
-                    if rule.notify_telegram and settings.get('telegram_enabled', False):
-                        send_telegram_alert(rule, device, metric_value, message, settings)
-                    
-                    logger.info(f"Alert triggered: {rule.name} for device {device.name}")
-            except Exception as e:
-                logger.error(f"Error checking alert rule {rule.id}: {str(e)}")
+                for rule in rules:
+                    try:
+                        # Check threshold condition against the windowed average
+                        state = _get_rule_state(rule, device_id)
+                        average = state.add(sample.received, metric_value, rule.duration)
+                        
+                        if not state.window_complete(rule.duration):
+                            continue
+                        
+                        alert_triggered = rule.check(average)
+                        
+                        if alert_triggered and not state.firing:
+                            device = get_device_by_id(device_id)
+                            if not device:
+                                logger.warning(f"Alert rule {rule.id} references non-existent device {device_id}")
+                                continue
+                            
+                            # Create alert record
+                            alert = create_alert(
+                                rule_id=rule.id,
+                                device_id=device_id,
+                                metric=rule.metric,
+                                value=average,
+                                threshold=rule.threshold,
+                                condition=rule.condition
+                            )
+                            state.firing = True
+                            state.alert_id = alert.id if alert else None
+                            
+                            # Prepare alert message
+                            message = rule.message_template or generate_alert_message(rule, device, average)
+                            
+                            # Send notifications
+                            if settings is None:
+                                settings = get_settings()
+                            
+                            if rule.notify_email and settings.get('email_enabled', False):
+                                send_email_alert(rule, device, average, message, settings)
+                            
+                            if rule.notify_telegram and settings.get('telegram_enabled', False):
+                                send_telegram_alert(rule, device, average, message, settings)
+                            
+                            logger.info(f"Alert triggered: {rule.name} for device {device.name}")
+                        elif not alert_triggered and state.firing:
+                            # Condition cleared, close the open alert
+                            if state.alert_id:
+                                resolve_alert(state.alert_id)
+                            state.firing = False
+                            state.alert_id = None
+                            logger.info(f"Alert resolved: {rule.name} for device {device_id}")
+                    except Exception as e:
+                        logger.error(f"Error checking alert rule {rule.id}: {str(e)}")
     except Exception as e:
         logger.error(f"Error in alert check process: {str(e)}")
 
@@ -110,7 +199,7 @@ def generate_alert_message(rule, device, value):
     return message
 
 def send_email_alert(rule, device, value, message, settings):
-    """Send alert via email"""
+    """Queue an alert email for background delivery"""
     try:
         # Get email settings
         mail_server = settings.get('mail_server')
@@ -133,30 +222,29 @@ def send_email_alert(rule, device, value, message, settings):
             logger.error("No email recipients specified")
             return False
         
-        # Create message
-        msg = MIMEMultipart()
-        msg['From'] = mail_from
-        msg['To'] = ', '.join(recipients)
-        msg['Subject'] = f"MikroTik Monitor Alert: {rule.name}"
-        
-        # Attach message
-        msg.attach(MIMEText(message, 'plain'))
+        target = {
+            'mail_server': mail_server,
+            'mail_port': mail_port,
+            'mail_use_tls': mail_use_tls,
+            'mail_username': mail_username,
+            'mail_password': mail_password,
+            'mail_from': mail_from,
+            'recipients': tuple(recipients)
+        }
+        notification = Notification('email', target, f"MikroTik Monitor Alert: {rule.name}", message)
         
-        # Send email
-        with smtplib.SMTP(mail_server, mail_port) as server:
-            if mail_use_tls:
-                server.starttls()
-            server.login(mail_username, mail_password)
-            server.send_message(msg)
+        # The worker keeps the SMTP session open and batches alert storms
+        if not get_notification_dispatcher().submit(notification):
+            return False
         
-        logger.info(f"Email alert sent for {rule.name} to {', '.join(recipients)}")
+        logger.debug(f"Email alert queued for {rule.name} to {', '.join(recipients)}")
         return True
     except Exception as e:
-        logger.error(f"Error sending email alert: {str(e)}")
+        logger.error(f"Error queueing email alert: {str(e)}")
         return False
 
 def send_telegram_alert(rule, device, value, message, settings):
-    """Send alert via Telegram"""
+    """Queue an alert Telegram message for background delivery"""
     try:
         # Get Telegram settings
         bot_token = settings.get('telegram_bot_token')
@@ -167,23 +255,17 @@ def send_telegram_alert(rule, device, value, message, settings):
             logger.error("Telegram settings are incomplete")
             return False
         
-        # Prepare API request
-        api_url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-        payload = {
-            'chat_id': chat_id,
-            'text': message,
-            'parse_mode': 'Markdown'
+        target = {
+            'bot_token': bot_token,
+            'chat_id': chat_id
         }
+        notification = Notification('telegram', target, f"MikroTik Monitor Alert: {rule.name}", message)
         
-        # Send request
-        response = requests.post(api_url, data=payload)
-        
-        if response.status_code == 200:
-            logger.info(f"Telegram alert sent for {rule.name}")
-            return True
-        else:
-            logger.error(f"Telegram API error: {response.text}")
+        if not get_notification_dispatcher().submit(notification):
             return False
+        
+        logger.debug(f"Telegram alert queued for {rule.name}")
+        return True
     except Exception as e:
-        logger.error(f"Error sending Telegram alert: {str(e)}")
+        logger.error(f"Error queueing Telegram alert: {str(e)}")
         return False
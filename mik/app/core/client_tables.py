@@ -0,0 +1,178 @@
+import base64
+import heapq
+import ipaddress
+import json
+import logging
+from librouteros.exceptions import TrapError, MultiTrapError
+from mik.app.core.connection_pool import get_connection_pool
+from mik.app.core.pipeline import stream_command, proplist
+from mik.app.core.mikrotik import (
+    parse_uptime,
+    _dhcp_client,
+    _wireless_client,
+    DHCP_LEASE_PROPLIST,
+    REGISTRATION_PROPLIST
+)
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# Streamable tables as (print command, properties, row mapper)
+CLIENT_TABLE_SOURCES = {
+    'dhcp_leases': ('/ip/dhcp-server/lease/print', DHCP_LEASE_PROPLIST, _dhcp_client),
+    'wireless_registrations': ('/interface/wireless/registration-table/print', REGISTRATION_PROPLIST, _wireless_client),
+    'capsman_registrations': ('/caps-man/registration-table/print', REGISTRATION_PROPLIST, _wireless_client)
+}
+
+# Exact-match filters, pushed down to RouterOS as query words
+FILTER_FIELDS = {
+    'mac_address': 'mac-address',
+    'address': 'address',
+    'host_name': 'host-name',
+    'status': 'status',
+    'interface': 'interface'
+}
+
+# Fields matched by the free-text filter
+SEARCH_FIELDS = ('mac_address', 'address', 'host_name', 'interface')
+
+def _address_key(value):
+    try:
+        return int(ipaddress.ip_address(value))
+    except ValueError:
+        return -1
+
+# Sort fields mapped to key functions returning JSON-serialisable scalars
+SORT_FIELDS = {
+    'mac_address': lambda row: row.get('mac_address', '').lower(),
+    'address': lambda row: _address_key(row.get('address', '')),
+    'host_name': lambda row: str(row.get('host_name', '')).lower(),
+    'status': lambda row: str(row.get('status', '')),
+    'interface': lambda row: str(row.get('interface', '')),
+    'uptime': lambda row: parse_uptime(row.get('uptime', 0))
+}
+
+class ClientTableStream:
+    """Rows of one client table, read from the router as they arrive
+
+    Holds a pooled connection until closed. The connection goes back to the
+    pool only if the table was read to the end.
+    """
+
+    def __init__(self, pool, api, command, words, mapper, search=None):
+        self._pool = pool
+        self._api = api
+        self._rows = stream_command(api, command, words)
+        self._mapper = mapper
+        self._search = search.lower() if search else None
+        self.completed = False
+        self.closed = False
+
+    def __iter__(self):
+        try:
+            for raw in self._rows:
+                row = self._mapper(raw)
+                if self._search and not any(self._search in str(row.get(field, '')).lower()
+                                            for field in SEARCH_FIELDS):
+                    continue
+                yield row
+        except (TrapError, MultiTrapError):
+            # A trap still ends with !done, so the session is clean
+            self.completed = True
+            raise
+        self.completed = True
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._rows.close()
+        self._pool.release(self._api, discard=not self.completed)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+def open_client_table(device, table, filters=None, search=None):
+    """Start streaming a client table of a device
+
+    Args:
+        device: Device object with connection parameters
+        table (str): Key of CLIENT_TABLE_SOURCES
+        filters (dict, optional): FILTER_FIELDS key -> exact value, evaluated by RouterOS
+        search (str, optional): Case-insensitive substring matched against SEARCH_FIELDS
+
+    Returns:
+        ClientTableStream, or None if the device could not be reached
+    """
+    from mik.app.config import Config
+
+    command, fields, mapper = CLIENT_TABLE_SOURCES[table]
+    words = [proplist(*fields)]
+    for field, value in (filters or {}).items():
+        # RouterOS ANDs query words that are left on its query stack
+        words.append(f"?{FILTER_FIELDS[field]}={value}")
+
+    pool = get_connection_pool()
+    api = pool.acquire(device, timeout=getattr(Config, 'MIKROTIK_CONNECTION_TIMEOUT', 10))
+    if not api:
+        logger.warning(f"Could not connect to device {device.name} at {device.ip_address}")
+        return None
+
+    return ClientTableStream(pool, api, command, words, mapper, search=search)
+
+def encode_cursor(sort, key):
+    return base64.urlsafe_b64encode(json.dumps([sort, *key]).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, sort):
+    """Decode a page cursor for a sort field
+
+    Raises ValueError if the cursor is malformed or was made for another
+    sort field, whose keys would not compare with this one's.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(key, list) or len(key) != 4:
+        raise ValueError("Invalid cursor")
+    if key[0] != sort:
+        raise ValueError(f"Cursor was made for sort field {key[0]!r}, not {sort!r}")
+    # A key of an empty row has the type every key of this sort field has
+    if type(key[1]) is not type(SORT_FIELDS[sort]({})) or not all(isinstance(part, str) for part in key[2:]):
+        raise ValueError("Invalid cursor")
+    return tuple(key[1:])
+
+def page_rows(rows, sort='mac_address', descending=False, limit=100, cursor=None):
+    """Take one page of rows in sort order, keeping at most limit + 1 rows in memory
+
+    Keyset pagination: the cursor is the sort field and key of the last row
+    of the previous page, and ties are broken by MAC and address so the
+    order is total.
+
+    Returns:
+        tuple: (list of rows, next page cursor or None)
+    """
+    sort_key = SORT_FIELDS[sort]
+
+    def key(row):
+        return (sort_key(row), row.get('mac_address', ''), row.get('address', ''))
+
+    after = decode_cursor(cursor, sort) if cursor else None
+    if after is not None:
+        if descending:
+            rows = (row for row in rows if key(row) < after)
+        else:
+            rows = (row for row in rows if key(row) > after)
+
+    select = heapq.nlargest if descending else heapq.nsmallest
+    page = select(limit + 1, rows, key=key)
+
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = encode_cursor(sort, key(page[-1]))
+    return page, next_cursor
@@ -0,0 +1,177 @@
+import logging
+import threading
+from datetime import datetime
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# Client table sections merged per MAC, as (section, registration source)
+CLIENT_SECTIONS = (
+    ('dhcp_clients', None),
+    ('wireless_clients', 'wireless'),
+    ('capsman_clients', 'capsman')
+)
+
+# Fields whose changes are events. Signal, rates and uptime change on every
+# poll and are left out so they don't flood the history.
+TRACKED_FIELDS = ('source', 'interface', 'address', 'host_name', 'status')
+
+def merge_clients(result):
+    """Merge the client tables of a get_device_clients result into one record per MAC
+
+    Returns:
+        dict: upper-case MAC -> {TRACKED_FIELDS: value}
+    """
+    clients = {}
+    for section, source in CLIENT_SECTIONS:
+        for row in result.get(section) or []:
+            mac = (row.get('mac_address') or '').upper()
+            if not mac:
+                continue
+            record = clients.get(mac)
+            if record is None:
+                record = clients[mac] = dict.fromkeys(TRACKED_FIELDS)
+            if source:
+                record['source'] = source
+                record['interface'] = row.get('interface') or None
+            else:
+                record['address'] = row.get('address') or None
+                record['host_name'] = row.get('host_name') or None
+                record['status'] = row.get('status') or None
+    return clients
+
+def record_hash(record):
+    return hash(tuple(record[field] for field in TRACKED_FIELDS))
+
+class ClientSnapshot:
+    """Last observed client set of one device"""
+    __slots__ = ('digest', 'hashes', 'records', 'sections', 'observed_at')
+
+    def __init__(self, clients, hashes, sections, observed_at):
+        self.records = clients
+        self.hashes = hashes
+        self.sections = sections  # section -> rows the records were merged from
+        self.digest = hash(frozenset(hashes.items()))
+        self.observed_at = observed_at
+
+class ClientTracker:
+    """Turns repeated client table polls into join, leave and change events
+
+    Only a hash per MAC and one digest per device are compared on each poll,
+    so an unchanged client set costs a single comparison and a changed one a
+    single pass over both sets. Listeners get just the resulting events.
+
+    The first poll of a device after start-up is a baseline and produces no
+    events, and failed polls are ignored rather than read as everyone leaving.
+    Likewise, a table the router failed to return (listed in failed_sections)
+    keeps its clients from the previous poll.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshots = {}  # device_id -> ClientSnapshot
+        self._listeners = []
+
+    def observe(self, device_id, result, timestamp=None):
+        """Compare a poll result with the last one of the device and notify listeners
+
+        Args:
+            device_id (int): Device the result belongs to
+            result (dict): Output of get_device_clients
+            timestamp (datetime, optional): Poll time (UTC). Defaults to now.
+
+        Returns:
+            list: Event dictionaries with device_id, mac_address, event
+            ('join', 'leave' or 'change'), timestamp, client (the tracked fields)
+            and changes (field -> [old, new], change events only)
+        """
+        if not result or not result.get('online', False):
+            return []
+
+        timestamp = timestamp or datetime.utcnow()
+        failed = set(result.get('failed_sections') or ())
+
+        with self._lock:
+            previous = self._snapshots.get(device_id)
+            if previous is not None and previous.observed_at > timestamp:
+                # A newer poll already got here first
+                return []
+
+            sections = {}
+            for section, _ in CLIENT_SECTIONS:
+                if section in failed:
+                    sections[section] = previous.sections.get(section, []) if previous else []
+                else:
+                    sections[section] = result.get(section) or []
+            clients = merge_clients(sections)
+            hashes = {mac: record_hash(record) for mac, record in clients.items()}
+            snapshot = ClientSnapshot(clients, hashes, sections, timestamp)
+            self._snapshots[device_id] = snapshot
+            listeners = list(self._listeners)
+
+        if previous is None or previous.digest == snapshot.digest:
+            return []
+
+        events = self._diff(device_id, previous, snapshot, timestamp)
+        if events:
+            for listener in listeners:
+                try:
+                    listener(device_id, events)
+                except Exception as e:
+                    logger.error(f"Error in client event listener {getattr(listener, '__name__', listener)}: {str(e)}")
+        return events
+
+    @staticmethod
+    def _diff(device_id, previous, snapshot, timestamp):
+        events = []
+        for mac, client_hash in snapshot.hashes.items():
+            old_hash = previous.hashes.get(mac)
+            if old_hash == client_hash:
+                continue
+            record = snapshot.records[mac]
+            if old_hash is None:
+                events.append(_event(device_id, mac, 'join', timestamp, record))
+                continue
+            old = previous.records[mac]
+            changes = {field: [old[field], record[field]] for field in TRACKED_FIELDS if old[field] != record[field]}
+            if changes:
+                events.append(_event(device_id, mac, 'change', timestamp, record, changes))
+
+        for mac, record in previous.records.items():
+            if mac not in snapshot.hashes:
+                events.append(_event(device_id, mac, 'leave', timestamp, record))
+        return events
+
+    def clients(self, device_id):
+        """Last observed clients of a device as MAC -> tracked fields, or None"""
+        with self._lock:
+            snapshot = self._snapshots.get(device_id)
+            return dict(snapshot.records) if snapshot else None
+
+    def forget(self, device_id):
+        """Drop the baseline of a device (e.g. after it was deleted)"""
+        with self._lock:
+            self._snapshots.pop(device_id, None)
+
+    def add_listener(self, listener):
+        """Register a callable invoked with (device_id, events) when clients change"""
+        with self._lock:
+            if listener not in self._listeners:
+                self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+def _event(device_id, mac, event, timestamp, record, changes=None):
+    return {
+        'device_id': device_id,
+        'mac_address': mac,
+        'event': event,
+        'timestamp': timestamp,
+        'client': record,
+        'changes': changes
+    }
+
+client_tracker = ClientTracker()
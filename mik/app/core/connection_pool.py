@@ -0,0 +1,288 @@
+import logging
+import threading
+import time
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+class _PooledConnection:
+    """Authenticated RouterOS session tracked by the pool"""
+    __slots__ = ('api', 'key', 'created_at', 'last_used')
+
+    def __init__(self, api, key):
+        now = time.monotonic()
+        self.api = api
+        self.key = key
+        self.created_at = now
+        self.last_used = now
+
+class ConnectionPool:
+    """Pool of authenticated RouterOS API sessions keyed by device
+
+    Sessions are borrowed with acquire() and handed back with release().
+    Idle sessions are health-checked before reuse and closed once they
+    exceed the idle timeout. The number of open sessions is capped both
+    per device and in total.
+    """
+
+    def __init__(self, max_per_device=None, max_total=None, idle_timeout=None,
+                 health_check_interval=None, acquire_timeout=None):
+        from mik.app.config import Config
+
+        self.max_per_device = max_per_device or getattr(Config, 'MIKROTIK_POOL_MAX_PER_DEVICE', 2)
+        self.max_total = max_total or getattr(Config, 'MIKROTIK_POOL_MAX_TOTAL', 1000)
+        self.idle_timeout = idle_timeout or getattr(Config, 'MIKROTIK_POOL_IDLE_TIMEOUT', 300)
+        self.health_check_interval = health_check_interval or getattr(Config, 'MIKROTIK_POOL_HEALTH_CHECK_INTERVAL', 30)
+        self.acquire_timeout = acquire_timeout or getattr(Config, 'MIKROTIK_POOL_ACQUIRE_TIMEOUT', 30)
+
+        self._cond = threading.Condition()
+        self._idle = {}      # key -> list of idle _PooledConnection (most recent last)
+        self._open = {}      # key -> number of open sessions (idle + borrowed + connecting)
+        self._borrowed = {}  # id(api) -> _PooledConnection
+        self._total = 0
+        self._last_sweep = time.monotonic()
+
+    @staticmethod
+    def device_key(device):
+        """Build the pool key for a device
+
+        Connection parameters are part of the key so that editing a device
+        never hands out a session authenticated with stale credentials.
+        """
+        return (
+            getattr(device, 'id', None),
+            device.ip_address,
+            device.api_port,
+            device.username,
+            device.password_hash,
+            bool(device.use_ssl)
+        )
+
+    def acquire(self, device, timeout=None):
+        """Borrow an authenticated API session for a device
+
+        Args:
+            device: Device object with connection parameters
+            timeout (int, optional): Connection timeout in seconds for new sessions
+
+        Returns:
+            API connection object or None if no session could be obtained
+        """
+        key = self.device_key(device)
+        deadline = time.monotonic() + self.acquire_timeout
+
+        while True:
+            stale = []
+            conn = None
+            reserved = False
+
+            with self._cond:
+                stale.extend(self._sweep_locked())
+
+                while True:
+                    idle = self._idle.get(key)
+                    if idle:
+                        conn = idle.pop()
+                        self._borrowed[id(conn.api)] = conn
+                        break
+
+                    if self._open.get(key, 0) < self.max_per_device:
+                        if self._total >= self.max_total:
+                            # Make room by closing the least recently used idle session
+                            victim = self._pop_lru_idle_locked()
+                            if victim:
+                                stale.append(victim)
+                        if self._total < self.max_total:
+                            self._open[key] = self._open.get(key, 0) + 1
+                            self._total += 1
+                            reserved = True
+                            break
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+
+            self._close_all(stale)
+
+            if conn:
+                # Only ping sessions that sat idle for a while
+                if time.monotonic() - conn.last_used < self.health_check_interval or self._is_healthy(conn):
+                    return conn.api
+                logger.debug(f"Discarding unhealthy pooled connection to {device.ip_address}")
+                self.release(conn.api, discard=True)
+                continue
+
+            if not reserved:
+                logger.warning(f"Timed out waiting for a pooled connection to {device.ip_address}")
+                return None
+
+            return self._open_connection(device, key, timeout)
+
+    def release(self, api, discard=False):
+        """Return a borrowed session to the pool
+
+        Args:
+            api: API connection object obtained from acquire()
+            discard (bool): Close the session instead of keeping it for reuse
+        """
+        if api is None:
+            return
+
+        with self._cond:
+            conn = self._borrowed.pop(id(api), None)
+            if conn is None:
+                # Not a pooled session, nothing to account for
+                discard = True
+            elif discard:
+                self._forget_locked(conn.key)
+            else:
+                conn.last_used = time.monotonic()
+                self._idle.setdefault(conn.key, []).append(conn)
+            self._cond.notify_all()
+
+        if discard:
+            self._close(api)
+
+    def purge(self, device):
+        """Close all idle sessions of a device (e.g. after a reboot or restore)"""
+        with self._cond:
+            stale = self._drop_idle_locked(
+                lambda key: key[0] == getattr(device, 'id', None) and key[1] == device.ip_address
+            )
+            self._cond.notify_all()
+        self._close_all(stale)
+        return len(stale)
+
+    def close_idle(self):
+        """Close idle sessions that exceeded the idle timeout"""
+        with self._cond:
+            stale = self._sweep_locked(force=True)
+            self._cond.notify_all()
+        self._close_all(stale)
+        return len(stale)
+
+    def close_all(self):
+        """Close every idle session (borrowed sessions are closed on release)"""
+        with self._cond:
+            stale = self._drop_idle_locked(lambda key: True)
+            self._cond.notify_all()
+        self._close_all(stale)
+
+    def stats(self):
+        """Get pool usage counters"""
+        with self._cond:
+            return {
+                "devices": len(self._open),
+                "open": self._total,
+                "idle": sum(len(idle) for idle in self._idle.values()),
+                "borrowed": len(self._borrowed),
+                "max_per_device": self.max_per_device,
+                "max_total": self.max_total
+            }
+
+    # Internal helpers
+    def _open_connection(self, device, key, timeout):
+        from mik.app.core.mikrotik import connect_to_device
+
+        api = None
+        try:
+            api = connect_to_device(
+                device.ip_address,
+                device.username,
+                device.password_hash,
+                port=device.api_port,
+                use_ssl=device.use_ssl,
+                timeout=timeout
+            )
+        finally:
+            with self._cond:
+                if api:
+                    self._borrowed[id(api)] = _PooledConnection(api, key)
+                else:
+                    self._forget_locked(key)
+                self._cond.notify_all()
+        return api
+
+    def _is_healthy(self, conn):
+        try:
+            tuple(conn.api('/system/identity/print'))
+            return True
+        except Exception as e:
+            logger.debug(f"Pooled connection health check failed: {e.__class__.__name__}")
+            return False
+
+    def _forget_locked(self, key):
+        count = self._open.get(key, 0) - 1
+        if count > 0:
+            self._open[key] = count
+        else:
+            self._open.pop(key, None)
+        self._total -= 1
+
+    def _pop_lru_idle_locked(self):
+        oldest_key = None
+        oldest = None
+        for key, idle in self._idle.items():
+            if idle and (oldest is None or idle[0].last_used < oldest.last_used):
+                oldest_key, oldest = key, idle[0]
+        if oldest is None:
+            return None
+        self._idle[oldest_key].pop(0)
+        if not self._idle[oldest_key]:
+            del self._idle[oldest_key]
+        self._forget_locked(oldest_key)
+        return oldest
+
+    def _drop_idle_locked(self, predicate):
+        dropped = []
+        for key in [key for key in self._idle if predicate(key)]:
+            for conn in self._idle.pop(key):
+                self._forget_locked(key)
+                dropped.append(conn)
+        return dropped
+
+    def _sweep_locked(self, force=False):
+        now = time.monotonic()
+        # Amortise idle eviction: scan at most once per health check interval
+        if not force and now - self._last_sweep < self.health_check_interval:
+            return []
+        self._last_sweep = now
+
+        expired = []
+        for key in list(self._idle):
+            keep = []
+            for conn in self._idle[key]:
+                if now - conn.last_used > self.idle_timeout:
+                    self._forget_locked(key)
+                    expired.append(conn)
+                else:
+                    keep.append(conn)
+            if keep:
+                self._idle[key] = keep
+            else:
+                del self._idle[key]
+        return expired
+
+    def _close_all(self, conns):
+        for conn in conns:
+            self._close(conn.api)
+
+    @staticmethod
+    def _close(api):
+        try:
+            api.close()
+        except Exception as e:
+            logger.warning(f"Error closing API connection: {e.__class__.__name__}")
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_connection_pool():
+    """Get the process-wide RouterOS connection pool"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+    return _pool
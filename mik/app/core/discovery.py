@@ -1,20 +1,46 @@
 import logging
 import ipaddress
 import socket
-import concurrent.futures
-from queue import Queue
-import netifaces
+import asyncio
+import functools
+import bisect
+import time
 import platform
 import subprocess
 import re
-from mik.app.core.mikrotik import connect_to_device, get_interface_traffic
-from mik.app.utils.network import validate_ip_address, check_port_open, validate_subnet, parse_mac_address
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    pass
+from mik.app.core.connection_pool import get_connection_pool
+from mik.app.core.pipeline import run_pipelined, proplist
+from mik.app.utils.network import validate_subnet, parse_mac_address, is_mikrotik_mac
 
 # Configure logger
 logger = logging.getLogger(__name__)
 
-def scan_network(subnet, max_workers=10):
-    """Scan a network subnet for MikroTik devices"""
+# Ports probed on every host, as result field -> port
+SCAN_PORTS = {
+    'port_api': 8728,
+    'port_www': 80,
+    'port_winbox': 8291
+}
+
+# File descriptors kept free for the rest of the process while scanning
+_RESERVED_FDS = 64
+
+def scan_network(subnet, max_workers=None, timeout=2):
+    """Scan a network subnet for MikroTik devices
+
+    Args:
+        subnet (str): Network in CIDR notation
+        max_workers (int, optional): Maximum probe connections in flight.
+            Defaults to Config.DISCOVERY_CONCURRENCY.
+        timeout (float): Seconds to wait for each connection
+
+    Returns:
+        dict: {"devices": [...]} sorted by address, or {"error": ...}
+    """
     try:
         # Validate subnet format
         if not validate_subnet(subnet):
@@ -22,193 +48,428 @@ def scan_network(subnet, max_workers=10):
         
         network = ipaddress.ip_network(subnet, strict=False)
         
-        # Queue for results
-        result_queue = Queue()
-        found_devices = []
-        
-        # Scan IPs in parallel
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = [executor.submit(scan_ip, str(ip), result_queue) for ip in network.hosts()]
-            concurrent.futures.wait(futures)
-        
-        # Collect results
-        while not result_queue.empty():
-            device = result_queue.get()
-            if device:
-                found_devices.append(device)
-        
+        found_devices = asyncio.run(scan_network_async(network, max_workers, timeout))
         return {"devices": found_devices}
         
     except Exception as e:
         logger.error(f"Error in network scan: {str(e)}")
         return {"error": f"Error in network scan: {str(e)}"}
 
-def scan_ip(ip, result_queue):
-    """Scan a single IP address for MikroTik device"""
+async def scan_network_async(network, concurrency=None, timeout=2, skip=None, cancel=None, on_host=None):
+    """Probe every host of a network with a global limit on open connections
+
+    Hosts are taken lazily from the network by concurrency // len(SCAN_PORTS)
+    workers, each probing all ports of its host at once, so no more than
+    `concurrency` sockets are open and memory does not grow with the subnet.
+
+    Args:
+        network: ipaddress network to scan
+        concurrency (int, optional): Maximum probe connections in flight
+        timeout (float): Seconds to wait for each connection
+        skip (set, optional): Addresses not to probe
+        cancel (threading.Event, optional): Stops taking new hosts once set
+        on_host (callable, optional): Called with (ip, device or None) as each host is done
+
+    Returns:
+        list: Found devices sorted by address
+    """
+    from mik.app.config import Config
+
+    concurrency = _clamp_concurrency(concurrency or getattr(Config, 'DISCOVERY_CONCURRENCY', 1024))
+    hosts = iter(network.hosts())
+    neighbors = NeighborTable()
+    found_devices = []
+
+    async def worker():
+        for ip in hosts:
+            if cancel is not None and cancel.is_set():
+                return
+            ip = str(ip)
+            if skip and ip in skip:
+                continue
+            device = await scan_host(ip, timeout)
+            if device:
+                annotate_mac(device, await neighbors.lookup(ip))
+                found_devices.append(device)
+            if on_host is not None:
+                on_host(ip, device)
+
+    workers = max(1, min(concurrency // len(SCAN_PORTS), network.num_addresses))
+    await asyncio.gather(*(worker() for _ in range(workers)))
+
+    found_devices.sort(key=lambda device: ipaddress.ip_address(device['ip_address']))
+    return found_devices
+
+async def scan_host(ip, timeout=2):
+    """Scan a single IP address for a MikroTik device, or return None"""
     try:
-        # Skip broadcast and network addresses
-        if ip.endswith('.0') or ip.endswith('.255'):
-            return None
-        
-        # Check if port 8728 (API) is open
-        if not check_port_open(ip, 8728):
-            if not check_port_open(ip, 80, timeout=1):  # Try HTTP port as fallback
-                return None
+        probes = await asyncio.gather(*(probe_port(ip, port, timeout) for port in SCAN_PORTS.values()))
+        ports = dict(zip(SCAN_PORTS, probes))
         
-        # Try to get hostname
-        try:
-            hostname = socket.gethostbyaddr(ip)[0]
-        except:
-            hostname = "Unknown"
+        # The API port or HTTP as a fallback must be open
+        if not ports['port_api'] and not ports['port_www']:
+            return None
         
-        # Get MAC address
-        mac = get_mac_address(ip)
+        loop = asyncio.get_running_loop()
+        hostname = await loop.run_in_executor(None, get_hostname, ip)
         
-        # Return device info
+        # Return device info, reusing the probe results; the MAC is filled in per scan
         device = {
             "ip_address": ip,
-            "hostname": hostname,
-            "mac_address": mac if mac else "Unknown",
-            "port_api": check_port_open(ip, 8728),
-            "port_www": check_port_open(ip, 80),
-            "port_winbox": check_port_open(ip, 8291)
+            "hostname": hostname
         }
-        
-        result_queue.put(device)
+        device.update(ports)
+        return device
         
     except Exception as e:
         logger.error(f"Error scanning IP {ip}: {str(e)}")
         return None
 
-def get_mac_address(ip):
-    """Get MAC address for an IP (platform specific)"""
+async def probe_port(ip, port, timeout=2):
+    """Check if a TCP port accepts connections without blocking the event loop"""
     try:
-        if platform.system() == "Windows":
-            # Use arp on Windows
-            p = subprocess.Popen(["arp", "-a", ip], stdout=subprocess.PIPE)
-            output = p.stdout.read().decode('utf-8')
-            matches = re.search(r'([0-9A-F]{2}[:-][0-9A-F]{2}[:-][0-9A-F]{2}[:-][0-9A-F]{2}[:-][0-9A-F]{2}[:-][0-9A-F]{2})', output, re.IGNORECASE)
-            if matches:
-                return matches.group(0)
-        else:
-            # Use arp on Linux/Unix/MacOS
-            p = subprocess.Popen(["arp", "-n", ip], stdout=subprocess.PIPE)
-            output = p.stdout.read().decode('utf-8')
-            matches = re.search(r'([0-9a-f]{2}:[0-9a-f]{2}:[0-9a-f]{2}:[0-9a-f]{2}:[0-9a-f]{2}:[0-9a-f]{2})', output, re.IGNORECASE)
-            if matches:
-                return matches.group(0)
-        return None
+        _, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True
+
+def annotate_mac(device, mac):
+    """Set the MAC address of a scan result and flag MikroTik hardware by its OUI"""
+    device["mac_address"] = mac if mac else "Unknown"
+    device["mikrotik_oui"] = is_mikrotik_mac(mac)
+    return device
+
+def get_hostname(ip):
+    """Reverse DNS name of an IP, or 'Unknown'"""
+    try:
+        return socket.gethostbyaddr(ip)[0]
+    except (OSError, UnicodeError):
+        return "Unknown"
+
+def _clamp_concurrency(concurrency):
+    # Every probe holds a socket; stay below the open file limit
+    try:
+        soft_limit, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    except (NameError, ValueError, OSError):
+        return concurrency
+    if soft_limit == resource.RLIM_INFINITY:
+        return concurrency
+    return max(len(SCAN_PORTS), min(concurrency, soft_limit - _RESERVED_FDS))
+
+# Kernel neighbor table and the flag of resolved entries in it
+ARP_TABLE_PATH = '/proc/net/arp'
+ATF_COM = 0x2
+
+# IP and MAC of one line of `arp -a` output (Windows, BSD and macOS formats)
+_ARP_LINE_RE = re.compile(
+    r'(\d{1,3}(?:\.\d{1,3}){3})\)?\s+(?:at\s+)?([0-9a-f]{1,2}(?:[:-][0-9a-f]{1,2}){5})\b',
+    re.IGNORECASE
+)
+
+def read_neighbor_table():
+    """Read the whole ARP neighbor table of this host at once
+
+    Uses /proc/net/arp on Linux and a single `arp -a` call elsewhere.
+
+    Returns:
+        dict: IP address -> normalized MAC address of resolved entries
+    """
+    try:
+        with open(ARP_TABLE_PATH) as table:
+            return _parse_proc_arp(table)
+    except OSError:
+        pass
+
+    try:
+        args = ["arp", "-a"] if platform.system() == "Windows" else ["arp", "-an"]
+        output = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                timeout=10).stdout.decode('utf-8', 'replace')
+        return _parse_arp_output(output)
     except Exception as e:
-        logger.error(f"Error getting MAC address: {str(e)}")
-        return None
+        logger.error(f"Error reading ARP table: {str(e)}")
+        return {}
+
+class NeighborTable:
+    """Neighbor table read in bulk and re-read at most once per interval on a miss
+
+    Probing a host resolves its MAC, so during a scan the table is re-read
+    when a found host is not in it yet, but never more than once per
+    interval however many hosts are found. A host missed within the
+    interval waits for the next allowed read rather than going unresolved.
+    """
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self._neighbors = {}
+        self._read_at = None
+        self._lock = asyncio.Lock()
+
+    async def lookup(self, ip):
+        if ip in self._neighbors:
+            return self._neighbors[ip]
+
+        async with self._lock:
+            # Another host may have re-read the table while this one waited
+            if ip not in self._neighbors:
+                if self._read_at is not None:
+                    wait = self.interval - (time.monotonic() - self._read_at)
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                self._neighbors = read_neighbor_table()
+                self._read_at = time.monotonic()
+        return self._neighbors.get(ip)
+
+def _parse_proc_arp(lines):
+    # IP address, HW type, Flags, HW address, Mask, Device; first line is a header
+    neighbors = {}
+    for line in list(lines)[1:]:
+        fields = line.split()
+        if len(fields) < 4:
+            continue
+        try:
+            resolved = int(fields[2], 16) & ATF_COM
+        except ValueError:
+            continue
+        mac = parse_mac_address(fields[3])
+        if resolved and mac and mac != '00:00:00:00:00:00':
+            neighbors[fields[0]] = mac
+    return neighbors
+
+def _parse_arp_output(output):
+    neighbors = {}
+    for ip, mac in _ARP_LINE_RE.findall(output):
+        # macOS drops leading zeros (0:c:42:...)
+        mac = parse_mac_address(''.join(octet.zfill(2) for octet in re.split('[:-]', mac)))
+        if mac and mac != '00:00:00:00:00:00':
+            neighbors[ip] = mac
+    return neighbors
+
+def get_mac_address(ip, neighbors=None):
+    """Get MAC address for an IP from the neighbor table
+
+    Pass a table from read_neighbor_table when looking up many addresses.
+    """
+    if neighbors is None:
+        neighbors = read_neighbor_table()
+    return neighbors.get(ip)
 
 def discover_topology(devices, all_devices=None):
     """Discover network topology between MikroTik devices"""
     try:
         if all_devices is None:
             all_devices = devices
-            
-        topology = []
         
         # Create mapping of IP to device ID
         ip_to_id = {device.ip_address: device.id for device in all_devices}
+        index = address_index(ip_to_id)
         
-        for device in devices:
-            try:
-                # Connect to device
-                api = connect_to_device(device.ip_address, device.username, device.password)
-                if not api:
-                    continue
-                
-                # Get ARP table
-                arp_entries = api(cmd='/ip/arp/print')
-                
-                # Get interface addresses
-                interfaces = api(cmd='/ip/address/print')
-                interface_networks = {}
-                
-                # Map interfaces to networks
-                for iface in interfaces:
-                    if 'address' in iface:
-                        # Parse CIDR notation (e.g., 192.168.1.1/24)
-                        address_parts = iface['address'].split('/')
-                        if len(address_parts) > 1:
-                            ip = address_parts[0]
-                            mask = int(address_parts[1])
-                            try:
-                                network = ipaddress.IPv4Network(f"{ip}/{mask}", strict=False)
-                                interface_networks[iface.get('interface', 'unknown')] = {
-                                    'network': str(network.network_address),
-                                    'mask': mask,
-                                    'ip': ip
-                                }
-                            except Exception as e:
-                                logger.error(f"Error parsing interface address: {str(e)}")
-                
-                # Process ARP entries
-                for entry in arp_entries:
-                    target_ip = entry.get('address')
-                    
-                    # Check if IP belongs to another monitored device
-                    if target_ip in ip_to_id and ip_to_id[target_ip] != device.id:
-                        target_id = ip_to_id[target_ip]
-                        interface_name = entry.get('interface', 'unknown')
-                        
-                        # Find interface network
-                        network_info = interface_networks.get(interface_name, {})
-                        
-                        # Create link
-                        link = {
-                            'source_id': device.id,
-                            'target_id': target_id,
-                            'source_interface': interface_name,
-                            'source_ip': network_info.get('ip'),
-                            'target_ip': target_ip
-                        }
-                        
-                        # Check if link already exists (in reverse direction)
-                        existing_link = False
-                        for existing in topology:
-                            if existing['source_id'] == target_id and existing['target_id'] == device.id:
-                                existing_link = True
-                                # Update with reverse info
-                                existing['target_interface'] = interface_name
-                                break
-                        
-                        if not existing_link:
-                            topology.append(link)
-                
-                # Check routing table for additional links
-                routes = api(cmd='/ip/route/print')
-                for route in routes:
-                    if 'gateway' in route:
-                        gateway = route['gateway']
-                        if gateway in ip_to_id and ip_to_id[gateway] != device.id:
-                            target_id = ip_to_id[gateway]
-                            
-                            # Check if link already exists
-                            existing_link = False
-                            for existing in topology:
-                                if (existing['source_id'] == device.id and existing['target_id'] == target_id) or \
-                                   (existing['source_id'] == target_id and existing['target_id'] == device.id):
-                                    existing_link = True
-                                    break
-                            
-                            if not existing_link:
-                                link = {
-                                    'source_id': device.id,
-                                    'target_id': target_id,
-                                    'source_interface': route.get('interface', 'unknown'),
-                                    'source_ip': None,  # We don't know the exact source IP
-                                    'target_ip': gateway
-                                }
-                                topology.append(link)
-                
-            except Exception as e:
-                logger.error(f"Error discovering topology for device {device.name}: {str(e)}")
-        
-        return topology
+        return merge_links(
+            links for links in (collect_device_links(device, ip_to_id, index) for device in devices) if links
+        )
         
     except Exception as e:
         logger.error(f"Error in topology discovery: {str(e)}")
-        return []
\ No newline at end of file
+        return []
+
+def merge_links(device_links):
+    """Merge the links seen by each device into one link per device pair
+
+    Links are kept in a dictionary keyed by the unordered device pair, so
+    merging is linear in the number of links. The first device to report a
+    pair is the link's source; an ARP entry of the other device fills in
+    the target interface.
+
+    Args:
+        device_links: Iterable of collect_device_links results
+
+    Returns:
+        list: Link dictionaries in discovery order
+    """
+    topology = {}
+    for links in device_links:
+        for link in links.values():
+            source_id, target_id = link['source_id'], link['target_id']
+            pair = (source_id, target_id) if source_id < target_id else (target_id, source_id)
+            
+            existing = topology.get(pair)
+            if existing is None:
+                topology[pair] = {key: value for key, value in link.items() if key != 'kind'}
+            elif link['kind'] == 'arp' and existing['source_id'] == target_id:
+                # Update with reverse info
+                existing['target_interface'] = link['source_interface']
+    
+    return list(topology.values())
+
+def address_index(ip_to_id):
+    """Monitored addresses sorted by value, for gateway_candidates
+
+    Build it once per topology refresh and share it between devices.
+
+    Returns:
+        tuple: (sorted integer addresses, matching (IP, device ID) tuples)
+    """
+    entries = sorted(
+        (address, ip, target_id) for ip, target_id in ip_to_id.items()
+        for address in (_address_int(ip),) if address is not None
+    )
+    return [address for address, _, _ in entries], [(ip, target_id) for _, ip, target_id in entries]
+
+def gateway_candidates(device_id, networks, index, linked=()):
+    """Monitored devices that could be a gateway of a device's routes
+
+    A gateway must be on one of the device's connected networks, so only
+    monitored addresses inside those networks are returned, found by binary
+    search over the address index.
+
+    Args:
+        device_id (int): Device whose routes are checked
+        networks (list): (ipaddress network, interface, local IP) of the device
+        index (tuple): address_index of all monitored devices
+        linked: Device IDs already known to be neighbors
+
+    Returns:
+        list: (gateway IP, target device ID, interface, local IP) tuples
+    """
+    keys, entries = index
+    candidates = []
+    seen = set()
+    for network, interface, local_ip in networks:
+        first = bisect.bisect_left(keys, int(network.network_address))
+        last = bisect.bisect_right(keys, int(network.broadcast_address))
+        for ip, target_id in entries[first:last]:
+            if target_id != device_id and target_id not in linked and target_id not in seen:
+                seen.add(target_id)
+                candidates.append((ip, target_id, interface, local_ip))
+    return candidates
+
+@functools.lru_cache(maxsize=65536)
+def _address_int(ip):
+    # Every refresh checks all monitored addresses; parse each one once
+    try:
+        return int(ipaddress.IPv4Address(ip))
+    except ValueError:
+        return None
+
+def collect_device_links(device, ip_to_id, index=None):
+    """Find the monitored devices one device is connected to
+
+    Neighbors are devices in its ARP table and, failing that, gateways of
+    its routes. Routes are never downloaded: for each monitored device on
+    a connected network the router only counts the routes through it, so
+    routers with full BGP tables cost a few short replies.
+
+    Args:
+        device: Device object with connection parameters
+        ip_to_id (dict): IP address -> device ID of all monitored devices
+        index (tuple, optional): address_index(ip_to_id), built if not given
+
+    Returns:
+        dict: target device ID -> link dictionary (source_id, target_id,
+        source_interface, source_ip, target_ip and kind, 'arp' or 'route'),
+        or None if the device could not be read
+    """
+    from mik.app.config import Config
+
+    pool = get_connection_pool()
+    api = pool.acquire(device, timeout=getattr(Config, 'MIKROTIK_CONNECTION_TIMEOUT', 10))
+    if not api:
+        logger.warning(f"Could not connect to device {device.name} at {device.ip_address}")
+        return None
+
+    reusable = False
+    try:
+        # Get ARP table and interface addresses in one round trip
+        arp_reply, address_reply = run_pipelined(api, [
+            ('/ip/arp/print', [proplist('address', 'interface')]),
+            ('/ip/address/print', [proplist('address', 'interface')])
+        ])
+        reusable = True
+        if not arp_reply.ok or not address_reply.ok:
+            error = arp_reply.error or address_reply.error
+            logger.error(f"Error discovering topology for device {device.name}: {error}")
+            return None
+        
+        interface_networks = {}
+        networks = []
+        
+        # Map interfaces to networks
+        for iface in address_reply.rows:
+            if 'address' in iface:
+                # Parse CIDR notation (e.g., 192.168.1.1/24)
+                address_parts = iface['address'].split('/')
+                if len(address_parts) > 1:
+                    ip = address_parts[0]
+                    mask = int(address_parts[1])
+                    try:
+                        network = ipaddress.IPv4Network(f"{ip}/{mask}", strict=False)
+                        interface_name = iface.get('interface', 'unknown')
+                        interface_networks[interface_name] = {
+                            'network': str(network.network_address),
+                            'mask': mask,
+                            'ip': ip
+                        }
+                        networks.append((network, interface_name, ip))
+                    except Exception as e:
+                        logger.error(f"Error parsing interface address: {str(e)}")
+        
+        links = {}
+        
+        # Process ARP entries
+        for entry in arp_reply.rows:
+            target_ip = entry.get('address')
+            
+            # Check if IP belongs to another monitored device
+            target_id = ip_to_id.get(target_ip)
+            if target_id is None or target_id == device.id or target_id in links:
+                continue
+            
+            interface_name = entry.get('interface', 'unknown')
+            
+            # Find interface network
+            network_info = interface_networks.get(interface_name, {})
+            
+            links[target_id] = {
+                'source_id': device.id,
+                'target_id': target_id,
+                'source_interface': interface_name,
+                'source_ip': network_info.get('ip'),
+                'target_ip': target_ip,
+                'kind': 'arp'
+            }
+        
+        # Check routing table for additional links, counting routes per candidate gateway
+        candidates = gateway_candidates(device.id, networks, index or address_index(ip_to_id), links)
+        max_checks = getattr(Config, 'TOPOLOGY_MAX_GATEWAY_CHECKS', 64)
+        if len(candidates) > max_checks:
+            logger.warning(f"Checking routes of {device.name} through {max_checks} of {len(candidates)} candidate gateways")
+            candidates = candidates[:max_checks]
+        if candidates:
+            reusable = False
+            counts = run_pipelined(api, [
+                ('/ip/route/print', ['=count-only=', f"?gateway={gateway}"]) for gateway, _, _, _ in candidates
+            ])
+            reusable = True
+            for (gateway, target_id, interface_name, local_ip), reply in zip(candidates, counts):
+                if not reply.ok or not int(reply.ret or 0) or target_id in links:
+                    continue
+                links[target_id] = {
+                    'source_id': device.id,
+                    'target_id': target_id,
+                    'source_interface': interface_name,
+                    'source_ip': local_ip,
+                    'target_ip': gateway,
+                    'kind': 'route'
+                }
+        
+        return links
+        
+    except Exception as e:
+        logger.error(f"Error discovering topology for device {device.name}: {str(e)}")
+        return None
+    finally:
+        pool.release(api, discard=not reusable)
@@ -0,0 +1,151 @@
+import logging
+import threading
+import time
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+COUNTER_32_MODULUS = 2 ** 32
+COUNTER_64_MODULUS = 2 ** 64
+
+# Counters turned into rates, as (counter field, rate field, bits per unit)
+RATE_FIELDS = (
+    ('tx_byte', 'tx_rate_bps', 8),
+    ('rx_byte', 'rx_rate_bps', 8),
+    ('tx_packet', 'tx_rate_pps', 1),
+    ('rx_packet', 'rx_rate_pps', 1)
+)
+
+# Boot time estimates closer than this belong to the same boot
+BOOT_TIME_TOLERANCE = 10  # seconds
+
+# Samples closer than this reuse the previous rates instead of a noisy delta
+MIN_RATE_INTERVAL = 0.5  # seconds
+
+# Smallest Ethernet frame, bounding the packet rate a byte rate allows
+MIN_FRAME_BYTES = 64
+
+def counter_delta(previous, current, modulus=COUNTER_64_MODULUS, max_delta=None):
+    """Increase of a cumulative counter
+
+    A counter that went back was reset (reboot, interface reset or
+    reset-counters) and counts from zero again, so its increase is its
+    current value. RouterOS API counters are 64-bit and never wrap in
+    practice; only counters known to be narrower are unwrapped, and only
+    when the wrap implies no more than max_delta.
+
+    Returns:
+        tuple: (increase, whether the counter was reset)
+    """
+    if current >= previous:
+        return current - previous, False
+    if modulus < COUNTER_64_MODULUS and previous < modulus:
+        wrapped = modulus - previous + current
+        if max_delta is None or wrapped <= max_delta:
+            return wrapped, False
+    return current, True
+
+class CounterSample:
+    """Previous counter values of one interface"""
+    __slots__ = ('counters', 'taken', 'boot', 'rates')
+
+    def __init__(self, counters, taken, boot, rates):
+        self.counters = counters
+        self.taken = taken
+        self.boot = boot
+        self.rates = rates
+
+class InterfaceCounterCache:
+    """Turns cumulative interface counters into bps/pps rates
+
+    Each poll is compared with the previous sample of the same interface
+    using monotonic time. A counter that went back counts from zero, unless
+    counters are configured as 32-bit and the wrap fits the maximum rate.
+    Baselines are reset when the router rebooted (its uptime went back) or
+    when a delta implies an impossible rate.
+    """
+
+    def __init__(self, max_rate_bps=None, max_age=None, counter_bits=None):
+        from mik.app.config import Config
+
+        self.max_rate_bps = max_rate_bps or getattr(Config, 'INTERFACE_RATE_MAX_BPS', 400 * 10 ** 9)
+        self.counter_modulus = 2 ** (counter_bits or getattr(Config, 'INTERFACE_COUNTER_BITS', 64))
+        self.max_age = max_age or getattr(Config, 'INTERFACE_COUNTER_MAX_AGE', 3600)
+        self._lock = threading.Lock()
+        self._samples = {}  # device_id -> {interface name: CounterSample}
+        self._boots = {}    # device_id -> (boot time estimate, boot number)
+
+    def note_uptime(self, device_id, uptime_seconds):
+        """Record a device's uptime; a reset starts a new boot and drops its baselines"""
+        if not uptime_seconds:
+            return
+        boot_time = time.time() - uptime_seconds
+        with self._lock:
+            known = self._boots.get(device_id)
+            if known is None:
+                self._boots[device_id] = (boot_time, 0)
+            elif abs(boot_time - known[0]) > BOOT_TIME_TOLERANCE:
+                logger.info(f"Device {device_id} rebooted, resetting interface counter baselines")
+                self._boots[device_id] = (boot_time, known[1] + 1)
+                self._samples.pop(device_id, None)
+
+    def rates(self, device_id, interface_name, counters, now=None):
+        """Compute rates for one interface and store its counters as the new baseline
+
+        Args:
+            device_id (int): Device the counters belong to
+            interface_name (str): Interface name
+            counters (dict): Cumulative values of the RATE_FIELDS counters
+            now (float, optional): Monotonic time of the sample
+
+        Returns:
+            dict: RATE_FIELDS rates, or None when there is no usable baseline yet
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            boot = self._boots.get(device_id, (None, 0))[1]
+            device_samples = self._samples.setdefault(device_id, {})
+            previous = device_samples.get(interface_name)
+
+            if previous is not None and previous.boot == boot and now - previous.taken < MIN_RATE_INTERVAL:
+                # Polled again right away; keep the older baseline for a meaningful delta
+                return previous.rates
+
+            rates = None
+            if previous is not None and previous.boot == boot:
+                elapsed = now - previous.taken
+                max_bytes = self.max_rate_bps / 8 * elapsed
+                rates = {}
+                reset = False
+                for counter, rate_field, bits in RATE_FIELDS:
+                    max_delta = max_bytes if bits == 8 else max_bytes / MIN_FRAME_BYTES
+                    delta, counter_reset = counter_delta(previous.counters.get(counter, 0), counters.get(counter, 0),
+                                                         self.counter_modulus, max_delta)
+                    reset = reset or counter_reset
+                    rates[rate_field] = round(delta * bits / elapsed, 2)
+                if reset:
+                    logger.debug(f"Counter reset on device {device_id} interface {interface_name}")
+
+                if max(rates['tx_rate_bps'], rates['rx_rate_bps']) > self.max_rate_bps or \
+                        max(rates['tx_rate_pps'], rates['rx_rate_pps']) > self.max_rate_bps / 8 / MIN_FRAME_BYTES:
+                    # No interface is this fast; the baseline is unusable
+                    logger.debug(f"Impossible rate on device {device_id} interface {interface_name}")
+                    rates = None
+
+            device_samples[interface_name] = CounterSample(dict(counters), now, boot, rates)
+            self._prune_locked(device_samples, now)
+            return rates
+
+    def forget(self, device_id):
+        """Drop all state of a device (e.g. after it was deleted)"""
+        with self._lock:
+            self._samples.pop(device_id, None)
+            self._boots.pop(device_id, None)
+
+    def _prune_locked(self, device_samples, now):
+        # Interfaces that were renamed or removed stop being polled
+        stale = [name for name, sample in device_samples.items() if now - sample.taken > self.max_age]
+        for name in stale:
+            del device_samples[name]
+
+interface_counters = InterfaceCounterCache()
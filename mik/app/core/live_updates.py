@@ -0,0 +1,236 @@
+import logging
+import threading
+from mik.app.core.metrics_store import latest_metrics
+from app.core.client_tracker import client_tracker
+from app.utils.delta import index_rows, diff_fields, diff_rows
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# Live tables: table -> {section of the poll result: field the rows are keyed by}
+LIVE_TABLES = {
+    'interfaces': {'interfaces': 'name'},
+    'clients': {
+        'wireless_clients': 'mac_address',
+        'dhcp_clients': 'mac_address',
+        'capsman_clients': 'mac_address'
+    }
+}
+
+# Poll result fields that are not sent as table metadata
+_UNTRACKED_FIELDS = ('timestamp', 'performance')
+
+class TableState:
+    """Last published version of one live table of one device"""
+    __slots__ = ('seq', 'sections', 'meta', 'timestamp')
+
+    def __init__(self, sections, meta, timestamp):
+        self.seq = 1
+        self.sections = sections
+        self.meta = meta
+        self.timestamp = timestamp
+
+class LiveUpdateHub:
+    """Publishes collected samples to Socket.IO subscribers, one room per device
+
+    The collector feeds the hub through the latest metrics store, so each
+    sample is published once and only to clients subscribed to that device.
+    Viewers never trigger RouterOS calls of their own.
+
+    Interface and client tables are delta encoded: subscribers get a
+    'table_snapshot' first and then 'table_delta' events holding only the
+    changed rows and fields. Every delta names the sequence number it applies
+    to, so clients that missed one ask for a 'resync'.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = {}  # sid -> set of (device_id, table)
+        self._subscribers = {}    # (device_id, table) -> number of subscribed sids
+        self._tables = {}         # (device_id, table) -> TableState
+        self.socketio = None
+
+    def init_app(self, socketio):
+        self.socketio = socketio
+        latest_metrics.add_listener(self.publish)
+        client_tracker.add_listener(self.publish_client_events)
+
+    @staticmethod
+    def room(device_id, table=None):
+        return f"device:{device_id}:{table}" if table else f"device:{device_id}"
+
+    @staticmethod
+    def payload(sample):
+        return {
+            'device_id': sample.device_id,
+            'metrics': sample.metrics,
+            'updated_at': sample.updated_at.isoformat(),
+            'seq': sample.seq
+        }
+
+    def subscribe(self, sid, device_id, table=None):
+        """Record a subscription; returns False if it already existed"""
+        channel = (device_id, table)
+        with self._lock:
+            channels = self._subscriptions.setdefault(sid, set())
+            if channel in channels:
+                return False
+            channels.add(channel)
+            self._subscribers[channel] = self._subscribers.get(channel, 0) + 1
+            return True
+
+    def unsubscribe(self, sid, device_id, table=None):
+        channel = (device_id, table)
+        with self._lock:
+            channels = self._subscriptions.get(sid)
+            if not channels or channel not in channels:
+                return False
+            channels.discard(channel)
+            if not channels:
+                del self._subscriptions[sid]
+            self._release_locked(channel)
+            return True
+
+    def disconnect(self, sid):
+        """Forget every subscription of a disconnected client"""
+        with self._lock:
+            channels = self._subscriptions.pop(sid, set())
+            for channel in channels:
+                self._release_locked(channel)
+            return channels
+
+    def subscriber_count(self, device_id, table=None):
+        with self._lock:
+            return self._subscribers.get((device_id, table), 0)
+
+    def watched_tables(self):
+        """(device_id, table) pairs that currently have subscribers"""
+        with self._lock:
+            return [channel for channel in self._subscribers if channel[1]]
+
+    def publish(self, batch):
+        """Metrics store listener: emit each sample to its device room"""
+        if self.socketio is None:
+            return
+
+        with self._lock:
+            watched = [sample for device_id, sample in batch.items() if self._subscribers.get((device_id, None))]
+
+        for sample in watched:
+            try:
+                self.socketio.emit('device_update', self.payload(sample), to=self.room(sample.device_id))
+            except Exception as e:
+                logger.error(f"Error publishing update for device {sample.device_id}: {str(e)}")
+
+    def publish_client_events(self, device_id, events):
+        """Client tracker listener: emit joins, leaves and changes to the clients room"""
+        if self.socketio is None or not self.subscriber_count(device_id, 'clients'):
+            return
+        payload = {
+            'device_id': device_id,
+            'events': [dict(event, timestamp=event['timestamp'].isoformat()) for event in events]
+        }
+        try:
+            self.socketio.emit('client_events', payload, to=self.room(device_id, 'clients'))
+        except Exception as e:
+            logger.error(f"Error publishing client events for device {device_id}: {str(e)}")
+
+    def table_snapshot(self, device_id, table):
+        """Full 'table_snapshot' payload of the last published state, or None"""
+        with self._lock:
+            state = self._tables.get((device_id, table))
+            if state is None:
+                return None
+            return self._snapshot_locked(device_id, table, state)
+
+    def publish_table(self, device_id, table, result):
+        """Diff a poll result against the last published state and emit the change
+
+        Args:
+            device_id (int): Device the result belongs to
+            table (str): Key of LIVE_TABLES
+            result (dict): Output of get_interface_traffic or get_device_clients
+        """
+        sections_keys = LIVE_TABLES[table]
+        meta = {field: value for field, value in result.items()
+                if field not in sections_keys and field not in _UNTRACKED_FIELDS}
+        timestamp = result.get('timestamp')
+
+        with self._lock:
+            if not self._subscribers.get((device_id, table)):
+                return
+
+            state = self._tables.get((device_id, table))
+            if state is None:
+                # First poll for this table: subscribers start from a snapshot
+                sections = {
+                    section: index_rows(result.get(section) or [], key)
+                    for section, key in sections_keys.items()
+                }
+                state = TableState(sections, meta, timestamp)
+                self._tables[(device_id, table)] = state
+                event, payload = 'table_snapshot', self._snapshot_locked(device_id, table, state)
+            else:
+                changes = {}
+                sections = {}
+                failed = result.get('failed_sections') or ()
+                for section, key in sections_keys.items():
+                    if result.get('online', False) and section not in failed:
+                        rows = index_rows(result.get(section) or [], key)
+                    else:
+                        # Keep the last known rows while the device or table is unreadable
+                        rows = state.sections[section]
+                    sections[section] = rows
+
+                    upserts, removed, dropped = diff_rows(state.sections[section], rows)
+                    if upserts or removed or dropped:
+                        changes[section] = {'upsert': upserts, 'remove': removed, 'drop_fields': dropped}
+
+                meta_changes = diff_fields(state.meta, meta)
+                removed_meta = [field for field in state.meta if field not in meta]
+                state.timestamp = timestamp
+                if not changes and not meta_changes and not removed_meta:
+                    return
+
+                payload = {
+                    'device_id': device_id,
+                    'table': table,
+                    'base_seq': state.seq,
+                    'seq': state.seq + 1,
+                    'timestamp': timestamp,
+                    'sections': changes,
+                    'meta': meta_changes,
+                    'meta_removed': removed_meta
+                }
+                state.seq += 1
+                state.sections = sections
+                state.meta = meta
+                event = 'table_delta'
+
+        if self.socketio is None:
+            return
+        try:
+            self.socketio.emit(event, payload, to=self.room(device_id, table))
+        except Exception as e:
+            logger.error(f"Error publishing {table} table for device {device_id}: {str(e)}")
+
+    def _snapshot_locked(self, device_id, table, state):
+        return {
+            'device_id': device_id,
+            'table': table,
+            'seq': state.seq,
+            'timestamp': state.timestamp,
+            'sections': {section: list(rows.values()) for section, rows in state.sections.items()},
+            'meta': state.meta
+        }
+
+    def _release_locked(self, channel):
+        count = self._subscribers.get(channel, 0) - 1
+        if count > 0:
+            self._subscribers[channel] = count
+        else:
+            self._subscribers.pop(channel, None)
+            # Nobody is watching: the next subscriber starts from a fresh snapshot
+            self._tables.pop(channel, None)
+
+live_updates = LiveUpdateHub()
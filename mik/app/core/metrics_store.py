@@ -0,0 +1,99 @@
+import logging
+import threading
+import time
+from datetime import datetime
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+class MetricSample:
+    """Latest metrics collected for one device"""
+    __slots__ = ('device_id', 'metrics', 'updated_at', 'received', 'seq')
+
+    def __init__(self, device_id, metrics, seq):
+        self.device_id = device_id
+        self.metrics = metrics
+        self.updated_at = datetime.utcnow()
+        self.received = time.monotonic()
+        self.seq = seq
+
+    @property
+    def online(self):
+        return bool(self.metrics.get('online', False))
+
+    def age(self):
+        """Seconds since the sample was collected"""
+        return time.monotonic() - self.received
+
+class LatestMetricsStore:
+    """In-memory latest-value store fed by the metrics collector
+
+    Consumers read the most recent sample per device instead of polling the
+    routers themselves. Listeners are notified with every ingested batch.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._listeners = []
+        self._seq = 0
+
+    def update_many(self, device_metrics):
+        """Store a batch of samples and notify listeners
+
+        Args:
+            device_metrics: Iterable of (device_id, metrics) tuples
+
+        Returns:
+            dict: device_id -> MetricSample for the stored batch
+        """
+        batch = {}
+        with self._lock:
+            for device_id, metrics in device_metrics:
+                self._seq += 1
+                sample = MetricSample(device_id, metrics, self._seq)
+                self._samples[device_id] = sample
+                batch[device_id] = sample
+            listeners = list(self._listeners)
+
+        for listener in listeners:
+            try:
+                listener(batch)
+            except Exception as e:
+                logger.error(f"Error in metrics listener {getattr(listener, '__name__', listener)}: {str(e)}")
+
+        return batch
+
+    def update(self, device_id, metrics):
+        """Store a single sample and notify listeners"""
+        return self.update_many([(device_id, metrics)])[device_id]
+
+    def get(self, device_id):
+        """Get the latest sample for a device or None"""
+        with self._lock:
+            return self._samples.get(device_id)
+
+    def snapshot(self):
+        """Get a copy of the latest sample of every device"""
+        with self._lock:
+            return dict(self._samples)
+
+    def remove(self, device_id):
+        """Forget a device (e.g. after it was deleted)"""
+        with self._lock:
+            self._samples.pop(device_id, None)
+
+    def add_listener(self, listener):
+        """Register a callable invoked with each ingested batch"""
+        with self._lock:
+            if listener not in self._listeners:
+                self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+# Always import this as mik.app.core.metrics_store: loaded as app.core.metrics_store
+# it would be a second, separate store
+latest_metrics = LatestMetricsStore()
@@ -1,11 +1,14 @@
 import logging
 import time
 import re
+import threading
 from librouteros import connect
-from librouteros.query import Key
-from librouteros.exceptions import ConnectionClosed, FatalError, LibRouterosError
+from librouteros.exceptions import ConnectionClosed, FatalError, LibRouterosError, TrapError, MultiTrapError
 from datetime import datetime
 from mik.app.utils.security import decrypt_device_password
+from mik.app.core.connection_pool import get_connection_pool
+from mik.app.core.interface_counters import interface_counters
+from mik.app.core.pipeline import run_pipelined, proplist
 
 # Configure logger
 logger = logging.getLogger(__name__)
@@ -104,49 +107,36 @@ def get_device_metrics(device):
         from mik.app.config import Config
         timeout = getattr(Config, 'MIKROTIK_CONNECTION_TIMEOUT', 10)
         
-        # Connect to device with proper timeout
-        api = connect_to_device(
-            device.ip_address, 
-            device.username, 
-            device.password_hash, 
-            port=device.api_port, 
-            use_ssl=device.use_ssl,
-            timeout=timeout
-        )
+        # Borrow a pooled connection instead of logging in for every poll
+        pool = get_connection_pool()
+        api = pool.acquire(device, timeout=timeout)
         
         if not api:
             logger.warning(f"Could not connect to device {device.name} at {device.ip_address}")
             return {"online": False, "error": "Connection failed"}
         
-        # Use context-like pattern to ensure connection is closed
+        # Only sessions that completed the poll go back to the pool
+        reusable = False
         try:
-            # Get system resources with error handling
+            # Resource, identity and health in one pipelined round trip
             try:
-                resource = next(api.path('/system/resource').get())
-            except Exception as e:
+                snapshot = get_device_snapshot(api, device)
+            except (TrapError, MultiTrapError) as e:
                 logger.error(f"Failed to get system resources from {device.name}: {e.__class__.__name__}")
+                reusable = True
                 return {"online": False, "error": "Failed to retrieve system resources"}
             
-            # Get identity with error handling
-            try:
-                identity = next(api.path('/system/identity').get())
-            except Exception as e:
-                logger.error(f"Failed to get device identity from {device.name}: {e.__class__.__name__}")
-                identity = {"name": "Unknown"}
-            
-            # Get health if available
-            temperature = 'N/A'
-            try:
-                health = next(api.path('/system/health').get())
-                temperature = health.get('temperature', 'N/A')
-            except Exception:
-                # Health monitoring might not be available on all devices
-                pass
+            resource = snapshot["resource"]
+            identity = {"name": snapshot["identity"]}
+            temperature = snapshot["health"].get('temperature', 'N/A')
             
             # Process uptime safely
-            uptime_seconds = resource.get('uptime', 0)
+            uptime_seconds = parse_uptime(resource.get('uptime', 0))
             uptime = format_uptime(uptime_seconds)
             
+            # Uptime going back means a reboot, which resets interface counters
+            interface_counters.note_uptime(device.id, uptime_seconds)
+            
             # Safe memory calculations
             total_memory = resource.get('total-memory', 0)
             free_memory = resource.get('free-memory', 0)
@@ -185,14 +175,11 @@ def get_device_metrics(device):
                 "timestamp": datetime.now().isoformat()
             }
             
+            reusable = True
             return metrics
         finally:
-            # Always close the connection in the finally block
-            if api:
-                try:
-                    api.close()
-                except Exception as e:
-                    logger.warning(f"Error closing API connection: {e.__class__.__name__}")
+            # Always hand the connection back in the finally block
+            pool.release(api, discard=not reusable)
     
     except LibRouterosError as e:
         # Handle specific RouterOS API errors
@@ -210,6 +197,95 @@ def get_device_metrics(device):
         # Don't expose internal error details to client
         return {"online": False, "error": "Failed to retrieve device metrics"}
 
+# Resource properties read on every poll
+RESOURCE_PROPLIST = ('uptime', 'cpu-load', 'cpu-count', 'cpu-frequency', 'total-memory', 'free-memory',
+                     'total-hdd-space', 'free-hdd-space')
+
+# Rarely-changing resource properties, cached per device with the identity
+STATIC_RESOURCE_PROPLIST = ('board-name', 'architecture-name', 'version')
+
+# (device_id, ip_address) -> {"identity", "resource", "uptime", "fetched"}
+_static_info = {}
+_static_info_lock = threading.Lock()
+
+def get_device_snapshot(api, device):
+    """Read resource, identity and health of a device in one round trip
+    
+    The commands are pipelined on one connection as tagged sentences and only
+    the needed properties are requested. Identity, board name, architecture
+    and version are cached and re-read after MIKROTIK_STATIC_INFO_TTL or a
+    reboot (which may have been an upgrade).
+    
+    Args:
+        api: Active API connection
+        device: Device object
+        
+    Returns:
+        dict: {"resource": dict, "identity": str, "health": dict}
+        
+    Raises:
+        TrapError: If the resource command failed
+    """
+    from mik.app.config import Config
+    
+    key = (device.id, device.ip_address)
+    with _static_info_lock:
+        static = _static_info.get(key)
+    if static and time.monotonic() - static["fetched"] > getattr(Config, 'MIKROTIK_STATIC_INFO_TTL', 3600):
+        static = None
+    
+    commands = [
+        ('/system/resource/print', [proplist(*RESOURCE_PROPLIST if static else RESOURCE_PROPLIST + STATIC_RESOURCE_PROPLIST)]),
+        ('/system/health/print', [])
+    ]
+    if not static:
+        commands.append(('/system/identity/print', [proplist('name')]))
+    
+    results = run_pipelined(api, commands)
+    resource_result, health_result = results[0], results[1]
+    
+    if not resource_result.ok or not resource_result.rows:
+        raise resource_result.error or TrapError(message="Empty resource reply")
+    resource = resource_result.rows[0]
+    uptime_seconds = parse_uptime(resource.get('uptime', 0))
+    
+    if static and uptime_seconds < static["uptime"]:
+        # Rebooted since the cache was filled; refresh it on the next poll
+        with _static_info_lock:
+            _static_info.pop(key, None)
+    elif static:
+        static["uptime"] = uptime_seconds
+    
+    if not static:
+        identity_result = results[2]
+        if identity_result.ok and identity_result.rows:
+            identity = identity_result.rows[0].get('name', 'Unknown')
+        else:
+            logger.error(f"Failed to get device identity from {device.name}: {identity_result.error.__class__.__name__}")
+            identity = 'Unknown'
+        static = {
+            "identity": identity,
+            "resource": {field: resource.get(field) for field in STATIC_RESOURCE_PROPLIST if field in resource},
+            "uptime": uptime_seconds,
+            "fetched": time.monotonic()
+        }
+        with _static_info_lock:
+            _static_info[key] = static
+    
+    resource = dict(static["resource"], **resource)
+    
+    # Health might not be available on all devices; v6 returns one row of
+    # properties, v7 one row per sensor with name/value
+    health = {}
+    if health_result.ok:
+        for row in health_result.rows:
+            if 'name' in row and 'value' in row:
+                health[row['name']] = row['value']
+            else:
+                health.update(row)
+    
+    return {"resource": resource, "identity": static["identity"], "health": health}
+
 def get_device_clients(device):
     """Get clients connected to device
 
@@ -233,14 +309,8 @@ def get_device_clients(device):
         
         # Connect to device with proper timeout
         start_time = datetime.now()
-        api = connect_to_device(
-            device.ip_address, 
-            device.username, 
-            device.password_hash, 
-            port=device.api_port, 
-            use_ssl=device.use_ssl,
-            timeout=timeout
-        )
+        pool = get_connection_pool()
+        api = pool.acquire(device, timeout=timeout)
         
         if not api:
             logger.warning(f"Could not connect to device {device.name} at {device.ip_address}")
@@ -252,30 +322,32 @@ def get_device_clients(device):
             "wireless_clients": [],
             "dhcp_clients": [],
             "capsman_clients": [],
+            "failed_sections": [],
             "timestamp": datetime.now().isoformat(),
             "performance": {}
         }
         
-        # Use try-finally pattern to ensure connection is closed
+        # Use try-finally pattern to ensure connection is returned to the pool
+        reusable = False
         try:
-            # Get clients with concurrent execution for performance
-            tasks = [
-                ('wireless_clients', _get_wireless_clients, api),
-                ('dhcp_clients', _get_dhcp_clients, api),
-                ('capsman_clients', _get_capsman_clients, api)
-            ]
+            # Read the three client tables concurrently as tagged, pipelined requests
+            replies = run_pipelined(api, [
+                (command, [proplist(*fields)]) for _, command, fields, _ in CLIENT_TABLES
+            ])
             
-            # Execute data collection tasks
-            for key, func, api_conn in tasks:
-                try:
-                    task_start = datetime.now()
-                    result[key] = func(api_conn)
-                    task_time = (datetime.now() - task_start).total_seconds()
-                    # Track performance metrics
-                    result["performance"][key] = task_time
-                except Exception as e:
-                    logger.error(f"Error collecting {key} from {device.name}: {e.__class__.__name__}")
+            for (key, _, _, row_mapper), reply in zip(CLIENT_TABLES, replies):
+                if reply.ok:
+                    result[key] = [row_mapper(row) for row in reply.rows]
+                else:
+                    # CAPsMAN or the wireless package might not be available, not an error
+                    if key != 'capsman_clients':
+                        logger.error(f"Error collecting {key} from {device.name}: {reply.error.__class__.__name__}")
                     result[key] = []
+                    # An unreadable table is not an empty one
+                    result["failed_sections"].append(key)
+                # Track performance metrics; the tables are read in parallel, so
+                # each time runs from sending the batch to that table's reply
+                result["performance"][key] = reply.elapsed
             
             # Calculate total execution time
             result["performance"]["total_time"] = (datetime.now() - start_time).total_seconds()
@@ -283,15 +355,12 @@ def get_device_clients(device):
             # Remove performance metrics in production for security
             if not getattr(Config, 'DEBUG', False):
                 del result["performance"]
-                
+            
+            reusable = True
             return result
         finally:
-            # Always close the connection in the finally block
-            if api:
-                try:
-                    api.close()
-                except Exception as e:
-                    logger.warning(f"Error closing API connection: {e.__class__.__name__}")
+            # Always hand the connection back in the finally block
+            pool.release(api, discard=not reusable)
     
     except LibRouterosError as e:
         # Handle specific RouterOS API errors
@@ -309,83 +378,34 @@ def get_device_clients(device):
         return {"online": False, "error": "Failed to retrieve device clients"}
 
 # Helper functions for getting client data
-def _get_wireless_clients(api):
-    """Get wireless clients from device
-    
-    Args:
-        api: Active API connection
-        
-    Returns:
-        List of wireless clients
-    """
-    wireless_clients = []
-    try:
-        registrations = api.path('/interface/wireless/registration-table').get()
-        for client in registrations:
-            wireless_clients.append({
-                "mac_address": client.get('mac-address', ''),
-                "interface": client.get('interface', ''),
-                "signal_strength": client.get('signal-strength', ''),
-                "tx_rate": client.get('tx-rate', ''),
-                "rx_rate": client.get('rx-rate', ''),
-                "uptime": client.get('uptime', '')
-            })
-    except Exception as e:
-        logger.error(f"Error getting wireless clients: {e.__class__.__name__}")
-    
-    return wireless_clients
+def _wireless_client(client):
+    return {
+        "mac_address": client.get('mac-address', ''),
+        "interface": client.get('interface', ''),
+        "signal_strength": client.get('signal-strength', ''),
+        "tx_rate": client.get('tx-rate', ''),
+        "rx_rate": client.get('rx-rate', ''),
+        "uptime": client.get('uptime', '')
+    }
 
-def _get_dhcp_clients(api):
-    """Get DHCP clients from device
-    
-    Args:
-        api: Active API connection
-        
-    Returns:
-        List of DHCP clients
-    """
-    dhcp_clients = []
-    try:
-        leases = api.path('/ip/dhcp-server/lease').get()
-        for lease in leases:
-            dhcp_clients.append({
-                "mac_address": lease.get('mac-address', ''),
-                "address": lease.get('address', ''),
-                "host_name": lease.get('host-name', ''),
-                "client_id": lease.get('client-id', ''),
-                "status": lease.get('status', '')
-            })
-    except Exception as e:
-        logger.error(f"Error getting DHCP leases: {e.__class__.__name__}")
-    
-    return dhcp_clients
+def _dhcp_client(lease):
+    return {
+        "mac_address": lease.get('mac-address', ''),
+        "address": lease.get('address', ''),
+        "host_name": lease.get('host-name', ''),
+        "client_id": lease.get('client-id', ''),
+        "status": lease.get('status', '')
+    }
 
-def _get_capsman_clients(api):
-    """Get CAPsMAN clients from device
-    
-    Args:
-        api: Active API connection
-        
-    Returns:
-        List of CAPsMAN clients
-    """
-    capsman_clients = []
-    try:
-        caps_registrations = api.path('/caps-man/registration-table').get()
-        for client in caps_registrations:
-            capsman_clients.append({
-                "mac_address": client.get('mac-address', ''),
-                "interface": client.get('interface', ''),
-                "signal_strength": client.get('signal-strength', ''),
-                "tx_rate": client.get('tx-rate', ''),
-                "rx_rate": client.get('rx-rate', ''),
-                "uptime": client.get('uptime', '')
-            })
-    except Exception:
-        # CAPsMAN might not be available, not an error
-        pass
-    
-    return capsman_clients
+REGISTRATION_PROPLIST = ('mac-address', 'interface', 'signal-strength', 'tx-rate', 'rx-rate', 'uptime')
+DHCP_LEASE_PROPLIST = ('mac-address', 'address', 'host-name', 'client-id', 'status')
+
+# Client tables as (result key, print command, properties, row mapper)
+CLIENT_TABLES = (
+    ('wireless_clients', '/interface/wireless/registration-table/print', REGISTRATION_PROPLIST, _wireless_client),
+    ('dhcp_clients', '/ip/dhcp-server/lease/print', DHCP_LEASE_PROPLIST, _dhcp_client),
+    ('capsman_clients', '/caps-man/registration-table/print', REGISTRATION_PROPLIST, _wireless_client)
+)
 
 def get_interface_traffic(device, interface_name=None, include_types=None):
     """Get interface traffic for a device
@@ -418,15 +438,9 @@ def get_interface_traffic(device, interface_name=None, include_types=None):
         # Start timing for performance metrics
         start_time = datetime.now()
         
-        # Connect to device
-        api = connect_to_device(
-            device.ip_address, 
-            device.username, 
-            device.password_hash,
-            port=device.api_port, 
-            use_ssl=device.use_ssl,
-            timeout=timeout
-        )
+        # Borrow a pooled connection to the device
+        pool = get_connection_pool()
+        api = pool.acquire(device, timeout=timeout)
         
         if not api:
             logger.warning(f"Could not connect to device {device.name} at {device.ip_address}")
@@ -442,36 +456,31 @@ def get_interface_traffic(device, interface_name=None, include_types=None):
             }
         }
         
-        # Use try-finally pattern to ensure connection is closed
+        # Use try-finally pattern to ensure connection is returned to the pool
+        reusable = False
         try:
             query_start_time = datetime.now()
             
-            # Get interfaces
-            interfaces = []
-            if interface_name:
-                # Get specific interface - more efficient
-                try:
-                    interface_path = api.path('/interface')
-                    params = {Key('name'): interface_name}
-                    interface_query = interface_path.select(**params)
-                    interfaces.extend(interface_query)
-                    
-                    # If specific interface requested but not found, try case-insensitive match
-                    if not interfaces:
-                        all_interfaces = api.path('/interface').get()
-                        interfaces = [
-                            iface for iface in all_interfaces 
-                            if iface.get('name', '').lower() == interface_name.lower()
-                        ]
-                except Exception as e:
-                    logger.error(f"Error querying specific interface {interface_name}: {e.__class__.__name__}")
-                    # Fall back to getting all interfaces if specific query fails
-                    interface_query = api.path('/interface').get()
-                    interfaces.extend(interface_query)
-            else:
-                # Get all interfaces
-                interface_query = api.path('/interface').get()
-                interfaces.extend(interface_query)
+            # Read the interfaces and the uptime in one round trip; a reboot
+            # resets all counters, so check for one before taking deltas
+            interface_words = [f"?name={interface_name}"] if interface_name else []
+            interface_reply, uptime_reply = run_pipelined(api, [
+                ('/interface/print', interface_words),
+                ('/system/resource/print', [proplist('uptime')]),
+            ])
+            if uptime_reply.ok and uptime_reply.rows:
+                interface_counters.note_uptime(device.id, parse_uptime(uptime_reply.rows[0].get('uptime', 0)))
+            
+            if not interface_reply.ok:
+                logger.error(f"Error querying interfaces on {device.name}: {interface_reply.error}")
+            interfaces = list(interface_reply.rows)
+            
+            # If specific interface requested but not found, try case-insensitive match
+            if interface_name and not interfaces:
+                interfaces = [
+                    iface for iface in api.path('/interface').get()
+                    if iface.get('name', '').lower() == interface_name.lower()
+                ]
             
             # Record query time
             result["performance"]["query_time"] = (datetime.now() - query_start_time).total_seconds()
@@ -499,9 +508,19 @@ def get_interface_traffic(device, interface_name=None, include_types=None):
                     except (ValueError, TypeError):
                         rx_byte = 0
                         
-                    # Calculate speed in bits per second if possible
-                    tx_rate_bps = 0
-                    rx_rate_bps = 0
+                    try:
+                        tx_packet = int(iface.get('tx-packet', 0))
+                        rx_packet = int(iface.get('rx-packet', 0))
+                    except (ValueError, TypeError):
+                        tx_packet = rx_packet = 0
+                    
+                    # Rates from the deltas against the previous poll of this interface
+                    rates = interface_counters.rates(device.id, iface.get('name', ''), {
+                        "tx_byte": tx_byte,
+                        "rx_byte": rx_byte,
+                        "tx_packet": tx_packet,
+                        "rx_packet": rx_packet
+                    }) or {}
                     
                     # Process additional data for better information
                     disabled = iface.get('disabled', 'true')
@@ -523,14 +542,17 @@ def get_interface_traffic(device, interface_name=None, include_types=None):
                         "running": is_running,
                         "tx_byte": tx_byte,
                         "rx_byte": rx_byte,
-                        "tx_packet": int(iface.get('tx-packet', 0)),
-                        "rx_packet": int(iface.get('rx-packet', 0)),
+                        "tx_packet": tx_packet,
+                        "rx_packet": rx_packet,
                         "tx_drop": int(iface.get('tx-drop', 0)),
                         "rx_drop": int(iface.get('rx-drop', 0)),
                         "tx_error": int(iface.get('tx-error', 0)),
                         "rx_error": int(iface.get('rx-error', 0)),
-                        "tx_rate_bps": tx_rate_bps,
-                        "rx_rate_bps": rx_rate_bps,
+                        "tx_rate_bps": rates.get("tx_rate_bps", 0),
+                        "rx_rate_bps": rates.get("rx_rate_bps", 0),
+                        "tx_rate_pps": rates.get("tx_rate_pps", 0),
+                        "rx_rate_pps": rates.get("rx_rate_pps", 0),
+                        "rates_available": bool(rates),
                         "last_link_down": iface.get('last-link-down-time', ''),
                         "last_link_up": iface.get('last-link-up-time', '')
                     })
@@ -548,19 +570,18 @@ def get_interface_traffic(device, interface_name=None, include_types=None):
                 result["active_interfaces"] = sum(1 for iface in interface_data if iface["running"])
                 result["total_tx_bytes"] = sum(iface["tx_byte"] for iface in interface_data)
                 result["total_rx_bytes"] = sum(iface["rx_byte"] for iface in interface_data)
+                result["total_tx_rate_bps"] = sum(iface["tx_rate_bps"] for iface in interface_data)
+                result["total_rx_rate_bps"] = sum(iface["rx_rate_bps"] for iface in interface_data)
             
             # Remove performance metrics in production
             if not getattr(Config, 'DEBUG', False):
                 del result["performance"]
-                
+            
+            reusable = True
             return result
         finally:
-            # Always close connection
-            if api:
-                try:
-                    api.close()
-                except Exception as e:
-                    logger.warning(f"Error closing API connection: {e.__class__.__name__}")
+            # Always hand the connection back to the pool
+            pool.release(api, discard=not reusable)
     
     except LibRouterosError as e:
         # Handle specific RouterOS API errors
@@ -620,19 +641,6 @@ def send_command_to_device(device, command):
     api = None
     
     try:
-        # Establish connection with proper timeout
-        api = connect_to_device(
-            device.ip_address, 
-            device.username, 
-            device.password_hash,
-            port=device.api_port, 
-            use_ssl=device.use_ssl,
-            timeout=15  # Longer timeout for commands
-        )
-        
-        if not api:
-            return {"success": False, "message": "Could not connect to device"}
-        
         # Parse command to determine path and action
         parts = command.split()
         if len(parts) < 1:
@@ -667,12 +675,21 @@ def send_command_to_device(device, command):
             logger.warning(f"Blocked command with disallowed action: {action}")
             return {"success": False, "message": f"Action not allowed. Allowed actions: {', '.join(allowed_actions)}"}
         
+        # Borrow a pooled connection only once the command is known to be valid
+        pool = get_connection_pool()
+        api = pool.acquire(device, timeout=15)  # Longer timeout for commands
+        
+        if not api:
+            return {"success": False, "message": "Could not connect to device"}
+        
         # Execute command with proper error handling
+        reusable = False
         try:
             # Only allow safe actions
             if action == 'print' or action == 'get' or action == 'find':
                 # Fetch data with a timeout to prevent hanging
                 result = list(api.path(path).get())
+                reusable = True
                 
                 # Limit result size for security and performance
                 if len(result) > 1000:
@@ -688,9 +705,16 @@ def send_command_to_device(device, command):
             elif action == 'export':
                 # Safer alternative to some commands - export configuration
                 result = list(api.path(path).get())
+                reusable = True
                 return {"success": True, "result": result}
             else:
+                reusable = True
                 return {"success": False, "message": "Unsupported action"}
+        except (TrapError, MultiTrapError) as e:
+            # Command rejected by the router, the session itself is still usable
+            reusable = True
+            logger.error(f"MikroTik API error executing command: {e.__class__.__name__}")
+            return {"success": False, "message": f"MikroTik API error"}
         except LibRouterosError as e:
             # Specific API error, safe to log type
             logger.error(f"MikroTik API error executing command: {e.__class__.__name__}")
@@ -700,12 +724,8 @@ def send_command_to_device(device, command):
             logger.error(f"Error executing command: {e.__class__.__name__}")
             return {"success": False, "message": "Error executing command"}
         finally:
-            # Always close the connection
-            if api:
-                try:
-                    api.close()
-                except:
-                    pass
+            # Always hand the connection back to the pool
+            pool.release(api, discard=not reusable)
     except Exception as e:
         # Log error details for diagnostics but don't return them to user
         logger.error(f"Error processing command for {device.name}: {e.__class__.__name__}")
@@ -739,15 +759,9 @@ def backup_config(device, max_retries=2):
             from mik.app.config import Config
             timeout = getattr(Config, 'MIKROTIK_COMMAND_TIMEOUT', 15)
             
-            # Connect to device
-            api = connect_to_device(
-                device.ip_address, 
-                device.username, 
-                device.password_hash,
-                port=device.api_port, 
-                use_ssl=device.use_ssl,
-                timeout=timeout
-            )
+            # Borrow a pooled connection to the device
+            pool = get_connection_pool()
+            api = pool.acquire(device, timeout=timeout)
             
             if not api:
                 logger.warning(f"Could not connect to device {device.name} at {device.ip_address} for backup")
@@ -762,6 +776,7 @@ def backup_config(device, max_retries=2):
                     return {"success": False, "error": "Connection failed"}
             
             # Once connected, use try-finally to ensure proper cleanup
+            reusable = False
             try:
                 # Check router version and capabilities to properly handle backup
                 system_resource = next(api.path('/system/resource').get(), None)
@@ -873,14 +888,12 @@ def backup_config(device, max_retries=2):
                 # Log successful backup
                 logger.info(f"Backup created successfully for {device.name}, size: {backup_info['size']} bytes")
                 
+                reusable = True
                 return backup_info
             finally:
-                # Always close the connection
-                if api:
-                    try:
-                        api.close()
-                    except Exception as e:
-                        logger.warning(f"Error closing API connection: {e.__class__.__name__}")
+                # Always hand the connection back; failed attempts retry on a fresh session
+                pool.release(api, discard=not reusable)
+                api = None
                         
         except LibRouterosError as e:
             # Handle specific RouterOS API errors
@@ -1035,6 +1048,9 @@ def restore_config(device, backup_file_name, max_retries=2):
                     api.close()
                     api = None  # Prevent double-closing in finally block
                     
+                    # Pooled sessions will not survive the reboot
+                    get_connection_pool().purge(device)
+                    
                     # Wait for device to go offline and come back online
                     logger.info(f"Waiting for {device.name} to restart after restore...")
                     
@@ -1228,6 +1244,34 @@ def calculate_percentage(used, total):
         return 0
     return round((used / total) * 100, 2)
 
+# RouterOS duration units, e.g. "1w2d3h4m5s"
+_DURATION_UNITS = {'w': 604800, 'd': 86400, 'h': 3600, 'm': 60, 's': 1}
+_DURATION_RE = re.compile(r'(\d+)([wdhms])')
+_CLOCK_RE = re.compile(r'(\d+):(\d{2}):(\d{2})$')
+
+def parse_uptime(value):
+    """Convert a RouterOS uptime ("1w2d3h4m5s", "00:01:02" or seconds) to seconds"""
+    if isinstance(value, (int, float)):
+        return int(value)
+    if not value:
+        return 0
+    
+    value = str(value).strip()
+    if value.isdigit():
+        return int(value)
+    
+    seconds = 0
+    clock = _CLOCK_RE.search(value)
+    if clock:
+        # Older versions print the sub-day part as hh:mm:ss
+        hours, minutes, secs = clock.groups()
+        seconds = int(hours) * 3600 + int(minutes) * 60 + int(secs)
+        value = value[:clock.start()]
+    
+    for amount, unit in _DURATION_RE.findall(value):
+        seconds += int(amount) * _DURATION_UNITS[unit]
+    return seconds
+
 def format_uptime(seconds):
     """Format uptime in seconds to a readable string"""
     if not seconds:
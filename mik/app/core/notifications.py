@@ -0,0 +1,355 @@
+import heapq
+import itertools
+import logging
+import queue
+import random
+import smtplib
+import threading
+import time
+from collections import deque
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+import requests
+from requests.adapters import HTTPAdapter
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# Telegram rejects messages longer than this
+TELEGRAM_MAX_LENGTH = 4096
+
+DIGEST_SEPARATOR = "\n" + "-" * 40 + "\n"
+
+class NotificationError(Exception):
+    """Delivery failure; permanent errors are not retried"""
+
+    def __init__(self, message, permanent=False, retry_after=None):
+        super().__init__(message)
+        self.permanent = permanent
+        self.retry_after = retry_after
+
+class Notification:
+    """One queued alert message for a channel
+
+    `target` holds the channel's delivery settings (SMTP server and
+    recipients, or bot token and chat). Notifications with the same target
+    can be merged into a digest.
+    """
+    __slots__ = ('channel', 'target', 'subject', 'message', 'attempts')
+
+    def __init__(self, channel, target, subject, message):
+        self.channel = channel
+        self.target = target
+        self.subject = subject
+        self.message = message
+        self.attempts = 0
+
+class RateLimiter:
+    """Token bucket allowing `rate_per_minute` sends with short bursts
+
+    A rate of 0 or less disables the limit.
+    """
+
+    def __init__(self, rate_per_minute, burst=1):
+        self.rate = max(0, rate_per_minute) / 60.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def wait(self, stop_event):
+        """Block until a token is available; returns False if stopped meanwhile"""
+        if not self.rate:
+            return not stop_event.is_set()
+        while not stop_event.is_set():
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            stop_event.wait((1 - self.tokens) / self.rate)
+        return False
+
+class SmtpTransport:
+    """Keeps one SMTP session open and reuses it between messages"""
+
+    def __init__(self, timeout, idle_timeout):
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self._server = None
+        self._key = None
+        self._last_used = 0
+
+    def send(self, target, subject, message):
+        msg = MIMEMultipart()
+        msg['From'] = target['mail_from']
+        msg['To'] = ', '.join(target['recipients'])
+        msg['Subject'] = subject
+        msg.attach(MIMEText(message, 'plain'))
+
+        try:
+            try:
+                self._session(target).send_message(msg, to_addrs=list(target['recipients']))
+            except smtplib.SMTPServerDisconnected:
+                # The server dropped the idle session; reconnect once
+                self.close()
+                self._session(target).send_message(msg, to_addrs=list(target['recipients']))
+        except smtplib.SMTPResponseException as e:
+            self.close()
+            raise NotificationError(f"SMTP error {e.smtp_code}: {e.smtp_error}", permanent=500 <= e.smtp_code < 600)
+        except smtplib.SMTPRecipientsRefused as e:
+            raise NotificationError(f"SMTP recipients refused: {e.recipients}", permanent=True)
+        except (smtplib.SMTPException, OSError) as e:
+            self.close()
+            raise NotificationError(f"SMTP error: {str(e)}")
+
+        self._last_used = time.monotonic()
+
+    def close_idle(self):
+        if self._server is not None and time.monotonic() - self._last_used > self.idle_timeout:
+            self.close()
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+            self._server = None
+            self._key = None
+
+    def _session(self, target):
+        key = (target['mail_server'], target['mail_port'], target['mail_use_tls'],
+               target['mail_username'], target['mail_password'])
+        if self._server is not None and self._key == key:
+            return self._server
+
+        self.close()
+        server = smtplib.SMTP(target['mail_server'], target['mail_port'], timeout=self.timeout)
+        try:
+            if target['mail_use_tls']:
+                server.starttls()
+            server.login(target['mail_username'], target['mail_password'])
+        except Exception:
+            server.close()
+            raise
+        self._server = server
+        self._key = key
+        self._last_used = time.monotonic()
+        return server
+
+class TelegramTransport:
+    """Sends messages through a pooled HTTP session"""
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
+
+    def send(self, target, subject, message):
+        api_url = f"https://api.telegram.org/bot{target['bot_token']}/sendMessage"
+        payload = {
+            'chat_id': target['chat_id'],
+            'text': message[:TELEGRAM_MAX_LENGTH],
+            'parse_mode': 'Markdown'
+        }
+
+        try:
+            response = self.session.post(api_url, data=payload, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise NotificationError(f"Telegram request failed: {str(e)}")
+
+        if response.status_code == 200:
+            return
+        if response.status_code == 429:
+            try:
+                retry_after = response.json().get('parameters', {}).get('retry_after')
+            except ValueError:
+                retry_after = None
+            raise NotificationError("Telegram rate limit hit", retry_after=retry_after)
+        raise NotificationError(f"Telegram API error: {response.text}", permanent=response.status_code < 500)
+
+    def close_idle(self):
+        pass
+
+    def close(self):
+        self.session.close()
+
+class ChannelWorker(threading.Thread):
+    """Delivers the notifications of one channel
+
+    Sends are rate limited; whatever queues up for the same target while the
+    worker waits for the limiter (or for a slow server) goes out as a single
+    digest. Failed sends are retried with exponential backoff.
+    """
+
+    def __init__(self, channel, transport, rate_per_minute, burst, queue_size,
+                 max_retries, retry_backoff, digest_max):
+        super().__init__(name=f"notify-{channel}", daemon=True)
+        self.channel = channel
+        self.transport = transport
+        self.limiter = RateLimiter(rate_per_minute, burst)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.digest_max = digest_max
+        self.stop_event = threading.Event()
+        self._pending = deque()
+        self._retries = []
+        self._counter = itertools.count()
+
+    def submit(self, notification):
+        try:
+            self.queue.put_nowait(notification)
+            return True
+        except queue.Full:
+            logger.error(f"{self.channel} notification queue is full, dropping alert: {notification.subject}")
+            return False
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        while not self.stop_event.is_set():
+            batch = self._next()
+            if batch is None:
+                self.transport.close_idle()
+                continue
+
+            # Storms pile up here while the limiter holds us back
+            if not self.limiter.wait(self.stop_event):
+                break
+
+            batch.extend(self._collect(batch[0].target, self.digest_max - len(batch)))
+            self._deliver(batch)
+
+        self.transport.close()
+
+    def _next(self):
+        """Next batch: due retries first, then held back, then new notifications"""
+        now = time.monotonic()
+        if self._retries and self._retries[0][0] <= now:
+            return heapq.heappop(self._retries)[2]
+        if self._pending:
+            return [self._pending.popleft()]
+
+        timeout = 1.0
+        if self._retries:
+            timeout = min(timeout, self._retries[0][0] - now)
+        try:
+            return [self.queue.get(timeout=max(timeout, 0.01))]
+        except queue.Empty:
+            return None
+
+    def _collect(self, target, limit):
+        """Take up to `limit` queued notifications for the same target"""
+        batch = []
+        others = deque()
+        for source in (self._pending, None):
+            while len(batch) < limit:
+                try:
+                    item = source.popleft() if source is not None else self.queue.get_nowait()
+                except (IndexError, queue.Empty):
+                    break
+                if item.target == target:
+                    batch.append(item)
+                else:
+                    others.append(item)
+        others.extend(self._pending)
+        self._pending = others
+        return batch
+
+    def _deliver(self, batch):
+        if len(batch) == 1:
+            subject, message = batch[0].subject, batch[0].message
+        else:
+            subject = f"MikroTik Monitor: {len(batch)} alerts"
+            message = DIGEST_SEPARATOR.join(item.message for item in batch)
+
+        try:
+            self.transport.send(batch[0].target, subject, message)
+            logger.info(f"{self.channel} notification sent: {subject}")
+            return
+        except NotificationError as e:
+            error = e
+        except Exception as e:
+            error = NotificationError(str(e))
+
+        retry = []
+        for item in batch:
+            item.attempts += 1
+            if error.permanent or item.attempts > self.max_retries:
+                logger.error(f"Giving up on {self.channel} notification '{item.subject}': {str(error)}")
+            else:
+                retry.append(item)
+
+        if retry:
+            # Retry the batch as a unit so it still goes out as one digest
+            attempts = max(item.attempts for item in retry)
+            delay = error.retry_after or self.retry_backoff * 2 ** (attempts - 1)
+            delay *= random.uniform(1.0, 1.25)
+            heapq.heappush(self._retries, (time.monotonic() + delay, next(self._counter), retry))
+            logger.warning(f"{self.channel} notification failed ({str(error)}), {len(retry)} alerts queued for retry")
+
+class NotificationDispatcher:
+    """Background delivery of alert notifications, one worker per channel"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._workers = {}
+
+    def submit(self, notification):
+        """Queue a notification; returns False if it had to be dropped"""
+        return self._worker(notification.channel).submit(notification)
+
+    def shutdown(self):
+        with self._lock:
+            workers = list(self._workers.values())
+            self._workers = {}
+        for worker in workers:
+            worker.stop()
+
+    def _worker(self, channel):
+        with self._lock:
+            worker = self._workers.get(channel)
+            if worker is None or not worker.is_alive():
+                worker = self._create_worker(channel)
+                worker.start()
+                self._workers[channel] = worker
+            return worker
+
+    def _create_worker(self, channel):
+        from mik.app.config import Config
+
+        if channel == 'email':
+            transport = SmtpTransport(
+                timeout=getattr(Config, 'NOTIFY_SMTP_TIMEOUT', 15),
+                idle_timeout=getattr(Config, 'NOTIFY_SMTP_IDLE_TIMEOUT', 60)
+            )
+        elif channel == 'telegram':
+            transport = TelegramTransport(timeout=getattr(Config, 'NOTIFY_HTTP_TIMEOUT', 10))
+        else:
+            raise ValueError(f"Unknown notification channel: {channel}")
+
+        rate_limits = getattr(Config, 'NOTIFY_RATE_LIMITS', {})
+        return ChannelWorker(
+            channel,
+            transport,
+            rate_per_minute=rate_limits.get(channel, 20),
+            burst=getattr(Config, 'NOTIFY_RATE_BURST', 5),
+            queue_size=getattr(Config, 'NOTIFY_QUEUE_SIZE', 1000),
+            max_retries=getattr(Config, 'NOTIFY_MAX_RETRIES', 5),
+            retry_backoff=getattr(Config, 'NOTIFY_RETRY_BACKOFF', 2),
+            digest_max=getattr(Config, 'NOTIFY_DIGEST_MAX', 50)
+        )
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+def get_notification_dispatcher():
+    """Get the process-wide notification dispatcher"""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = NotificationDispatcher()
+        return _dispatcher
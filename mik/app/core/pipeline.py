@@ -0,0 +1,118 @@
+import logging
+import time
+from librouteros.protocol import parse_word
+from librouteros.exceptions import TrapError, MultiTrapError
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+class CommandResult:
+    """Reply of one pipelined command"""
+    __slots__ = ('rows', 'traps', 'elapsed', 'ret')
+
+    def __init__(self):
+        self.rows = []
+        self.traps = []
+        self.elapsed = None  # Seconds from sending the batch to this command's !done
+        self.ret = None      # =ret= value of the !done reply, e.g. of a count-only print
+
+    @property
+    def ok(self):
+        return not self.traps
+
+    @property
+    def error(self):
+        return self.traps[0] if self.traps else None
+
+def proplist(*fields):
+    """API word limiting a print to the given properties"""
+    return f"=.proplist={','.join(fields)}"
+
+def run_pipelined(api, commands):
+    """Send several commands at once and collect their tagged replies
+
+    All sentences are written before any reply is read, so the commands cost
+    one network round trip instead of one each. RouterOS answers them
+    concurrently; replies are told apart by their .tag word.
+
+    Traps are collected per command rather than raised. Any other exception
+    leaves unread replies on the connection, which must then be discarded.
+
+    Args:
+        api: Connected librouteros Api
+        commands: Sequence of (command, words) tuples, e.g.
+            ('/system/resource/print', [proplist('uptime', 'cpu-load')])
+
+    Returns:
+        list: CommandResult per command, in the order given
+    """
+    protocol = api.protocol
+    started = time.perf_counter()
+    for tag, (command, words) in enumerate(commands):
+        protocol.writeSentence(command, *words, f".tag={tag}")
+
+    results = [CommandResult() for _ in commands]
+    pending = set(range(len(commands)))
+    while pending:
+        reply_word, words = protocol.readSentence()
+
+        tag, attributes = _parse_reply(words)
+        if tag not in pending:
+            logger.debug(f"Ignoring {reply_word} reply with unexpected tag {tag}")
+            continue
+
+        if reply_word == '!re':
+            results[tag].rows.append(attributes)
+        elif reply_word == '!trap':
+            results[tag].traps.append(_trap(attributes))
+        elif reply_word == '!done':
+            results[tag].elapsed = time.perf_counter() - started
+            results[tag].ret = attributes.get('ret')
+            pending.discard(tag)
+
+    return results
+
+def stream_command(api, command, words=()):
+    """Yield the reply rows of one command as they arrive
+
+    Unlike Api.readResponse, rows are not collected into a list, so memory
+    stays flat however large the table is. The connection can only be reused
+    once the generator has been exhausted.
+
+    Raises:
+        TrapError: If one !trap was received (after all rows were yielded)
+        MultiTrapError: If more than one !trap was received
+    """
+    protocol = api.protocol
+    protocol.writeSentence(command, *words)
+
+    traps = []
+    while True:
+        reply_word, reply_words = protocol.readSentence()
+        _, attributes = _parse_reply(reply_words)
+        if reply_word == '!re':
+            yield attributes
+        elif reply_word == '!trap':
+            traps.append(_trap(attributes))
+        elif reply_word == '!done':
+            break
+
+    if len(traps) > 1:
+        raise MultiTrapError(*traps)
+    if traps:
+        raise traps[0]
+
+def _parse_reply(words):
+    """Split reply words into the .tag value and the attribute dictionary"""
+    tag = None
+    attributes = {}
+    for word in words:
+        if word.startswith('.tag='):
+            tag = int(word[5:])
+        elif word.startswith('='):
+            key, value = parse_word(word)
+            attributes[key] = value
+    return tag, attributes
+
+def _trap(attributes):
+    return TrapError(message=str(attributes.get('message', '')), category=attributes.get('category'))
@@ -0,0 +1,191 @@
+import logging
+import operator
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from mik.app.database.models import AlertRule
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# Alert rule conditions compiled to comparison callables
+CONDITIONS = {
+    '>': operator.gt,
+    '<': operator.lt,
+    '>=': operator.ge,
+    '<=': operator.le,
+    '==': operator.eq
+}
+
+class CompiledRule:
+    """Detached, pre-compiled copy of an enabled AlertRule"""
+    __slots__ = ('id', 'name', 'device_id', 'metric', 'condition', 'threshold', 'duration',
+                 'notify_email', 'notify_telegram', 'email_recipients', 'message_template', 'check')
+
+    def __init__(self, rule):
+        self.id = rule.id
+        self.name = rule.name
+        self.device_id = rule.device_id
+        self.metric = rule.metric
+        self.condition = rule.condition
+        self.threshold = rule.threshold
+        self.duration = rule.duration or 0
+        self.notify_email = rule.notify_email
+        self.notify_telegram = rule.notify_telegram
+        self.email_recipients = rule.email_recipients
+        self.message_template = rule.message_template
+
+        compare = CONDITIONS[rule.condition]
+        threshold = rule.threshold
+        self.check = lambda value: compare(value, threshold)
+
+    @property
+    def signature(self):
+        """Fields that affect evaluation; a change resets the rule's window"""
+        return (self.device_id, self.metric, self.condition, self.threshold, self.duration)
+
+class AlertRuleIndex:
+    """Enabled alert rules indexed by device and metric
+
+    Committed AlertRule inserts, updates and deletes invalidate single
+    rules, which are reloaded on the next refresh(). A full reload also
+    happens every refresh_interval seconds to pick up changes made outside
+    this process.
+    """
+
+    def __init__(self, refresh_interval=None):
+        if refresh_interval is None:
+            from mik.app.config import Config
+            refresh_interval = getattr(Config, 'ALERT_RULE_INDEX_REFRESH', 300)
+
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._rules = {}      # rule_id -> CompiledRule
+        self._by_device = {}  # device_id -> {metric: {rule_id: CompiledRule}}
+        self._dirty = set()
+        self._loaded_at = None
+
+    def invalidate(self, rule_id=None):
+        """Mark one rule (or, with no ID, the whole index) for reloading"""
+        with self._lock:
+            if rule_id is None:
+                self._loaded_at = None
+            else:
+                self._dirty.add(rule_id)
+
+    def refresh(self):
+        """Reload invalidated rules; must be called within an application context
+
+        Returns:
+            set: IDs of rules that were added, removed or changed
+        """
+        with self._lock:
+            full = self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_interval
+            dirty = self._dirty
+            self._dirty = set()
+
+        if not full and not dirty:
+            return set()
+
+        if full:
+            rows = AlertRule.query.filter_by(enabled=True).all()
+            reload_ids = None
+        else:
+            rows = AlertRule.query.filter(AlertRule.id.in_(dirty)).all()
+            reload_ids = dirty
+
+        compiled = {}
+        for row in rows:
+            if not row.enabled:
+                continue
+            if row.condition not in CONDITIONS:
+                logger.warning(f"Alert rule {row.id} has unsupported condition {row.condition}")
+                continue
+            compiled[row.id] = CompiledRule(row)
+
+        with self._lock:
+            if reload_ids is None:
+                reload_ids = set(self._rules) | set(compiled)
+                self._loaded_at = time.monotonic()
+
+            changed = set()
+            for rule_id in reload_ids:
+                old = self._rules.get(rule_id)
+                new = compiled.get(rule_id)
+                if old is not None and new is not None and old.signature == new.signature:
+                    # Same evaluation semantics, just refresh names/notification settings
+                    self._replace_locked(old, new)
+                    continue
+                if old is not None:
+                    self._remove_locked(old)
+                    changed.add(rule_id)
+                if new is not None:
+                    self._add_locked(new)
+                    changed.add(rule_id)
+
+        if changed:
+            logger.debug(f"Alert rule index updated, {len(changed)} rules changed")
+        return changed
+
+    def rules_for(self, device_id):
+        """Get {metric: [CompiledRule]} for a device"""
+        with self._lock:
+            by_metric = self._by_device.get(device_id)
+            if not by_metric:
+                return {}
+            return {metric: list(rules.values()) for metric, rules in by_metric.items()}
+
+    def rule_ids(self):
+        with self._lock:
+            return set(self._rules)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._rules)
+
+    def track_changes(self):
+        """Invalidate AlertRule rows as their inserts, updates and deletes are committed"""
+        for event_name in ('after_insert', 'after_update', 'after_delete'):
+            event.listen(AlertRule, event_name, self._on_rule_change)
+        event.listen(Session, 'after_commit', self._on_commit)
+        event.listen(Session, 'after_rollback', self._on_rollback)
+
+    # Internal helpers
+    @property
+    def _session_key(self):
+        return f'alert_rules_changed_{id(self)}'
+
+    def _on_rule_change(self, mapper, connection, target):
+        # Remember flushed rules until the transaction commits
+        session = object_session(target)
+        if session is not None:
+            session.info.setdefault(self._session_key, set()).add(target.id)
+
+    def _on_commit(self, session):
+        for rule_id in session.info.pop(self._session_key, ()):
+            self.invalidate(rule_id)
+
+    def _on_rollback(self, session):
+        session.info.pop(self._session_key, None)
+
+    def _add_locked(self, rule):
+        self._rules[rule.id] = rule
+        self._by_device.setdefault(rule.device_id, {}).setdefault(rule.metric, {})[rule.id] = rule
+
+    def _replace_locked(self, old, new):
+        self._rules[new.id] = new
+        self._by_device[new.device_id][new.metric][new.id] = new
+
+    def _remove_locked(self, rule):
+        self._rules.pop(rule.id, None)
+        by_metric = self._by_device.get(rule.device_id, {})
+        rules = by_metric.get(rule.metric, {})
+        rules.pop(rule.id, None)
+        if not rules:
+            by_metric.pop(rule.metric, None)
+        if not by_metric:
+            self._by_device.pop(rule.device_id, None)
+
+alert_rule_index = AlertRuleIndex()
+alert_rule_index.track_changes()
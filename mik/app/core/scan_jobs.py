@@ -0,0 +1,255 @@
+import asyncio
+import ipaddress
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from mik.app.core.discovery import scan_network_async
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+# Job states after which nothing changes any more
+FINISHED_STATES = ('completed', 'cancelled', 'failed')
+
+# Tries at writing the final state of a job before its results are given up on
+FINAL_FLUSH_ATTEMPTS = 3
+
+def scan_room(job_id):
+    """Socket.IO room receiving the events of one scan job"""
+    return f"scan:{job_id}"
+
+def host_count(network):
+    """Number of addresses network.hosts() yields"""
+    # /31 and /32 networks have no network or broadcast address to leave out
+    return network.num_addresses if network.num_addresses <= 2 else network.num_addresses - 2
+
+class ScanJob:
+    """A network scan running in the background
+
+    Found devices are appended in the order they are discovered, so readers
+    follow a job by remembering how many devices they have already seen.
+    """
+
+    def __init__(self, subnet, network, concurrency, timeout, skip, requested_by=None):
+        self.id = uuid.uuid4().hex
+        self.subnet = subnet
+        self.network = network
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.skip = skip
+        self.requested_by = requested_by
+        self.status = 'running'
+        self.error = None
+        self.total = host_count(network) - len(skip)
+        self.scanned = 0
+        self.devices = []
+        self.created_at = datetime.utcnow()
+        self.finished_at = None
+        self.finished = None  # Monotonic time the job finished
+        self.cancel_event = threading.Event()
+        self.changed = threading.Condition()
+
+    @property
+    def done(self):
+        return self.status in FINISHED_STATES
+
+    def progress(self):
+        """Counters of the job, as returned by the API and the progress events"""
+        return {
+            'id': self.id,
+            'subnet': self.subnet,
+            'status': self.status,
+            'total': self.total,
+            'scanned': self.scanned,
+            'skipped': len(self.skip),
+            'found': len(self.devices),
+            'requested_by': self.requested_by,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+    def wait(self, seen, timeout):
+        """Block until more than `seen` devices were found, the job ended or timeout passed
+
+        Returns:
+            tuple: (new devices, progress dictionary)
+        """
+        with self.changed:
+            self.changed.wait_for(lambda: len(self.devices) > seen or self.done, timeout=timeout)
+            return self.devices[seen:], self.progress()
+
+class ScanJobManager:
+    """Runs network scans as background jobs and streams their results
+
+    Each job runs its asyncio scanner on a thread of its own. Found devices
+    and counters are pushed to the job's Socket.IO room as they happen and
+    written to the database every flush interval by a writer thread, so a
+    job's results can be read while it runs and after it finished. Hosts
+    found by earlier scans within DISCOVERY_KNOWN_TTL can be skipped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs = {}  # job_id -> ScanJob
+
+    def start(self, app, subnet, concurrency=None, timeout=2, skip_known=False, requested_by=None):
+        """Start scanning a subnet in the background
+
+        Args:
+            app: Flask application the job thread runs in
+            subnet (str): Network in CIDR notation
+            concurrency (int, optional): Maximum probe connections in flight
+            timeout (float): Seconds to wait for each connection
+            skip_known (bool): Don't probe hosts found by recent scans
+            requested_by (str, optional): User who started the scan
+
+        Returns:
+            ScanJob, or None if too many scans are running already
+        """
+        from mik.app.config import Config
+        from mik.app.database.crud import create_network_scan, get_known_scan_hosts
+
+        network = ipaddress.ip_network(subnet, strict=False)
+
+        with self._lock:
+            self._prune_locked(getattr(Config, 'DISCOVERY_JOB_RETENTION', 3600))
+            running = sum(1 for job in self._jobs.values() if not job.done)
+            if running >= getattr(Config, 'DISCOVERY_MAX_JOBS', 2):
+                return None
+
+            skip = set()
+            if skip_known:
+                since = datetime.utcnow() - timedelta(seconds=getattr(Config, 'DISCOVERY_KNOWN_TTL', 86400))
+                skip = {ip for ip in get_known_scan_hosts(since) if ipaddress.ip_address(ip) in network}
+
+            job = ScanJob(str(network), network, concurrency, timeout, skip, requested_by)
+            self._jobs[job.id] = job
+
+        create_network_scan(job.id, job.subnet, job.total, skipped=len(skip), requested_by=requested_by)
+
+        thread = threading.Thread(target=self._run, args=(app, job), name=f"scan-{job.id[:8]}", daemon=True)
+        thread.start()
+        return job
+
+    def get(self, job_id):
+        """Get a job of this process that is running or finished recently, or None"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def fail_orphans(self):
+        """Mark scans left 'running' by a stopped process as failed (needs an app context)
+
+        Returns:
+            int: Number of scans marked failed
+        """
+        from mik.app.config import Config
+        from mik.app.database.crud import fail_orphaned_network_scans
+
+        with self._lock:
+            running = [job_id for job_id, job in self._jobs.items() if not job.done]
+        stale_before = datetime.utcnow() - timedelta(seconds=getattr(Config, 'DISCOVERY_ORPHAN_TIMEOUT', 60))
+        return fail_orphaned_network_scans(stale_before, exclude=running)
+
+    def cancel(self, job_id):
+        """Ask a running job to stop; returns False if it is unknown or already finished"""
+        job = self.get(job_id)
+        if job is None or job.done:
+            return False
+        job.cancel_event.set()
+        return True
+
+    def _run(self, app, job):
+        from mik.app.config import Config
+        from mik.app.database.crud import save_scan_progress
+
+        socketio = app.extensions.get('socketio')
+        flush_interval = getattr(Config, 'DISCOVERY_FLUSH_INTERVAL', 2)
+        saved = 0  # Devices written so far; the next one gets this position
+        last_progress = 0
+        stop_writer = threading.Event()
+
+        def emit(event, payload):
+            if socketio is None:
+                return
+            try:
+                socketio.emit(event, payload, to=scan_room(job.id))
+            except Exception as e:
+                logger.error(f"Error publishing {event} for scan {job.id}: {str(e)}")
+
+        def flush(**fields):
+            # Devices not yet written stay in job.devices until a write succeeds
+            nonlocal saved
+            with job.changed:
+                devices = job.devices[saved:]
+                scanned, found = job.scanned, len(job.devices)
+            if not save_scan_progress(job.id, devices, start_seq=saved, scanned=scanned, found=found, **fields):
+                return False
+            saved += len(devices)
+            return True
+
+        def write_progress():
+            # Database writes happen here, so a slow database never stalls the probes
+            with app.app_context():
+                while not stop_writer.wait(flush_interval):
+                    if not flush():
+                        logger.warning(f"Could not save progress of scan {job.id}, retrying")
+
+        def on_host(ip, device):
+            nonlocal last_progress
+            with job.changed:
+                job.scanned += 1
+                if device:
+                    job.devices.append(device)
+                job.changed.notify_all()
+
+            if device:
+                emit('scan_device', {'job_id': job.id, 'device': device})
+            now = time.monotonic()
+            if now - last_progress >= 0.5:
+                last_progress = now
+                emit('scan_progress', job.progress())
+
+        writer = threading.Thread(target=write_progress, name=f"scan-writer-{job.id[:8]}", daemon=True)
+        writer.start()
+
+        with app.app_context():
+            try:
+                asyncio.run(scan_network_async(job.network, job.concurrency, job.timeout, skip=job.skip,
+                                               cancel=job.cancel_event, on_host=on_host))
+                status = 'cancelled' if job.cancel_event.is_set() else 'completed'
+            except Exception as e:
+                logger.error(f"Error in network scan {job.id}: {str(e)}")
+                job.error = f"Error in network scan: {str(e)}"
+                status = 'failed'
+
+            with job.changed:
+                job.status = status
+                job.finished_at = datetime.utcnow()
+                job.finished = time.monotonic()
+                job.changed.notify_all()
+
+            stop_writer.set()
+            writer.join()
+            for attempt in range(FINAL_FLUSH_ATTEMPTS):
+                if flush(status=job.status, error=job.error, finished_at=job.finished_at):
+                    break
+                time.sleep(flush_interval)
+            else:
+                logger.error(f"Could not save the results of scan {job.id}")
+            emit('scan_progress', job.progress())
+            emit('scan_finished', job.progress())
+            logger.info(f"Network scan {job.id} of {job.subnet} {job.status}: "
+                        f"{len(job.devices)} devices found, {job.scanned}/{job.total} hosts scanned")
+
+    def _prune_locked(self, retention):
+        # Finished jobs stay readable from memory for a while, then only from the database
+        now = time.monotonic()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.done and now - job.finished > retention]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+scan_jobs = ScanJobManager()
@@ -0,0 +1,259 @@
+import hashlib
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+
+# Configure logger
+logger = logging.getLogger(__name__)
+
+_EPOCH = datetime(1970, 1, 1)
+
+# Link fields that make up a device's link signature
+LINK_FIELDS = ('target_id', 'kind', 'source_interface', 'source_ip', 'target_ip')
+
+def link_signature(links):
+    """Stable hash of the links one device sees"""
+    rows = sorted(tuple(str(link.get(field)) for field in LINK_FIELDS) for link in links)
+    return hashlib.sha1(repr(rows).encode()).hexdigest()
+
+def _node(device):
+    return {
+        "id": device.id,
+        "name": device.name,
+        "ip_address": device.ip_address,
+        "type": "router",
+        "model": device.model or "Unknown",
+        "group": 1  # Default group
+    }
+
+def _edge(a, b, seen_by_a, seen_by_b):
+    """Merge what two devices see of each other into one undirected link"""
+    # Orient the link from the device with the better view of it: ARP over route, the lower ID on a tie
+    if seen_by_a is None or (seen_by_b is not None and seen_by_b['kind'] == 'arp' and seen_by_a['kind'] != 'arp'):
+        a, b, seen_by_a, seen_by_b = b, a, seen_by_b, seen_by_a
+    return {
+        "source": a,
+        "target": b,
+        "value": 1,
+        "interface_name": seen_by_a.get('source_interface') or "",
+        "source_interface": seen_by_a.get('source_interface') or "",
+        "target_interface": (seen_by_b or {}).get('source_interface') or "",
+        "source_ip": seen_by_a.get('source_ip'),
+        "target_ip": seen_by_a.get('target_ip')
+    }
+
+class TopologyGraph:
+    """Network topology kept in memory and synced from the stored device links
+
+    Background refreshes store each device's links in the database. Readers
+    call sync(), which reloads only the devices whose links changed since
+    the last sync (at most once per TOPOLOGY_SYNC_INTERVAL), so requests
+    never talk to the routers.
+
+    Every change to a node or link bumps the graph version and is kept in a
+    bounded change log. Clients pass back the version and graph ID they hold
+    to get just the changes since; a different graph ID (e.g. after a
+    restart) or a version older than the log means a full snapshot.
+    """
+
+    def __init__(self, changelog_size=None):
+        from mik.app.config import Config
+
+        self._lock = threading.RLock()
+        self.graph_id = uuid.uuid4().hex[:12]
+        self.version = 0
+        self._nodes = {}       # device_id -> node
+        self._adjacency = {}   # device_id -> {target_id: link seen by device_id}
+        self._changed = {}     # device_id -> changed_at of the loaded links
+        self._edges = {}       # (lower id, higher id) -> link
+        self._incident = {}    # device_id -> set of edge keys
+        self._changes = deque(maxlen=changelog_size or getattr(Config, 'TOPOLOGY_CHANGELOG_SIZE', 1000))
+        self._synced = None
+
+    def sync(self, force=False):
+        """Pick up device and link changes from the database (needs an app context)"""
+        from mik.app.config import Config
+        from mik.app.database.crud import get_all_devices, get_topology_states, get_topology_links
+
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._synced is not None and \
+                    now - self._synced < getattr(Config, 'TOPOLOGY_SYNC_INTERVAL', 5):
+                return self.version
+            self._synced = now
+
+            self._set_nodes({device.id: _node(device) for device in get_all_devices()})
+
+            stale = {state.device_id: state.changed_at for state in get_topology_states()
+                     if state.device_id in self._nodes and state.changed_at != self._changed.get(state.device_id)}
+            if stale:
+                seen = {device_id: {} for device_id in stale}
+                for row in get_topology_links(stale):
+                    seen[row.device_id][row.target_id] = row.to_dict()
+                for device_id, links in seen.items():
+                    self._set_links(device_id, links)
+                    self._changed[device_id] = stale[device_id]
+            return self.version
+
+    def snapshot(self):
+        """Full graph in the /api/topology/map format"""
+        with self._lock:
+            return {
+                "graph_id": self.graph_id,
+                "version": self.version,
+                "nodes": list(self._nodes.values()),
+                "links": list(self._edges.values())
+            }
+
+    def changes_since(self, version, graph_id=None):
+        """Changes after `version`, or None when only a snapshot can bring the client up to date"""
+        with self._lock:
+            if graph_id != self.graph_id or version > self.version:
+                return None
+            if version < self.version and (not self._changes or self._changes[0]['version'] > version + 1):
+                return None
+            return {
+                "graph_id": self.graph_id,
+                "version": self.version,
+                "changes": [change for change in self._changes if change['version'] > version]
+            }
+
+    def neighbors(self, device_id):
+        """Devices linked to one device, with the local and remote interface"""
+        with self._lock:
+            neighbors = []
+            for key in sorted(self._incident.get(device_id, ())):
+                edge = self._edges[key]
+                local = edge['source'] == device_id
+                other = self._nodes.get(edge['target'] if local else edge['source'])
+                if other is None:
+                    continue
+                neighbors.append({
+                    "device_id": other['id'],
+                    "name": other['name'],
+                    "ip_address": other['ip_address'],
+                    "interface": edge['source_interface'] if local else edge['target_interface'],
+                    "remote_interface": edge['target_interface'] if local else edge['source_interface']
+                })
+            return neighbors
+
+    def _record(self, kind, op, key, data=None):
+        self.version += 1
+        self._changes.append({"version": self.version, "kind": kind, "op": op, "key": key, "data": data})
+
+    def _set_nodes(self, nodes):
+        for device_id in [device_id for device_id in self._nodes if device_id not in nodes]:
+            del self._nodes[device_id]
+            self._record('node', 'remove', device_id)
+            self._adjacency.pop(device_id, None)
+            self._changed.pop(device_id, None)
+            self._update_edges(device_id, set(self._incident.get(device_id, ())))
+
+        for device_id, node in nodes.items():
+            if self._nodes.get(device_id) == node:
+                continue
+            added = device_id not in self._nodes
+            self._nodes[device_id] = node
+            self._record('node', 'upsert', device_id, node)
+            if added:
+                # Links other devices already reported towards the new device
+                self._update_edges(device_id, {(min(source, device_id), max(source, device_id))
+                                               for source, links in self._adjacency.items() if device_id in links})
+
+    def _set_links(self, device_id, links):
+        self._adjacency[device_id] = links
+        affected = set(self._incident.get(device_id, ()))
+        affected.update((min(device_id, target), max(device_id, target)) for target in links)
+        self._update_edges(device_id, affected)
+
+    def _update_edges(self, device_id, keys):
+        # Only the links touching the changed device are recomputed
+        for key in keys:
+            a, b = key
+            seen_by_a = self._adjacency.get(a, {}).get(b) if b in self._nodes else None
+            seen_by_b = self._adjacency.get(b, {}).get(a) if a in self._nodes else None
+            edge = _edge(a, b, seen_by_a, seen_by_b) if (seen_by_a or seen_by_b) else None
+
+            if edge is None:
+                if self._edges.pop(key, None) is not None:
+                    self._incident.get(a, set()).discard(key)
+                    self._incident.get(b, set()).discard(key)
+                    self._record('link', 'remove', f"{a}-{b}")
+            elif self._edges.get(key) != edge:
+                self._edges[key] = edge
+                self._incident.setdefault(a, set()).add(key)
+                self._incident.setdefault(b, set()).add(key)
+                self._record('link', 'upsert', f"{a}-{b}", edge)
+
+        if device_id not in self._nodes:
+            self._incident.pop(device_id, None)
+
+class TopologyRefresher:
+    """Decides when each device's links are refreshed
+
+    Every device has its own schedule: refreshed TOPOLOGY_REFRESH_INTERVAL
+    after its last refresh, with the first refresh after start-up spread
+    over the interval. Failing devices are retried with exponential backoff.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._due = {}       # device_id -> monotonic time of the next refresh
+        self._failures = {}  # device_id -> consecutive failures
+
+    def due(self, devices, states):
+        """Devices whose refresh is due
+
+        Args:
+            devices: All monitored devices
+            states (dict): device_id -> TopologyDevice of devices refreshed before
+        """
+        from mik.app.config import Config
+
+        interval = getattr(Config, 'TOPOLOGY_REFRESH_INTERVAL', 900)
+        now = time.monotonic()
+        wall = time.time()
+        due = []
+        with self._lock:
+            for device in devices:
+                if device.id not in self._due:
+                    state = states.get(device.id)
+                    if state is not None and state.refreshed_at is not None:
+                        # Continue the schedule of stored refreshes across restarts
+                        age = wall - _utc_timestamp(state.refreshed_at)
+                        self._due[device.id] = now + max(0.0, interval - age)
+                    else:
+                        self._due[device.id] = now + random.uniform(0, min(interval, 60))
+                if self._due[device.id] <= now:
+                    due.append(device)
+
+            known = {device.id for device in devices}
+            for device_id in [device_id for device_id in self._due if device_id not in known]:
+                self._due.pop(device_id, None)
+                self._failures.pop(device_id, None)
+        return due
+
+    def done(self, device_id, ok):
+        """Schedule a device's next refresh after one finished"""
+        from mik.app.config import Config
+
+        interval = getattr(Config, 'TOPOLOGY_REFRESH_INTERVAL', 900)
+        with self._lock:
+            if ok:
+                self._failures.pop(device_id, None)
+                delay = interval
+            else:
+                failures = self._failures.get(device_id, 0) + 1
+                self._failures[device_id] = failures
+                delay = min(interval, getattr(Config, 'TOPOLOGY_RETRY_INTERVAL', 60) * 2 ** (failures - 1))
+            self._due[device_id] = time.monotonic() + delay
+
+def _utc_timestamp(naive_utc):
+    return (naive_utc - _EPOCH).total_seconds()
+
+topology_graph = TopologyGraph()
+topology_refresher = TopologyRefresher()
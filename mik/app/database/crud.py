@@ -1,10 +1,11 @@
 import logging
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
-from sqlalchemy import text, func, and_, or_, desc
+from sqlalchemy import text, func, and_, or_, desc, insert, select, literal, cast, type_coerce, Integer, DateTime
 from datetime import datetime, timedelta
 import time
+import json
 from mik.app import db
-from mik.app.database.models import User, Device, Metric, AlertRule, Alert, Setting
+from mik.app.database.models import User, Device, Metric, MetricRollup, InterfaceSeries, InterfaceSample, ClientEvent, TopologyDevice, TopologyLink, NetworkScan, ScanResult, AlertRule, Alert, Setting
 from mik.app.utils.security import encrypt_device_password, decrypt_device_password
 from functools import wraps
 
@@ -393,6 +394,7 @@ def delete_device(device_id):
         
         db.session.delete(device)
         db.session.commit()
+        _forget_interface_series(device_id)
         return True
     except SQLAlchemyError as e:
         db.session.rollback()
@@ -408,51 +410,320 @@ def get_devices_count():
         return 0
 
 # Metrics operations
+# Device metrics dictionary keys mapped to (metric_type, metric_name)
+DEVICE_METRIC_FIELDS = {
+    'cpu_load': ('cpu', 'load'),
+    'memory_usage': ('memory', 'usage'),
+    'disk_usage': ('disk', 'usage'),
+}
+
+def _build_metric_rows(device_id, metrics_data, timestamp):
+    """Build plain metric rows from a device metrics dictionary"""
+    rows = []
+    for key, (metric_type, metric_name) in DEVICE_METRIC_FIELDS.items():
+        value = metrics_data.get(key)
+        if value is None:
+            continue
+        rows.append({
+            'device_id': device_id,
+            'metric_type': metric_type,
+            'metric_name': metric_name,
+            'value': value,
+            'timestamp': timestamp
+        })
+    return rows
+
 def save_device_metrics(device_id, metrics_data):
     """Save device metrics to database"""
+    return save_metrics_batch([(device_id, metrics_data)]) > 0
+
+@track_db_performance
+def save_metrics_batch(device_metrics, timestamp=None):
+    """Save metrics for many devices in a single transaction
+    
+    Rows are written with one executemany-style Core insert, bypassing ORM
+    object construction and the session identity map.
+    
+    Args:
+        device_metrics: Iterable of (device_id, metrics_data) tuples
+        timestamp (datetime, optional): Sample time for all rows. Defaults to now (UTC).
+        
+    Returns:
+        int: Number of metric rows saved
+    """
+    if timestamp is None:
+        timestamp = datetime.utcnow()
+    
+    rows = []
+    for device_id, metrics_data in device_metrics:
+        rows.extend(_build_metric_rows(device_id, metrics_data, timestamp))
+    
+    if not rows:
+        return 0
+    
     try:
-        # Extract metrics from data
-        metrics_to_save = []
-        
-        # CPU metrics
-        if 'cpu_load' in metrics_data:
-            metrics_to_save.append(Metric(
-                device_id=device_id,
-                metric_type='cpu',
-                metric_name='load',
-                value=metrics_data['cpu_load']
-            ))
-        
-        # Memory metrics
-        if 'memory_usage' in metrics_data:
-            metrics_to_save.append(Metric(
-                device_id=device_id,
-                metric_type='memory',
-                metric_name='usage',
-                value=metrics_data['memory_usage']
-            ))
-        
-        # Disk metrics
-        if 'disk_usage' in metrics_data:
-            metrics_to_save.append(Metric(
-                device_id=device_id,
-                metric_type='disk',
-                metric_name='usage',
-                value=metrics_data['disk_usage']
-            ))
-        
-        # Add more metrics as needed
-        
-        # Save metrics to database
-        if metrics_to_save:
-            db.session.add_all(metrics_to_save)
+        db.session.execute(insert(Metric.__table__), rows)
+        # Keep rollups in step with raw samples within the same transaction
+        _upsert_metric_rollups(rows)
+        db.session.commit()
+        return len(rows)
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error(f"Database error saving metrics batch: {str(e)}")
+        return 0
+
+# Metric rollup operations
+ROLLUP_EPOCH = datetime(1970, 1, 1)
+
+def rollup_bucket(timestamp, resolution):
+    """Get the start of the rollup bucket a (naive UTC) timestamp falls into"""
+    offset = int((timestamp - ROLLUP_EPOCH).total_seconds()) % resolution
+    return timestamp.replace(microsecond=0) - timedelta(seconds=offset)
+
+# Columns of metric_rollups written by the upserts, in INSERT ... SELECT order
+ROLLUP_COLUMNS = ('device_id', 'metric_type', 'metric_name', 'resolution', 'bucket',
+                  'sample_count', 'value_sum', 'value_min', 'value_max')
+
+def _rollup_upsert(source=None):
+    """INSERT into metric_rollups that merges into existing buckets on conflict
+    
+    Args:
+        source (optional): SELECT producing ROLLUP_COLUMNS; without it the
+            statement takes parameter rows
+    
+    Returns:
+        The statement, or None if the database has no INSERT ... ON CONFLICT
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as upsert
+        least, greatest = func.least, func.greatest
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as upsert
+        # SQLite's multi-argument min()/max() are scalar functions
+        least, greatest = func.min, func.max
+    else:
+        logger.error(f"Metric rollups are not supported on {dialect}")
+        return None
+    
+    table = MetricRollup.__table__
+    stmt = upsert(table)
+    if source is not None:
+        stmt = stmt.from_select(ROLLUP_COLUMNS, source)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.device_id, table.c.metric_type, table.c.metric_name,
+                        table.c.resolution, table.c.bucket],
+        set_={
+            'sample_count': table.c.sample_count + stmt.excluded.sample_count,
+            'value_sum': table.c.value_sum + stmt.excluded.value_sum,
+            'value_min': least(table.c.value_min, stmt.excluded.value_min),
+            'value_max': greatest(table.c.value_max, stmt.excluded.value_max)
+        }
+    )
+
+def _upsert_metric_rollups(rows):
+    """Fold raw metric rows into every rollup resolution
+    
+    Rows are pre-aggregated per bucket in memory, then merged into the
+    stored buckets with a single INSERT ... ON CONFLICT DO UPDATE.
+    Does not commit.
+    """
+    from mik.app.config import Config
+    
+    aggregated = {}
+    for row in rows:
+        value = row['value']
+        for resolution in Config.ROLLUP_RESOLUTIONS:
+            key = (row['device_id'], row['metric_type'], row['metric_name'],
+                   resolution, rollup_bucket(row['timestamp'], resolution))
+            bucket = aggregated.get(key)
+            if bucket is None:
+                aggregated[key] = [1, value, value, value]
+            else:
+                bucket[0] += 1
+                bucket[1] += value
+                bucket[2] = min(bucket[2], value)
+                bucket[3] = max(bucket[3], value)
+    
+    if not aggregated:
+        return 0
+    
+    stmt = _rollup_upsert()
+    if stmt is None:
+        return 0
+    
+    db.session.execute(stmt, [
+        {
+            'device_id': device_id,
+            'metric_type': metric_type,
+            'metric_name': metric_name,
+            'resolution': resolution,
+            'bucket': bucket,
+            'sample_count': count,
+            'value_sum': total,
+            'value_min': low,
+            'value_max': high
+        }
+        for (device_id, metric_type, metric_name, resolution, bucket), (count, total, low, high)
+        in aggregated.items()
+    ])
+    return len(aggregated)
+
+@track_db_performance
+def get_metric_rollups(device_id, metric_type, metric_name, resolution, start_time=None, end_time=None):
+    """Get rollup buckets for a device metric in ascending time order"""
+    try:
+        query = MetricRollup.query.filter_by(
+            device_id=device_id,
+            metric_type=metric_type,
+            metric_name=metric_name,
+            resolution=resolution
+        )
+        
+        if start_time:
+            query = query.filter(MetricRollup.bucket >= rollup_bucket(start_time, resolution))
+        
+        if end_time:
+            query = query.filter(MetricRollup.bucket <= end_time)
+        
+        return query.order_by(MetricRollup.bucket).all()
+    except SQLAlchemyError as e:
+        logger.error(f"Database error getting metric rollups: {str(e)}")
+        return []
+
+def delete_old_metric_rollups():
+    """Delete rollup buckets older than the retention of their resolution"""
+    from mik.app.config import Config
+    
+    try:
+        deleted = 0
+        now = datetime.utcnow()
+        for resolution, retention_days in Config.ROLLUP_RETENTION_DAYS.items():
+            deleted += MetricRollup.query.filter(
+                MetricRollup.resolution == resolution,
+                MetricRollup.bucket < now - timedelta(days=retention_days)
+            ).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error(f"Database error deleting old metric rollups: {str(e)}")
+        return 0
+
+# Setting holding the progress of the rollup backfill as JSON
+ROLLUP_BACKFILL_SETTING = 'metric_rollup_backfill'
+
+def start_metric_rollup_backfill():
+    """Plan a backfill of rollups for a database that only has raw metrics
+    
+    Raw rows up to the current highest ID are left to backfill_metric_rollups;
+    newer rows are folded into the rollups as they are saved. Does nothing if
+    a backfill was planned before or the rollups are already populated.
+    
+    Returns:
+        dict: Backfill progress (until, done, completed_at), or None
+    """
+    try:
+        state = get_metric_rollup_backfill()
+        if state is not None:
+            return state
+        if db.session.query(MetricRollup.id).first() is not None:
+            return None
+        until = db.session.query(func.max(Metric.id)).scalar()
+        if until is None:
+            return None
+        
+        state = {'until': until, 'done': 0, 'completed_at': None}
+        db.session.add(Setting(key=ROLLUP_BACKFILL_SETTING, value=json.dumps(state)))
+        db.session.commit()
+        logger.info(f"Planned metric rollup backfill of raw metrics up to ID {until}")
+        return state
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error(f"Database error planning metric rollup backfill: {str(e)}")
+        return None
+
+def get_metric_rollup_backfill():
+    """Progress of the rollup backfill, or None if none was planned"""
+    value = get_setting(ROLLUP_BACKFILL_SETTING)
+    return json.loads(value) if value else None
+
+def _rollup_bucket_sql(timestamp, resolution, dialect):
+    """SQL expression for rollup_bucket, yielding the values the ORM stores for a DateTime"""
+    if dialect == 'postgresql':
+        epoch = func.floor(func.extract('epoch', timestamp) / resolution) * resolution
+        return func.timezone('UTC', func.to_timestamp(epoch))
+    # SQLAlchemy stores SQLite datetimes as text with microseconds
+    epoch = cast(func.strftime('%s', timestamp), Integer) // resolution * resolution
+    return func.strftime('%Y-%m-%d %H:%M:%S.000000', epoch, 'unixepoch')
+
+def backfill_metric_rollups(chunk_size=1000000):
+    """Build the rollups of a planned backfill inside the database
+    
+    Raw rows are aggregated with INSERT ... SELECT ... GROUP BY per ID range
+    and resolution, so no rows travel to Python. Each range commits together
+    with the progress, so an interrupted backfill resumes where it stopped
+    and a range is never counted twice, even with several workers.
+    
+    Returns:
+        int: Number of raw metric IDs covered by this call
+    """
+    from mik.app.config import Config
+    
+    table = Metric.__table__
+    setting = Setting.__table__
+    covered = 0
+    try:
+        state = get_metric_rollup_backfill()
+        if state is None or state['completed_at']:
+            return 0
+        
+        dialect = db.session.get_bind().dialect.name
+        while state['done'] < state['until']:
+            low, high = state['done'], min(state['done'] + chunk_size, state['until'])
+            for resolution in Config.ROLLUP_RESOLUTIONS:
+                # Bucket in a subquery, so its bound parameters appear only once
+                rows = (
+                    select(table.c.device_id, table.c.metric_type, table.c.metric_name, table.c.value,
+                           _rollup_bucket_sql(table.c.timestamp, resolution, dialect).label('bucket'))
+                    .where(table.c.id > low, table.c.id <= high, table.c.timestamp.isnot(None))
+                    .subquery()
+                )
+                source = (
+                    select(rows.c.device_id, rows.c.metric_type, rows.c.metric_name,
+                           literal(resolution), rows.c.bucket, func.count(), func.sum(rows.c.value),
+                           func.min(rows.c.value), func.max(rows.c.value))
+                    .group_by(rows.c.device_id, rows.c.metric_type, rows.c.metric_name, rows.c.bucket)
+                )
+                stmt = _rollup_upsert(source)
+                if stmt is None:
+                    return covered
+                db.session.execute(stmt)
+            
+            previous = json.dumps(state)
+            state = dict(state, done=high)
+            if high >= state['until']:
+                state['completed_at'] = datetime.utcnow().isoformat()
+            claimed = db.session.execute(
+                setting.update()
+                .where(setting.c.key == ROLLUP_BACKFILL_SETTING, setting.c.value == previous)
+                .values(value=json.dumps(state))
+            ).rowcount
+            if not claimed:
+                # Another worker got to this range first
+                db.session.rollback()
+                logger.info("Metric rollup backfill is being run by another worker")
+                return covered
             db.session.commit()
-            return True
-        return False
+            covered += high - low
+            logger.info(f"Backfilled metric rollups up to raw metric ID {high} of {state['until']}")
+        
+        logger.info("Metric rollup backfill completed")
+        return covered
     except SQLAlchemyError as e:
         db.session.rollback()
-        logger.error(f"Database error saving metrics: {str(e)}")
-        return False
+        logger.error(f"Database error backfilling metric rollups: {str(e)}")
+        return covered
 
 def get_metrics_for_device(device_id, metric_type=None, metric_name=None, start_time=None, end_time=None, limit=100):
     """Get metrics for a device with optional filters"""
@@ -478,6 +749,484 @@ def get_metrics_for_device(device_id, metric_type=None, metric_name=None, start_
         logger.error(f"Database error getting metrics: {str(e)}")
         return []
 
+# Interface traffic operations
+# InterfaceSample columns mapped to get_interface_traffic interface keys
+INTERFACE_SAMPLE_FIELDS = {
+    'rx_bytes': 'rx_byte',
+    'tx_bytes': 'tx_byte',
+    'rx_bps': 'rx_rate_bps',
+    'tx_bps': 'tx_rate_bps',
+    'rx_pps': 'rx_rate_pps',
+    'tx_pps': 'tx_rate_pps',
+    'rx_errors': 'rx_error',
+    'tx_errors': 'tx_error',
+    'rx_drops': 'rx_drop',
+    'tx_drops': 'tx_drop'
+}
+
+# Rate columns, stored as NULL until the interface has a rate baseline
+INTERFACE_RATE_FIELDS = ('rx_bps', 'tx_bps', 'rx_pps', 'tx_pps')
+
+# (device_id, interface_name) -> InterfaceSeries.id
+_interface_series_ids = {}
+
+def _forget_interface_series(device_id):
+    for key in [key for key in _interface_series_ids if key[0] == device_id]:
+        del _interface_series_ids[key]
+
+def _resolve_interface_series(interfaces):
+    """Map (device_id, interface_name) keys to series IDs, creating missing series
+    
+    Args:
+        interfaces (dict): (device_id, interface_name) -> interface_type
+    """
+    missing = [key for key in interfaces if key not in _interface_series_ids]
+    if missing:
+        device_ids = {device_id for device_id, _ in missing}
+        for series in InterfaceSeries.query.filter(InterfaceSeries.device_id.in_(device_ids)):
+            _interface_series_ids[(series.device_id, series.interface_name)] = series.id
+        
+        new_keys = [key for key in missing if key not in _interface_series_ids]
+        if new_keys:
+            try:
+                created = [
+                    InterfaceSeries(device_id=device_id, interface_name=name, interface_type=interfaces[(device_id, name)])
+                    for device_id, name in new_keys
+                ]
+                db.session.add_all(created)
+                db.session.commit()
+                for series in created:
+                    _interface_series_ids[(series.device_id, series.interface_name)] = series.id
+            except IntegrityError:
+                # Created concurrently by another worker; pick up their IDs
+                db.session.rollback()
+                for series in InterfaceSeries.query.filter(InterfaceSeries.device_id.in_(device_ids)):
+                    _interface_series_ids[(series.device_id, series.interface_name)] = series.id
+    
+    return {key: _interface_series_ids.get(key) for key in interfaces}
+
+@track_db_performance
+def save_interface_samples_batch(device_traffic, timestamp=None):
+    """Save per-interface traffic of many devices in a single transaction
+    
+    Args:
+        device_traffic: Iterable of (device_id, traffic) tuples, traffic being
+            the output of get_interface_traffic
+        timestamp (datetime, optional): Sample time for all rows. Defaults to now (UTC).
+        
+    Returns:
+        int: Number of interface samples saved
+    """
+    if timestamp is None:
+        timestamp = datetime.utcnow()
+    
+    samples = []
+    interfaces = {}
+    for device_id, traffic in device_traffic:
+        for iface in traffic.get('interfaces', []):
+            name = iface.get('name')
+            if not name:
+                continue
+            interfaces[(device_id, name)] = iface.get('type')
+            samples.append((device_id, name, iface))
+    
+    if not samples:
+        return 0
+    
+    try:
+        series_ids = _resolve_interface_series(interfaces)
+        
+        rows = []
+        for device_id, name, iface in samples:
+            series_id = series_ids.get((device_id, name))
+            if series_id is None:
+                continue
+            row = {"series_id": series_id, "timestamp": timestamp}
+            for column, key in INTERFACE_SAMPLE_FIELDS.items():
+                row[column] = iface.get(key) or 0
+            if not iface.get('rates_available', False):
+                for column in INTERFACE_RATE_FIELDS:
+                    row[column] = None
+            rows.append(row)
+        
+        if rows:
+            db.session.execute(insert(InterfaceSample.__table__), rows)
+        db.session.commit()
+        return len(rows)
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        _interface_series_ids.clear()
+        logger.error(f"Database error saving interface samples: {str(e)}")
+        return 0
+
+def get_interface_series(device_id):
+    """Get the interfaces of a device that have recorded traffic"""
+    try:
+        return InterfaceSeries.query.filter_by(device_id=device_id).order_by(InterfaceSeries.interface_name).all()
+    except SQLAlchemyError as e:
+        logger.error(f"Database error getting interface series: {str(e)}")
+        return []
+
+def get_interface_samples(device_id, interface_name, start_time=None, end_time=None, limit=None):
+    """Get traffic samples of one interface, oldest first"""
+    try:
+        series = InterfaceSeries.query.filter_by(device_id=device_id, interface_name=interface_name).first()
+        if not series:
+            return []
+        
+        query = InterfaceSample.query.filter_by(series_id=series.id)
+        if start_time:
+            query = query.filter(InterfaceSample.timestamp >= start_time)
+        if end_time:
+            query = query.filter(InterfaceSample.timestamp <= end_time)
+        
+        if limit:
+            # Keep the most recent samples when the range holds more than limit
+            return query.order_by(InterfaceSample.timestamp.desc()).limit(limit).all()[::-1]
+        return query.order_by(InterfaceSample.timestamp).all()
+    except SQLAlchemyError as e:
+        logger.error(f"Database error getting interface samples: {str(e)}")
+        return []
+
+def get_interface_sample_buckets(device_id, interface_name, field, resolution, start_time=None, end_time=None):
+    """Aggregate one interface field into buckets of `resolution` seconds, oldest first
+    
+    Returns:
+        list: Rows with bucket (datetime), avg, min, max and count
+    """
+    try:
+        series = InterfaceSeries.query.filter_by(device_id=device_id, interface_name=interface_name).first()
+        if not series:
+            return []
+        
+        table = InterfaceSample.__table__
+        value = table.c[field]
+        dialect = db.session.get_bind().dialect.name
+        conditions = [table.c.series_id == series.id, value.isnot(None)]
+        if start_time:
+            conditions.append(table.c.timestamp >= rollup_bucket(start_time, resolution))
+        if end_time:
+            conditions.append(table.c.timestamp <= end_time)
+        
+        rows = (
+            # Typed as DateTime so SQLite's text buckets come back as datetimes
+            select(type_coerce(_rollup_bucket_sql(table.c.timestamp, resolution, dialect), DateTime).label('bucket'),
+                   value.label('value'))
+            .where(*conditions)
+            .subquery()
+        )
+        return db.session.execute(
+            select(rows.c.bucket, func.avg(rows.c.value).label('avg'), func.min(rows.c.value).label('min'),
+                   func.max(rows.c.value).label('max'), func.count().label('count'))
+            .group_by(rows.c.bucket)
+            .order_by(rows.c.bucket)
+        ).all()
+    except SQLAlchemyError as e:
+        logger.error(f"Database error getting interface sample buckets: {str(e)}")
+        return []
+
+def delete_old_interface_samples(cutoff_date):
+    """Delete interface samples older than cutoff_date"""
+    try:
+        deleted = InterfaceSample.query.filter(
+            InterfaceSample.timestamp < cutoff_date
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error(f"Database error deleting old interface samples: {str(e)}")
+        return 0
+
+# Client history operations
+@track_db_performance
+def save_client_events(events):
+    """Save client join/leave/change events, e.g. from ClientTracker.observe
+    
+    Returns:
+        int: Number of events saved
+    """
+    rows = []
+    for event in events:
+        client = event.get('client') or {}
+        rows.append({
+            "device_id": event['device_id'],
+            "mac_address": event['mac_address'],
+            "event": event['event'],
+            "timestamp": event['timestamp'],
+            "source": client.get('source'),
+            "interface": client.get('interface'),
+            "address": client.get('address'),
+            "host_name": client.get('host_name'),
+            "status": client.get('status'),
+            "changes": json.dumps(event['changes']) if event.get('changes') else None
+        })
+    
+    if not rows:
+        return 0
+    
+    try:
+        db.session.execute(insert(ClientEvent.__table__), rows)
+        db.session.commit()
+        return len(rows)
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error(f"Database error saving client events: {str(e)}")
+        return 0
+
+def get_client_events(device_id, mac_address=None, event=None, start_time=None, end_time=None, limit=100):
+    """Get client events of a device, newest first"""
+    try:
+        query = ClientEvent.query.filter_by(device_id=device_id)
+        if mac_address:
+            query = query.filter_by(mac_address=mac_address.upper())
+        if event:
+            query = query.filter_by(event=event)
+        if start_time:
+            query = query.filter(ClientEvent.timestamp >= start_time)
+        if end_time:
+            query = query.filter(ClientEvent.timestamp <= end_time)
+        return query.order_by(ClientEvent.timestamp.desc(), ClientEvent.id.desc()).limit(limit).all()
+    except SQLAlchemyError as e:
+        logger.error(f"Database error getting client events: {str(e)}")
+        return []
+
+def delete_old_client_events(cutoff_date):
+    """Delete client events older than cutoff_date"""
+    try:
+        deleted = ClientEvent.query.filter(
+            ClientEvent.timestamp < cutoff_date
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error(f"Database error deleting old client events: {str(e)}")
+        return 0
+
+# Topology operations
+TOPOLOGY_LINK_FIELDS = ('source_interface', 'source_ip', 'target_ip', 'kind')
+
+@track_db_performance
+def save_topology_links(device_id, links, signature, refreshed_at=None):
+    """Store the links one device sees, replacing them only if they changed
+    
+    Args:
+        device_id (int): Observing device
+        links (iterable): Link dictionaries with target_id and TOPOLOGY_LINK_FIELDS
+        signature (str): Hash of the links; equal hashes skip the rewrite
+        refreshed_at (datetime, optional): Refresh time (UTC). Defaults to now.
+        
+    Returns:
+        bool: True if the links changed, None on a database error
+    """
+    refreshed_at = refreshed_at or datetime.utcnow()
+    try:
+        state = TopologyDevice.query.get(device_id)
+        if state is None:
+            state = TopologyDevice(device_id=device_id)
+            db.session.add(state)
+        
+        changed = state.signature != signature
+        if changed:
+            TopologyLink.query.filter_by(device_id=device_id).delete(synchronize_session=False)
+            rows = [
+                dict({"device_id": device_id, "target_id": link['target_id']},
+                     **{field: link.get(field) for field in TOPOLOGY_LINK_FIELDS})
+                for link in links
+            ]
+            if rows:
+                db.session.execute(insert(TopologyLink.__table__), rows)
+            state.signature = signature
+            state.changed_at = refreshed_at
+        
+        state.refreshed_at = refreshed_at
+        state.error = None
+        db.session.commit()
+        return changed
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error(f"Database error saving topology links: {str(e)}")
+        return None
+
+def record_topology_error(device_id, error, refreshed_at=None):
+    """Note a failed topology refresh; the last known links are kept"""
+    try:
+        state = TopologyDevice.query.get(device_id)
+        if state is None:
+            state = TopologyDevice(device_id=device_id)
+            db.session.add(state)
+        state.refreshed_at = refreshed_at or datetime.utcnow()
+        state.error = error
+        db.session.commit()
+        return True
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error(f"Database error recording topology error: {str(e)}")
+        return False
+
+def get_topology_states():
+    """Get the topology refresh state of every device that has one"""
+    try:
+        return TopologyDevice.query.all()
+    except SQLAlchemyError as e:
+        logger.error(f"Database error getting topology states: {str(e)}")
+        return []
+
+def get_topology_links(device_ids):
+    """Get the stored links seen by the given devices"""
+    try:
+        return TopologyLink.query.filter(TopologyLink.device_id.in_(list(device_ids))).all()
+    except SQLAlchemyError as e:
+        logger.error(f"Database error getting topology links: {str(e)}")
+        return []
+
+# Network scan operations
+def create_network_scan(scan_id, subnet, total, skipped=0, requested_by=None):
+    """Record a started network scan"""
+    try:
+        scan = NetworkScan(id=scan_id, subnet=subnet, status='running', total=total,
+                           skipped=skipped, requested_by=requested_by, updated_at=datetime.utcnow())
+        db.session.add(scan)
+        db.session.commit()
+        return scan
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error(f"Database error creating network scan: {str(e)}")
+        return None
+
+@track_db_performance
+def save_scan_progress(scan_id, devices, start_seq=0, **fields):
+    """Store newly found hosts and update the counters or status of a scan
+    
+    Args:
+        scan_id (str): Scan job ID
+        devices (list): Scan result dictionaries found since the last call
+        start_seq (int): Discovery position of the first of the devices
+        **fields: NetworkScan columns to update (scanned, found, status, ...)
+    
+    Every call also refreshes updated_at, which tells running scans from
+    orphaned ones.
+    """
+    try:
+        if devices:
+            found_at = datetime.utcnow()
+            db.session.execute(insert(ScanResult.__table__), [
+                {
+                    "scan_id": scan_id,
+                    "ip_address": device['ip_address'],
+                    "hostname": device.get('hostname'),
+                    "mac_address": device['mac_address'] if device.get('mac_address') != "Unknown" else None,
+                    "port_api": device.get('port_api', False),
+                    "port_www": device.get('port_www', False),
+                    "port_winbox": device.get('port_winbox', False),
+                    "mikrotik_oui": device.get('mikrotik_oui', False),
+                    "found_at": found_at,
+                    "seq": seq
+                }
+                for seq, device in enumerate(devices, start_seq)
+            ])
+        NetworkScan.query.filter_by(id=scan_id).update(dict(fields, updated_at=datetime.utcnow()),
+                                                       synchronize_session=False)
+        db.session.commit()
+        return True
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error(f"Database error saving scan progress: {str(e)}")
+        return False
+
+def get_network_scan(scan_id):
+    """Get a network scan by ID"""
+    try:
+        return NetworkScan.query.get(scan_id)
+    except SQLAlchemyError as e:
+        logger.error(f"Database error getting network scan: {str(e)}")
+        return None
+
+def get_network_scans(limit=20):
+    """Get the most recent network scans"""
+    try:
+        return NetworkScan.query.order_by(NetworkScan.created_at.desc()).limit(limit).all()
+    except SQLAlchemyError as e:
+        logger.error(f"Database error getting network scans: {str(e)}")
+        return []
+
+def get_scan_results(scan_id, offset=0, limit=None):
+    """Get the hosts found by a scan in the order they were found
+    
+    The offset is a discovery position, so it matches the index into the
+    device list of the job while it is still in memory.
+    """
+    try:
+        query = ScanResult.query.filter_by(scan_id=scan_id).order_by(ScanResult.seq, ScanResult.ip_address)
+        if offset:
+            query = query.filter(ScanResult.seq >= offset)
+        if limit:
+            query = query.limit(limit)
+        return query.all()
+    except SQLAlchemyError as e:
+        logger.error(f"Database error getting scan results: {str(e)}")
+        return []
+
+def fail_orphaned_network_scans(stale_before, exclude=()):
+    """Mark running scans whose progress stopped being written as failed
+    
+    A scan stays 'running' in the database when the process running it
+    stopped. Scans without a progress write since stale_before are taken
+    to be orphaned.
+    
+    Args:
+        stale_before (datetime): Latest heartbeat (UTC) of an orphaned scan
+        exclude: IDs of scans this process is running
+    
+    Returns:
+        int: Number of scans marked failed
+    """
+    try:
+        query = NetworkScan.query.filter(
+            NetworkScan.status == 'running',
+            func.coalesce(NetworkScan.updated_at, NetworkScan.created_at) < stale_before
+        )
+        if exclude:
+            query = query.filter(NetworkScan.id.notin_(list(exclude)))
+        failed = query.update({
+            'status': 'failed',
+            'error': 'Scan was interrupted: the process running it stopped',
+            'finished_at': datetime.utcnow()
+        }, synchronize_session=False)
+        db.session.commit()
+        if failed:
+            logger.warning(f"Marked {failed} interrupted network scans as failed")
+        return failed
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error(f"Database error failing orphaned network scans: {str(e)}")
+        return 0
+
+def get_known_scan_hosts(since):
+    """Addresses found by any scan since the given time"""
+    try:
+        rows = db.session.execute(
+            select(ScanResult.ip_address).where(ScanResult.found_at >= since).distinct()
+        )
+        return {row[0] for row in rows}
+    except SQLAlchemyError as e:
+        logger.error(f"Database error getting known scan hosts: {str(e)}")
+        return set()
+
+def delete_old_network_scans(cutoff_date):
+    """Delete scans, and their results, created before cutoff_date"""
+    try:
+        old_scans = select(NetworkScan.id).where(NetworkScan.created_at < cutoff_date)
+        ScanResult.query.filter(ScanResult.scan_id.in_(old_scans)).delete(synchronize_session=False)
+        deleted = NetworkScan.query.filter(NetworkScan.created_at < cutoff_date).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error(f"Database error deleting old network scans: {str(e)}")
+        return 0
+
 # Alert rules operations
 def get_all_alert_rules(enabled_only=False):
     """Get all alert rules"""
@@ -606,6 +1355,33 @@ def create_alert(rule_id, device_id, metric, value, threshold, condition):
         logger.error(f"Database error creating alert: {str(e)}")
         return None
 
+def get_open_alert(rule_id, device_id):
+    """Get the latest unresolved alert for a rule and device"""
+    try:
+        return Alert.query.filter_by(
+            rule_id=rule_id,
+            device_id=device_id,
+            resolved_at=None
+        ).order_by(Alert.timestamp.desc()).first()
+    except SQLAlchemyError as e:
+        logger.error(f"Database error getting open alert: {str(e)}")
+        return None
+
+def resolve_alert(alert_id):
+    """Mark an alert as resolved"""
+    try:
+        alert = Alert.query.get(alert_id)
+        if not alert:
+            return False
+        
+        alert.resolved_at = datetime.utcnow()
+        db.session.commit()
+        return True
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logger.error(f"Database error resolving alert: {str(e)}")
+        return False
+
 def get_recent_alerts(limit=20):
     """Get recent alerts"""
     try:
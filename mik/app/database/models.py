@@ -1,7 +1,8 @@
 from mik.app import db
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Boolean, DateTime, Text, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
+import json
 
 class User(db.Model):
     """User model for authentication and authorization"""
@@ -45,6 +46,12 @@ class Device(db.Model):
     # Relationships
     metrics = relationship("Metric", back_populates="device", cascade="all, delete-orphan")
     alerts = relationship("Alert", back_populates="device", cascade="all, delete-orphan")
+    rollups = relationship("MetricRollup", cascade="all, delete-orphan", passive_deletes=True)
+    interface_series = relationship("InterfaceSeries", cascade="all, delete-orphan", passive_deletes=True)
+    client_events = relationship("ClientEvent", cascade="all, delete-orphan", passive_deletes=True)
+    topology_state = relationship("TopologyDevice", cascade="all, delete-orphan", passive_deletes=True, uselist=False)
+    topology_links = relationship("TopologyLink", cascade="all, delete-orphan", passive_deletes=True,
+                                  foreign_keys="TopologyLink.device_id")
     
     def to_dict(self):
         return {
@@ -73,6 +80,11 @@ class Metric(db.Model):
     value = Column(Float, nullable=False)
     timestamp = Column(DateTime, default=datetime.utcnow, index=True)
     
+    # History lookups filter on device and series, then range-scan by time
+    __table_args__ = (
+        Index('ix_metrics_device_series_time', 'device_id', 'metric_type', 'metric_name', 'timestamp'),
+    )
+    
     # Relationships
     device = relationship("Device", back_populates="metrics")
     
@@ -86,6 +98,137 @@ class Metric(db.Model):
             'timestamp': self.timestamp.isoformat() if self.timestamp else None
         }
 
+class MetricRollup(db.Model):
+    """Pre-aggregated metric buckets (1m/5m/1h/1d) maintained at ingestion"""
+    __tablename__ = 'metric_rollups'
+    
+    id = Column(Integer, primary_key=True)
+    device_id = Column(Integer, ForeignKey('devices.id', ondelete='CASCADE'), nullable=False)
+    metric_type = Column(String(50), nullable=False)
+    metric_name = Column(String(50), nullable=False)
+    resolution = Column(Integer, nullable=False)  # Bucket width in seconds
+    bucket = Column(DateTime, nullable=False)  # Bucket start time (UTC)
+    sample_count = Column(Integer, nullable=False, default=0)
+    value_sum = Column(Float, nullable=False, default=0)
+    value_min = Column(Float, nullable=False)
+    value_max = Column(Float, nullable=False)
+    
+    __table_args__ = (
+        UniqueConstraint('device_id', 'metric_type', 'metric_name', 'resolution', 'bucket',
+                         name='uq_metric_rollups_series_bucket'),
+    )
+    
+    def to_dict(self):
+        return {
+            'device_id': self.device_id,
+            'metric_type': self.metric_type,
+            'metric_name': self.metric_name,
+            'resolution': self.resolution,
+            'bucket': self.bucket.isoformat() if self.bucket else None,
+            'count': self.sample_count,
+            'avg': self.value_sum / self.sample_count if self.sample_count else None,
+            'min': self.value_min,
+            'max': self.value_max
+        }
+
+class InterfaceSeries(db.Model):
+    """One interface of one device; samples refer to it by a small integer ID"""
+    __tablename__ = 'interface_series'
+    
+    id = Column(Integer, primary_key=True)
+    device_id = Column(Integer, ForeignKey('devices.id', ondelete='CASCADE'), nullable=False)
+    interface_name = Column(String(100), nullable=False)
+    interface_type = Column(String(50))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        UniqueConstraint('device_id', 'interface_name', name='uq_interface_series_device_name'),
+    )
+    
+    samples = relationship("InterfaceSample", cascade="all, delete-orphan", passive_deletes=True)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'device_id': self.device_id,
+            'interface_name': self.interface_name,
+            'interface_type': self.interface_type,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class InterfaceSample(db.Model):
+    """Per-interface traffic sample, one wide row per interface and poll
+    
+    Keyed by (series_id, timestamp) so a history lookup is a single range
+    scan and no per-row device/interface strings are stored.
+    """
+    __tablename__ = 'interface_samples'
+    
+    series_id = Column(Integer, ForeignKey('interface_series.id', ondelete='CASCADE'), primary_key=True)
+    timestamp = Column(DateTime, primary_key=True, index=True)
+    rx_bytes = Column(BigInteger, nullable=False)
+    tx_bytes = Column(BigInteger, nullable=False)
+    rx_bps = Column(Float)  # Null until a rate baseline exists
+    tx_bps = Column(Float)
+    rx_pps = Column(Float)
+    tx_pps = Column(Float)
+    rx_errors = Column(BigInteger, nullable=False, default=0)
+    tx_errors = Column(BigInteger, nullable=False, default=0)
+    rx_drops = Column(BigInteger, nullable=False, default=0)
+    tx_drops = Column(BigInteger, nullable=False, default=0)
+    
+    def to_dict(self):
+        return {
+            'series_id': self.series_id,
+            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
+            'rx_bytes': self.rx_bytes,
+            'tx_bytes': self.tx_bytes,
+            'rx_bps': self.rx_bps,
+            'tx_bps': self.tx_bps,
+            'rx_pps': self.rx_pps,
+            'tx_pps': self.tx_pps,
+            'rx_errors': self.rx_errors,
+            'tx_errors': self.tx_errors,
+            'rx_drops': self.rx_drops,
+            'tx_drops': self.tx_drops
+        }
+
+class ClientEvent(db.Model):
+    """A client joining, leaving or changing on a device (roaming, new lease, ...)"""
+    __tablename__ = 'client_events'
+    
+    id = Column(Integer, primary_key=True)
+    device_id = Column(Integer, ForeignKey('devices.id', ondelete='CASCADE'), nullable=False)
+    mac_address = Column(String(17), nullable=False)
+    event = Column(String(10), nullable=False)  # 'join', 'leave', 'change'
+    timestamp = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    source = Column(String(20))  # Registration table: 'wireless', 'capsman' or None (DHCP only)
+    interface = Column(String(100))
+    address = Column(String(45))
+    host_name = Column(String(255))
+    status = Column(String(20))
+    changes = Column(Text)  # JSON: field -> [old, new] for change events
+    
+    __table_args__ = (
+        Index('ix_client_events_device_mac_time', 'device_id', 'mac_address', 'timestamp'),
+        Index('ix_client_events_device_time', 'device_id', 'timestamp'),
+    )
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'device_id': self.device_id,
+            'mac_address': self.mac_address,
+            'event': self.event,
+            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
+            'source': self.source,
+            'interface': self.interface,
+            'address': self.address,
+            'host_name': self.host_name,
+            'status': self.status,
+            'changes': json.loads(self.changes) if self.changes else None
+        }
+
 class AlertRule(db.Model):
     """Rules for triggering alerts"""
     __tablename__ = 'alert_rules'
@@ -143,6 +286,7 @@ class Alert(db.Model):
     acknowledged = Column(Boolean, default=False)
     acknowledged_by = Column(Integer, ForeignKey('users.id'))
     acknowledged_at = Column(DateTime)
+    resolved_at = Column(DateTime)  # Set when the rule condition clears
     
     # Relationships
     rule = relationship("AlertRule", back_populates="alerts")
@@ -163,7 +307,109 @@ class Alert(db.Model):
             'timestamp': self.timestamp.isoformat() if self.timestamp else None,
             'acknowledged': self.acknowledged,
             'acknowledged_by': self.acknowledged_by,
-            'acknowledged_at': self.acknowledged_at.isoformat() if self.acknowledged_at else None
+            'acknowledged_at': self.acknowledged_at.isoformat() if self.acknowledged_at else None,
+            'resolved_at': self.resolved_at.isoformat() if self.resolved_at else None
+        }
+
+class TopologyDevice(db.Model):
+    """Topology refresh state of one device"""
+    __tablename__ = 'topology_devices'
+    
+    device_id = Column(Integer, ForeignKey('devices.id', ondelete='CASCADE'), primary_key=True)
+    refreshed_at = Column(DateTime)  # Last refresh attempt
+    changed_at = Column(DateTime)  # Last time the device's links changed
+    signature = Column(String(64))  # Hash of the stored links
+    error = Column(Text)  # Error of the last refresh, if it failed
+    
+    def to_dict(self):
+        return {
+            'device_id': self.device_id,
+            'refreshed_at': self.refreshed_at.isoformat() if self.refreshed_at else None,
+            'changed_at': self.changed_at.isoformat() if self.changed_at else None,
+            'error': self.error
+        }
+
+class TopologyLink(db.Model):
+    """A link from one device to another monitored device, as seen by the first"""
+    __tablename__ = 'topology_links'
+    
+    device_id = Column(Integer, ForeignKey('devices.id', ondelete='CASCADE'), primary_key=True)
+    target_id = Column(Integer, ForeignKey('devices.id', ondelete='CASCADE'), primary_key=True)
+    kind = Column(String(10), nullable=False)  # 'arp' or 'route'
+    source_interface = Column(String(100))
+    source_ip = Column(String(45))
+    target_ip = Column(String(45))
+    
+    def to_dict(self):
+        return {
+            'source_id': self.device_id,
+            'target_id': self.target_id,
+            'source_interface': self.source_interface,
+            'source_ip': self.source_ip,
+            'target_ip': self.target_ip,
+            'kind': self.kind
+        }
+
+class NetworkScan(db.Model):
+    """A background network discovery scan"""
+    __tablename__ = 'network_scans'
+    
+    id = Column(String(32), primary_key=True)  # Job ID
+    subnet = Column(String(50), nullable=False)
+    status = Column(String(20), nullable=False)  # 'running', 'completed', 'cancelled', 'failed'
+    total = Column(Integer, nullable=False, default=0)  # Hosts to probe
+    scanned = Column(Integer, nullable=False, default=0)
+    skipped = Column(Integer, nullable=False, default=0)  # Known hosts not probed again
+    found = Column(Integer, nullable=False, default=0)
+    requested_by = Column(String(100))
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    finished_at = Column(DateTime)
+    updated_at = Column(DateTime)  # Last progress write, the heartbeat of a running scan
+    
+    results = relationship("ScanResult", cascade="all, delete-orphan", passive_deletes=True)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'subnet': self.subnet,
+            'status': self.status,
+            'total': self.total,
+            'scanned': self.scanned,
+            'skipped': self.skipped,
+            'found': self.found,
+            'requested_by': self.requested_by,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class ScanResult(db.Model):
+    """A host found by a network scan"""
+    __tablename__ = 'scan_results'
+    
+    scan_id = Column(String(32), ForeignKey('network_scans.id', ondelete='CASCADE'), primary_key=True)
+    ip_address = Column(String(45), primary_key=True)
+    hostname = Column(String(255))
+    mac_address = Column(String(17))
+    port_api = Column(Boolean, default=False)
+    port_www = Column(Boolean, default=False)
+    port_winbox = Column(Boolean, default=False)
+    mikrotik_oui = Column(Boolean, default=False)
+    found_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    seq = Column(Integer)  # Position in discovery order, the offset readers page by
+    
+    def to_dict(self):
+        return {
+            'ip_address': self.ip_address,
+            'hostname': self.hostname,
+            'mac_address': self.mac_address or "Unknown",
+            'port_api': self.port_api,
+            'port_www': self.port_www,
+            'port_winbox': self.port_winbox,
+            'mikrotik_oui': self.mikrotik_oui,
+            'found_at': self.found_at.isoformat() if self.found_at else None
         }
 
 class Setting(db.Model):
@@ -34,6 +34,55 @@ def get_session():
     """Get a database session"""
     return db.session
 
+def ensure_indexes():
+    """Create indexes declared on the models that are missing from an existing database
+    
+    db.create_all() only creates missing tables, so indexes added to a model
+    after its table exists have to be created separately. Must be called
+    within an application context.
+    """
+    from mik.app.database.models import Metric
+    
+    ensured = []
+    for index in Metric.__table__.indexes:
+        try:
+            # checkfirst makes this a no-op on databases that already have the index
+            index.create(bind=db.engine, checkfirst=True)
+            ensured.append(index.name)
+        except Exception as e:
+            logger.error(f"Error creating index {index.name}: {str(e)}")
+    return ensured
+
+def ensure_columns():
+    """Add nullable columns declared on the models that are missing from existing tables
+    
+    Only nullable columns without server defaults are added, which covers
+    optional fields introduced after a table was created. Must be called
+    within an application context.
+    """
+    from sqlalchemy import inspect, text
+    from sqlalchemy.schema import CreateColumn
+    
+    inspector = inspect(db.engine)
+    added = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable or column.server_default is not None:
+                continue
+            try:
+                column_ddl = CreateColumn(column).compile(dialect=db.engine.dialect)
+                with db.engine.begin() as conn:
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column_ddl}"))
+                added.append(f"{table.name}.{column.name}")
+                logger.info(f"Added column {table.name}.{column.name}")
+            except Exception as e:
+                logger.error(f"Error adding column {table.name}.{column.name}: {str(e)}")
+    return added
+
 def initialize_db(app):
     """Initialize database with default settings"""
     # Wait for database to be ready
@@ -52,6 +101,22 @@ def initialize_db(app):
             db.create_all()
             logger.info("Database tables created")
             
+            # Bring columns and indexes of pre-existing tables up to date
+            ensure_columns()
+            ensure_indexes()
+            
+            # Scans of a process that stopped would otherwise stay 'running' for good
+            from datetime import datetime, timedelta
+            from mik.app.config import Config
+            from mik.app.database.crud import fail_orphaned_network_scans
+            fail_orphaned_network_scans(
+                datetime.utcnow() - timedelta(seconds=getattr(Config, 'DISCOVERY_ORPHAN_TIMEOUT', 60)))
+            
+            # Databases created before rollups existed only have raw metrics;
+            # the backfill itself runs as a background task
+            from mik.app.database.crud import start_metric_rollup_backfill
+            start_metric_rollup_backfill()
+            
             # Load models and crud functions within app context
             from mik.app.database.models import Setting
             from mik.app.database.crud import get_setting
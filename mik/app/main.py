@@ -2,9 +2,13 @@ from flask import Blueprint, render_template, redirect, url_for, request, jsonif
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from functools import wraps
 import logging
+import re
 
 # Import socketio for use in this module
 from app import socketio
+from flask_socketio import emit, join_room, leave_room
+from app.core.live_updates import live_updates, LIVE_TABLES
+from app.core.scan_jobs import scan_room
 
 logger = logging.getLogger(__name__)
 
@@ -86,25 +90,101 @@ def settings():
     return render_template('settings.html', active_page='settings')
 
 # WebSocket event handlers
+def _subscribed_device_id(data):
+    """Validate the device_id of a subscription request"""
+    try:
+        device_id = int((data or {}).get('device_id'))
+    except (TypeError, ValueError):
+        return None
+    
+    from app.database.crud import get_device_by_id
+    return device_id if get_device_by_id(device_id) else None
+
 @socketio.on('connect')
 def handle_connect():
     logger.debug("Client connected")
 
 @socketio.on('disconnect')
 def handle_disconnect():
+    live_updates.disconnect(request.sid)
     logger.debug("Client disconnected")
 
+def _subscribed_table(data):
+    """Validate the optional live table of a subscription request"""
+    table = (data or {}).get('table')
+    if table is None or table in LIVE_TABLES:
+        return True, table
+    return False, None
+
+@socketio.on('subscribe')
+def handle_subscribe(data):
+    device_id = _subscribed_device_id(data)
+    if device_id is None:
+        emit('error', {'error': 'Device not found'})
+        return
+    
+    valid, table = _subscribed_table(data)
+    if not valid:
+        emit('error', {'error': f"Invalid table. Must be one of: {', '.join(LIVE_TABLES)}"})
+        return
+    
+    join_room(live_updates.room(device_id, table))
+    live_updates.subscribe(request.sid, device_id, table)
+    
+    if table:
+        # Start from the last published table; deltas follow as it is re-polled
+        snapshot = live_updates.table_snapshot(device_id, table)
+        if snapshot:
+            emit('table_snapshot', snapshot)
+        return
+    
+    # Send the latest collected sample right away; later ones are pushed by the collector
+    from mik.app.core.metrics_store import latest_metrics
+    sample = latest_metrics.get(device_id)
+    if sample:
+        emit('device_update', live_updates.payload(sample))
+
+@socketio.on('unsubscribe')
+def handle_unsubscribe(data):
+    device_id = _subscribed_device_id(data)
+    valid, table = _subscribed_table(data)
+    if device_id is None or not valid:
+        return
+    
+    leave_room(live_updates.room(device_id, table))
+    live_updates.unsubscribe(request.sid, device_id, table)
+
+@socketio.on('resync')
+def handle_resync(data):
+    # A client missed a table delta and needs the full table again
+    device_id = _subscribed_device_id(data)
+    valid, table = _subscribed_table(data)
+    if device_id is None or not valid or not table:
+        return
+    
+    snapshot = live_updates.table_snapshot(device_id, table)
+    if snapshot:
+        emit('table_snapshot', snapshot)
+
+@socketio.on('subscribe_scan')
+def handle_subscribe_scan(data):
+    # Found devices and progress of a background network scan
+    job_id = str((data or {}).get('job_id') or '')
+    if not re.fullmatch(r'[0-9a-f]{32}', job_id):
+        emit('error', {'error': 'Invalid scan job ID'})
+        return
+    join_room(scan_room(job_id))
+
+@socketio.on('unsubscribe_scan')
+def handle_unsubscribe_scan(data):
+    job_id = str((data or {}).get('job_id') or '')
+    if re.fullmatch(r'[0-9a-f]{32}', job_id):
+        leave_room(scan_room(job_id))
+
 @socketio.on('request_update')
 def handle_update_request(data):
-    device_id = data.get('device_id')
-    if device_id:
-        from app.core.mikrotik import get_device_metrics
-        from app.database.crud import get_device_by_id
-        
-        device = get_device_by_id(device_id)
-        if device:
-            metrics = get_device_metrics(device)
-            socketio.emit('device_update', {'device_id': device_id, 'metrics': metrics})
+    # Kept for older clients: subscribing answers from the cache instead of polling the device
+    handle_subscribe(data)
 
 # Register error handlers
 def register_error_handlers(app):
@@ -122,5 +202,8 @@ def init_app(app):
     app.register_blueprint(main_bp)
     register_error_handlers(app)
     
+    # Push collected samples to subscribed clients
+    live_updates.init_app(socketio)
+    
     # Return the app for testing
     return app
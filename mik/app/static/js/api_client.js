@@ -60,9 +60,9 @@ class ApiClient {
      * @returns {Promise} - Promise with API response
      */
     async request(endpoint, method = 'GET', data = null) {
-        // Add trailing slash to endpoint if needed
+        // Add trailing slash to endpoint if needed (not after a query string)
         let requestEndpoint = endpoint;
-        if (this.ensureTrailingSlash && !requestEndpoint.endsWith('/')) {
+        if (this.ensureTrailingSlash && !requestEndpoint.endsWith('/') && !requestEndpoint.includes('?')) {
             requestEndpoint = `${requestEndpoint}/`;
         }
         
@@ -347,12 +347,32 @@ class ApiClient {
     }
     
     /**
-     * Discover devices on a network
+     * Start a background scan for devices on a network
      * @param {string} subnet - Network subnet
-     * @returns {Promise} - Promise with discovered devices
+     * @param {boolean} skipKnown - Don't probe hosts found by recent scans
+     * @returns {Promise} - Promise with the scan job
      */
-    async discoverDevices(subnet) {
-        return this.request('/api/devices/discover', 'POST', { subnet });
+    async startNetworkScan(subnet, skipKnown = false) {
+        return this.request('/api/devices/scan', 'POST', { subnet, skip_known: skipKnown });
+    }
+    
+    /**
+     * Get the progress of a network scan
+     * @param {string} jobId - Scan job ID
+     * @param {number} offset - Number of found devices already received
+     * @returns {Promise} - Promise with the scan job and the devices found after offset
+     */
+    async getNetworkScan(jobId, offset = 0) {
+        return this.request(`/api/devices/scan/${jobId}?offset=${offset}`);
+    }
+    
+    /**
+     * Cancel a running network scan
+     * @param {string} jobId - Scan job ID
+     * @returns {Promise} - Promise with the API response
+     */
+    async cancelNetworkScan(jobId) {
+        return this.request(`/api/devices/scan/${jobId}/cancel`, 'POST');
     }
     
     /**
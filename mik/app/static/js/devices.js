@@ -52,6 +52,12 @@ function setupEventListeners() {
     const startScanBtn = document.getElementById('startScanBtn');
     if (startScanBtn) {
         startScanBtn.addEventListener('click', startNetworkScan);
+        
+        // Closing the scan modal stops a running scan
+        const scanModalElement = document.getElementById('scanNetworkModal');
+        if (scanModalElement) {
+            scanModalElement.addEventListener('hidden.bs.modal', cancelNetworkScan);
+        }
     }
     
     // Save device button
@@ -642,6 +648,9 @@ async function deleteDevice() {
     }
 }
 
+// Scan job currently shown in the scan modal
+let currentScanJobId = null;
+
 /**
  * Start network scan
  */
@@ -657,44 +666,45 @@ async function startNetworkScan() {
         return;
     }
     
+    const progressBarInner = progressBar.querySelector('.progress-bar');
+    
     try {
         // Show progress bar
         progressBar.classList.remove('d-none');
-        scanResultsDiv.classList.add('d-none');
+        scanResultsDiv.classList.remove('d-none');
         discoveredDevicesTable.innerHTML = '';
+        progressBarInner.classList.remove('bg-danger');
+        setScanProgress(progressBarInner, 0);
         
-        // Update progress bar
-        const progressBarInner = progressBar.querySelector('.progress-bar');
-        progressBarInner.style.width = '25%';
-        progressBarInner.setAttribute('aria-valuenow', '25');
-        
-        // Start scan
-        const devices = await apiClient.discoverDevices(subnet);
-        
-        // Update progress bar
-        progressBarInner.style.width = '100%';
-        progressBarInner.setAttribute('aria-valuenow', '100');
-        
-        // Show results
-        scanResultsDiv.classList.remove('d-none');
+        // Start the scan in the background
+        const job = await apiClient.startNetworkScan(subnet);
+        if (!job || job.error) {
+            throw new Error(job ? job.error : 'No response');
+        }
+        currentScanJobId = job.id;
         
-        if (devices && devices.length > 0) {
-            let html = '';
-            devices.forEach(device => {
-                html += `
-                    <tr>
-                        <td>${device.ip_address}</td>
-                        <td>${device.hostname || '-'}</td>
-                        <td>
-                            <button class="btn btn-sm btn-primary" onclick="addScannedDevice('${device.ip_address}', '${device.hostname || 'MikroTik Device'}')">
-                                <i class="fas fa-plus me-1"></i> Add
-                            </button>
-                        </td>
-                    </tr>
-                `;
+        // Follow the job, receiving only the devices found since the last poll
+        let received = 0;
+        let scan = job;
+        while (scan.status === 'running' && currentScanJobId === job.id) {
+            await new Promise(resolve => setTimeout(resolve, 1000));
+            scan = await apiClient.getNetworkScan(job.id, received);
+            if (!scan || scan.error) {
+                throw new Error(scan ? scan.error : 'No response');
+            }
+            
+            (scan.devices || []).forEach(device => {
+                discoveredDevicesTable.insertAdjacentHTML('beforeend', scannedDeviceRow(device));
             });
-            discoveredDevicesTable.innerHTML = html;
-        } else {
+            received += (scan.devices || []).length;
+            setScanProgress(progressBarInner, scan.total ? Math.round(scan.scanned * 100 / scan.total) : 100);
+        }
+        if (scan.status === 'failed') {
+            throw new Error(scan.error || 'Scan failed');
+        }
+        
+        setScanProgress(progressBarInner, 100);
+        if (received === 0) {
             discoveredDevicesTable.innerHTML = `
                 <tr>
                     <td colspan="3" class="text-center">No MikroTik devices found on the network.</td>
@@ -706,9 +716,7 @@ async function startNetworkScan() {
         showError('Error scanning network. Please try again.');
         
         // Update progress bar to indicate error
-        const progressBarInner = progressBar.querySelector('.progress-bar');
-        progressBarInner.style.width = '100%';
-        progressBarInner.setAttribute('aria-valuenow', '100');
+        setScanProgress(progressBarInner, 100);
         progressBarInner.classList.remove('bg-primary', 'bg-success');
         progressBarInner.classList.add('bg-danger');
         
@@ -722,6 +730,37 @@ async function startNetworkScan() {
     }
 }
 
+/**
+ * Stop following (and cancel) the scan shown in the scan modal
+ */
+function cancelNetworkScan() {
+    if (currentScanJobId) {
+        apiClient.cancelNetworkScan(currentScanJobId);
+        currentScanJobId = null;
+    }
+}
+
+function setScanProgress(progressBarInner, percent) {
+    progressBarInner.style.width = `${percent}%`;
+    progressBarInner.setAttribute('aria-valuenow', String(percent));
+}
+
+function scannedDeviceRow(device) {
+    const hostname = device.hostname && device.hostname !== 'Unknown' ? device.hostname : '';
+    const badge = device.mikrotik_oui ? ' <span class="badge bg-primary">MikroTik</span>' : '';
+    return `
+        <tr>
+            <td>${device.ip_address}${badge}</td>
+            <td>${hostname || '-'}</td>
+            <td>
+                <button class="btn btn-sm btn-primary" onclick="addScannedDevice('${device.ip_address}', '${hostname || 'MikroTik Device'}')">
+                    <i class="fas fa-plus me-1"></i> Add
+                </button>
+            </td>
+        </tr>
+    `;
+}
+
 /**
  * Add discovered device
  */
@@ -15,6 +15,9 @@ let selectedDeviceId = null;
 // Current time range (hours)
 let timeRange = 24;
 
+// Maximum points requested per chart (server downsamples with LTTB)
+const CHART_MAX_POINTS = 500;
+
 // Initialize monitoring components
 document.addEventListener('DOMContentLoaded', function() {
     // Initialize charts
@@ -538,7 +541,7 @@ async function loadMetrics(deviceId) {
 // Load CPU metrics
 async function loadCpuMetrics(deviceId) {
     try {
-        const response = await fetchWithAuth(`/api/monitoring/history/${deviceId}?metric=cpu_load&hours=${timeRange}`);
+        const response = await fetchWithAuth(`/api/monitoring/history/${deviceId}?metric=cpu_load&hours=${timeRange}&max_points=${CHART_MAX_POINTS}`);
         
         if (!response.ok) {
             throw new Error('Failed to load CPU metrics');
@@ -601,7 +604,7 @@ async function loadCpuMetrics(deviceId) {
 // Load Memory metrics
 async function loadMemoryMetrics(deviceId) {
     try {
-        const response = await fetchWithAuth(`/api/monitoring/history/${deviceId}?metric=memory_usage&hours=${timeRange}`);
+        const response = await fetchWithAuth(`/api/monitoring/history/${deviceId}?metric=memory_usage&hours=${timeRange}&max_points=${CHART_MAX_POINTS}`);
         
         if (!response.ok) {
             throw new Error('Failed to load Memory metrics');
@@ -664,7 +667,7 @@ async function loadMemoryMetrics(deviceId) {
 // Load Disk metrics
 async function loadDiskMetrics(deviceId) {
     try {
-        const response = await fetchWithAuth(`/api/monitoring/history/${deviceId}?metric=disk_usage&hours=${timeRange}`);
+        const response = await fetchWithAuth(`/api/monitoring/history/${deviceId}?metric=disk_usage&hours=${timeRange}&max_points=${CHART_MAX_POINTS}`);
         
         if (!response.ok) {
             throw new Error('Failed to load Disk metrics');
@@ -6,6 +6,12 @@
 // WebSocket connection
 let socket = null;
 
+// Devices this page receives live updates for (re-sent after reconnects)
+const subscribedDevices = new Set();
+
+// Live tables, keyed "deviceId:table" -> {seq, sections: {section: {rowKey: row}}, meta}
+const liveTables = new Map();
+
 // Setup WebSocket connection
 function setupWebSocket() {
     // Check if WebSocket is already connected
@@ -51,7 +57,12 @@ function setupWebSocket() {
                     socket.send('2');
                     return;
                 } else if (data === '40') {
-                    // Socket.IO connection established
+                    // Socket.IO connection established, restore subscriptions
+                    subscribedDevices.forEach(deviceId => emitSocketEvent('subscribe', { device_id: deviceId }));
+                    liveTables.forEach((state, key) => {
+                        state.seq = 0;
+                        emitSocketEvent('subscribe', { device_id: state.device_id, table: state.table });
+                    });
                     return;
                 } else if (data === '41') {
                     // Socket.IO disconnection
@@ -73,6 +84,12 @@ function setupWebSocket() {
                         if (eventName === 'device_update') {
                             // Device update event
                             handleDeviceUpdateEvent(eventData);
+                        } else if (eventName === 'table_snapshot') {
+                            handleTableSnapshotEvent(eventData);
+                        } else if (eventName === 'table_delta') {
+                            handleTableDeltaEvent(eventData);
+                        } else if (eventName === 'client_events') {
+                            handleClientEvents(eventData);
                         } else if (eventName === 'alert') {
                             // Alert event
                             handleAlertEvent(eventData);
@@ -131,6 +148,99 @@ function handleDeviceUpdateEvent(data) {
     }
 }
 
+// Field the rows of each live table section are keyed by
+const LIVE_TABLE_KEYS = {
+    interfaces: 'name',
+    wireless_clients: 'mac_address',
+    dhcp_clients: 'mac_address',
+    capsman_clients: 'mac_address'
+};
+
+// Replace a live table with a full snapshot
+function handleTableSnapshotEvent(data) {
+    const key = `${data.device_id}:${data.table}`;
+    const state = liveTables.get(key);
+    if (!state) {
+        return;
+    }
+    
+    state.seq = data.seq;
+    state.meta = data.meta || {};
+    state.sections = {};
+    Object.entries(data.sections || {}).forEach(([section, rows]) => {
+        const rowKey = LIVE_TABLE_KEYS[section];
+        state.sections[section] = {};
+        rows.forEach(row => { state.sections[section][row[rowKey]] = row; });
+    });
+    notifyTableUpdate(state, data.timestamp);
+}
+
+// Apply changed rows and fields; ask for a snapshot when a delta was missed
+function handleTableDeltaEvent(data) {
+    const key = `${data.device_id}:${data.table}`;
+    const state = liveTables.get(key);
+    if (!state) {
+        return;
+    }
+    
+    if (state.seq !== data.base_seq) {
+        state.seq = 0;
+        emitSocketEvent('resync', { device_id: data.device_id, table: data.table });
+        return;
+    }
+    
+    Object.entries(data.sections || {}).forEach(([section, change]) => {
+        const rows = state.sections[section] || (state.sections[section] = {});
+        Object.entries(change.upsert || {}).forEach(([rowKey, fields]) => {
+            rows[rowKey] = Object.assign(rows[rowKey] || {}, fields);
+        });
+        Object.entries(change.drop_fields || {}).forEach(([rowKey, fields]) => {
+            fields.forEach(field => { if (rows[rowKey]) delete rows[rowKey][field]; });
+        });
+        (change.remove || []).forEach(rowKey => { delete rows[rowKey]; });
+    });
+    Object.assign(state.meta, data.meta || {});
+    (data.meta_removed || []).forEach(field => { delete state.meta[field]; });
+    state.seq = data.seq;
+    notifyTableUpdate(state, data.timestamp);
+}
+
+// Pass the reassembled table to the page-specific handler
+function notifyTableUpdate(state, timestamp) {
+    if (typeof handleWebSocketMessage !== 'function') {
+        return;
+    }
+    
+    const sections = {};
+    Object.entries(state.sections).forEach(([section, rows]) => {
+        sections[section] = Object.values(rows);
+    });
+    handleWebSocketMessage({
+        data: JSON.stringify({
+            type: 'table_update',
+            device_id: state.device_id,
+            table: state.table,
+            timestamp: timestamp,
+            data: Object.assign({}, state.meta, sections)
+        })
+    });
+}
+
+// Pass client joins, leaves and changes to the page-specific handler
+function handleClientEvents(data) {
+    if (typeof handleWebSocketMessage !== 'function') {
+        return;
+    }
+    
+    handleWebSocketMessage({
+        data: JSON.stringify({
+            type: 'client_events',
+            device_id: data.device_id,
+            events: data.events || []
+        })
+    });
+}
+
 // Handle alert event
 function handleAlertEvent(data) {
     try {
@@ -202,12 +312,43 @@ function showAlertNotification(alert) {
     });
 }
 
-// Request device update via WebSocket
-function requestDeviceUpdate(deviceId) {
+// Emit a Socket.IO event over the raw WebSocket
+function emitSocketEvent(eventName, data) {
     if (socket && socket.readyState === WebSocket.OPEN) {
-        socket.send(JSON.stringify({
-            type: 'request_update',
-            device_id: deviceId
-        }));
+        socket.send('42' + JSON.stringify([eventName, data]));
+        return true;
+    }
+    return false;
+}
+
+// Receive live updates for a device; the server pushes each new sample once collected
+function subscribeDevice(deviceId) {
+    subscribedDevices.add(deviceId);
+    emitSocketEvent('subscribe', { device_id: deviceId });
+}
+
+// Stop receiving live updates for a device
+function unsubscribeDevice(deviceId) {
+    subscribedDevices.delete(deviceId);
+    emitSocketEvent('unsubscribe', { device_id: deviceId });
+}
+
+// Receive a live 'interfaces' or 'clients' table of a device as snapshot + deltas
+function subscribeTable(deviceId, table) {
+    const key = `${deviceId}:${table}`;
+    if (!liveTables.has(key)) {
+        liveTables.set(key, { device_id: deviceId, table: table, seq: 0, sections: {}, meta: {} });
     }
+    emitSocketEvent('subscribe', { device_id: deviceId, table: table });
+}
+
+// Stop receiving a live table
+function unsubscribeTable(deviceId, table) {
+    liveTables.delete(`${deviceId}:${table}`);
+    emitSocketEvent('unsubscribe', { device_id: deviceId, table: table });
+}
+
+// Request device update via WebSocket
+function requestDeviceUpdate(deviceId) {
+    subscribeDevice(deviceId);
 }
@@ -1,6 +1,7 @@
 import logging
 from app import app, scheduler
 from app.core.alerts import check_alerts
+from mik.app.core.metrics_store import latest_metrics
 from app.config import Config
 
 # Configure logger
@@ -34,7 +35,18 @@ def schedule_alert_checks():
     except Exception as e:
         logger.error(f"Error scheduling alert checks: {str(e)}")
 
+def evaluate_ingested_metrics(samples):
+    """Collector hook: evaluate alert rules as soon as a batch is ingested"""
+    with app.app_context():
+        try:
+            check_alerts(samples)
+        except Exception as e:
+            logger.error(f"Error evaluating alerts for ingested metrics: {str(e)}")
+
 def initialize_alert_tasks():
     """Initialize all alert-related tasks"""
-    # Schedule alert checks
+    # Evaluate rules straight from the collector's ingestion path
+    latest_metrics.add_listener(evaluate_ingested_metrics)
+    
+    # Periodic checks only pick up samples the hook has not evaluated
     schedule_alert_checks()
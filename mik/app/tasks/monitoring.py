@@ -1,38 +1,232 @@
 import logging
+import time
+import concurrent.futures
 from datetime import datetime, timedelta
 from app import app, scheduler, db
-from app.database.crud import get_all_devices, save_device_metrics, get_setting
-from app.core.mikrotik import get_device_metrics
+from app.database.crud import (
+    get_all_devices,
+    save_metrics_batch,
+    save_interface_samples_batch,
+    get_setting,
+    delete_old_metric_rollups,
+    backfill_metric_rollups,
+    delete_old_interface_samples,
+    save_client_events,
+    delete_old_client_events,
+    delete_old_network_scans,
+    save_topology_links,
+    record_topology_error,
+    get_topology_states
+)
+from app.core.mikrotik import get_device_metrics, get_interface_traffic, get_device_clients
+# The pool is a module singleton; import it the way the code acquiring sessions does
+from mik.app.core.connection_pool import get_connection_pool
+from mik.app.core.metrics_store import latest_metrics
+from app.core.live_updates import live_updates
+from app.core.client_tracker import client_tracker
+from app.core.discovery import collect_device_links, address_index
+from mik.app.core.topology import topology_graph, topology_refresher, link_signature
 from app.config import Config
 from app.database.models import Metric
 
 # Configure logger
 logger = logging.getLogger(__name__)
 
+def _poll_device(device):
+    """Poll a single device, returning (metrics, interface traffic) or None on failure"""
+    try:
+        metrics = get_device_metrics(device)
+        traffic = None
+        if metrics.get('online', False) and Config.INTERFACE_TRAFFIC_COLLECTION:
+            traffic = get_interface_traffic(device, include_types=Config.INTERFACE_TRAFFIC_TYPES)
+            if traffic.get('online', False):
+                metrics['interface_traffic'] = peak_interface_traffic(traffic)
+            else:
+                traffic = None
+        return metrics, traffic
+    except Exception as e:
+        logger.error(f"Error collecting metrics for device {device.name}: {str(e)}")
+        return None
+
+def peak_interface_traffic(traffic):
+    """Busiest interface direction in Mbps, the value of the interface_traffic alert metric"""
+    rates = [
+        max(iface.get('rx_rate_bps', 0), iface.get('tx_rate_bps', 0))
+        for iface in traffic.get('interfaces', []) if iface.get('rates_available', False)
+    ]
+    return round(max(rates) / 1000000, 3) if rates else None
+
 def collect_metrics():
-    """Collect metrics from all devices"""
+    """Collect metrics from all devices concurrently
+    
+    Devices are polled on a bounded thread pool so a cycle takes roughly as
+    long as the slowest device. Devices that have not answered by the cycle
+    deadline are skipped, and all results are written in one batch.
+    """
     with app.app_context():
         try:
             logger.debug("Starting metrics collection task")
+            cycle_start = time.monotonic()
             devices = get_all_devices()
+            if not devices:
+                return
+            
+            max_workers = max(1, min(Config.MONITORING_MAX_WORKERS, len(devices)))
+            deadline = Config.MONITORING_CYCLE_DEADLINE
+            
+            executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=max_workers,
+                thread_name_prefix='collector'
+            )
+            try:
+                futures = {executor.submit(_poll_device, device): device for device in devices}
+                done, not_done = concurrent.futures.wait(futures, timeout=deadline)
+            finally:
+                # Don't let hung devices hold up the cycle; queued polls are dropped
+                executor.shutdown(wait=False, cancel_futures=True)
+            
+            for future in not_done:
+                logger.warning(f"Device {futures[future].name} did not respond within the {deadline}s cycle deadline")
+            
+            batch = []
+            traffic_batch = []
+            samples = []
+            for future in done:
+                device = futures[future]
+                metrics, traffic = future.result() or ({"online": False, "error": "Failed to retrieve device metrics"}, None)
+                samples.append((device.id, metrics))
+                if metrics.get('online', False):
+                    batch.append((device.id, metrics))
+                else:
+                    logger.warning(f"Device {device.name} is offline, skipping metrics collection")
+                if traffic:
+                    traffic_batch.append((device.id, traffic))
+            
+            # Save all metrics to database at once
+            timestamp = datetime.utcnow()
+            saved = save_metrics_batch(batch, timestamp=timestamp) if batch else 0
+            saved_interfaces = save_interface_samples_batch(traffic_batch, timestamp=timestamp) if traffic_batch else 0
             
-            for device in devices:
-                try:
-                    # Get metrics from device
-                    metrics = get_device_metrics(device)
-                    
-                    # Save metrics to database
-                    if metrics.get('online', False):
-                        save_device_metrics(device.id, metrics)
-                    else:
-                        logger.warning(f"Device {device.name} is offline, skipping metrics collection")
-                except Exception as e:
-                    logger.error(f"Error collecting metrics for device {device.name}: {str(e)}")
-            
-            logger.debug("Metrics collection task completed")
+            # Publish the samples to in-process consumers (alert evaluation etc.)
+            latest_metrics.update_many(samples)
+            
+            cycle_time = time.monotonic() - cycle_start
+            logger.debug(f"Metrics collection task completed: {len(batch)}/{len(devices)} devices, "
+                         f"{saved} metrics and {saved_interfaces} interface samples saved in {cycle_time:.2f}s")
         except Exception as e:
             logger.error(f"Error in metrics collection task: {str(e)}")
 
+# Pollers of the live tables pushed to Socket.IO subscribers
+LIVE_TABLE_POLLERS = {
+    'interfaces': get_interface_traffic,
+    'clients': get_device_clients
+}
+
+def _poll_live_table(device, table):
+    """Poll one live table and publish it; returns the client events it produced"""
+    try:
+        result = LIVE_TABLE_POLLERS[table](device)
+        live_updates.publish_table(device.id, table, result)
+        if table == 'clients':
+            # A fresh client table is as good as a tracking poll
+            return client_tracker.observe(device.id, result)
+    except Exception as e:
+        logger.error(f"Error polling {table} table of device {device.name}: {str(e)}")
+    return []
+
+def publish_live_tables():
+    """Poll the interface and client tables somebody is watching and push deltas
+    
+    Each watched table is polled once per cycle however many clients view it.
+    """
+    watched = live_updates.watched_tables()
+    if not watched:
+        return
+    
+    with app.app_context():
+        try:
+            devices = {device.id: device for device in get_all_devices()}
+            jobs = [(devices[device_id], table) for device_id, table in watched if device_id in devices]
+            if not jobs:
+                return
+            
+            max_workers = max(1, min(Config.MONITORING_MAX_WORKERS, len(jobs)))
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+                                                       thread_name_prefix='live-tables') as executor:
+                futures = [executor.submit(_poll_live_table, device, table) for device, table in jobs]
+            
+            events = [event for future in futures for event in future.result()]
+            if events:
+                save_client_events(events)
+        except Exception as e:
+            logger.error(f"Error in live table task: {str(e)}")
+
+def track_clients():
+    """Poll the client tables of all devices and store who joined, left or changed
+    
+    Only the changes are saved and pushed to live views, never full snapshots.
+    """
+    with app.app_context():
+        try:
+            devices = get_all_devices()
+            if not devices:
+                return
+            
+            max_workers = max(1, min(Config.MONITORING_MAX_WORKERS, len(devices)))
+            timestamp = datetime.utcnow()
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+                                                       thread_name_prefix='client-tracker') as executor:
+                results = list(executor.map(get_device_clients, devices))
+            
+            events = []
+            for device, result in zip(devices, results):
+                events.extend(client_tracker.observe(device.id, result, timestamp=timestamp))
+            
+            saved = save_client_events(events) if events else 0
+            logger.debug(f"Client tracking task completed: {saved} client events saved")
+        except Exception as e:
+            logger.error(f"Error in client tracking task: {str(e)}")
+
+def refresh_topology():
+    """Refresh the links of the devices whose topology refresh is due
+    
+    Each device is on its own schedule (see TopologyRefresher), so a check
+    only reads the few routers that are due. Links are stored only when
+    they changed; readers pick them up through TopologyGraph.sync().
+    """
+    with app.app_context():
+        try:
+            devices = get_all_devices()
+            states = {state.device_id: state for state in get_topology_states()}
+            due = topology_refresher.due(devices, states)
+            if not due:
+                return
+            
+            ip_to_id = {device.ip_address: device.id for device in devices}
+            index = address_index(ip_to_id)
+            max_workers = max(1, min(Config.TOPOLOGY_MAX_WORKERS, len(due)))
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+                                                       thread_name_prefix='topology') as executor:
+                results = list(executor.map(lambda device: collect_device_links(device, ip_to_id, index), due))
+            
+            changed = 0
+            for device, links in zip(due, results):
+                if links is None:
+                    record_topology_error(device.id, "Failed to read ARP and routing tables")
+                    topology_refresher.done(device.id, ok=False)
+                    continue
+                
+                links = list(links.values())
+                saved = save_topology_links(device.id, links, link_signature(links))
+                topology_refresher.done(device.id, ok=saved is not None)
+                changed += bool(saved)
+            
+            if changed:
+                topology_graph.sync(force=True)
+            logger.debug(f"Topology refresh completed: {len(due)} devices refreshed, {changed} changed")
+        except Exception as e:
+            logger.error(f"Error in topology refresh task: {str(e)}")
+
 def schedule_metrics_collection():
     """Schedule periodic metrics collection"""
     try:
@@ -64,10 +258,42 @@ def clear_old_metrics():
             db.session.commit()
             
             logger.info(f"Cleared {deleted} old metrics records older than {retention_days} days")
+            
+            deleted_interfaces = delete_old_interface_samples(cutoff_date)
+            logger.info(f"Cleared {deleted_interfaces} old interface traffic samples")
+            
+            deleted_events = delete_old_client_events(cutoff_date)
+            logger.info(f"Cleared {deleted_events} old client events")
+            
+            deleted_scans = delete_old_network_scans(cutoff_date)
+            logger.info(f"Cleared {deleted_scans} old network scans")
+            
+            # Rollups have their own, longer retention per resolution
+            deleted_rollups = delete_old_metric_rollups()
+            logger.info(f"Cleared {deleted_rollups} expired metric rollup buckets")
         except Exception as e:
             logger.error(f"Error clearing old metrics: {str(e)}")
             db.session.rollback()
 
+def backfill_rollups():
+    """Build the rollups of raw metrics stored before rollups were maintained"""
+    with app.app_context():
+        try:
+            covered = backfill_metric_rollups()
+            if covered:
+                logger.info(f"Backfilled metric rollups for {covered} raw metric IDs")
+        except Exception as e:
+            logger.error(f"Error backfilling metric rollups: {str(e)}")
+
+def close_idle_connections():
+    """Close pooled RouterOS sessions that exceeded the idle timeout"""
+    try:
+        closed = get_connection_pool().close_idle()
+        if closed:
+            logger.debug(f"Closed {closed} idle RouterOS connections")
+    except Exception as e:
+        logger.error(f"Error closing idle connections: {str(e)}")
+
 def initialize_monitoring_tasks():
     """Initialize all monitoring tasks"""
     # Schedule metrics collection
@@ -83,4 +309,59 @@ def initialize_monitoring_tasks():
         replace_existing=True
     )
     
+    # Resume a planned rollup backfill now, and retry hourly if it stopped
+    scheduler.add_job(
+        func=backfill_rollups,
+        trigger='interval',
+        hours=1,
+        next_run_time=datetime.now(),
+        id='backfill_metric_rollups',
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True
+    )
+    
+    # Evict idle pooled connections even when nothing is polling
+    scheduler.add_job(
+        func=close_idle_connections,
+        trigger='interval',
+        seconds=Config.MIKROTIK_POOL_IDLE_TIMEOUT,
+        id='close_idle_connections',
+        replace_existing=True
+    )
+    
+    # Refresh the live interface and client tables of watched devices
+    scheduler.add_job(
+        func=publish_live_tables,
+        trigger='interval',
+        seconds=Config.LIVE_TABLE_INTERVAL,
+        id='publish_live_tables',
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True
+    )
+    
+    # Keep the topology graph up to date, one device at a time
+    scheduler.add_job(
+        func=refresh_topology,
+        trigger='interval',
+        seconds=Config.TOPOLOGY_CHECK_INTERVAL,
+        id='refresh_topology',
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True
+    )
+    
+    # Record client joins, leaves and roaming
+    if Config.CLIENT_TRACKING:
+        scheduler.add_job(
+            func=track_clients,
+            trigger='interval',
+            seconds=Config.CLIENT_TRACKING_INTERVAL,
+            id='track_clients',
+            max_instances=1,
+            coalesce=True,
+            replace_existing=True
+        )
+    
     logger.info("Monitoring tasks initialized")
@@ -0,0 +1,44 @@
+_MISSING = object()
+
+def index_rows(rows, key):
+    """Index a list of row dictionaries by one of their fields
+
+    Rows without a value for the key are dropped, and later rows win on
+    duplicate keys.
+    """
+    return {row.get(key): row for row in rows if row.get(key)}
+
+def diff_fields(old, new):
+    """Fields of `new` that are missing from or different in `old`"""
+    return {field: value for field, value in new.items() if old.get(field, _MISSING) != value}
+
+def diff_rows(old, new):
+    """Compare two indexed tables
+
+    Args:
+        old (dict): key -> row of the previous table
+        new (dict): key -> row of the current table
+
+    Returns:
+        tuple: (upserts, removed, dropped). upserts maps each added key to
+        its full row and each changed key to just the changed fields;
+        removed lists keys that are gone; dropped maps changed keys to the
+        fields their row no longer has. Applying all three to the old table
+        yields the new one.
+    """
+    upserts = {}
+    dropped = {}
+    for key, row in new.items():
+        previous = old.get(key)
+        if previous is None:
+            upserts[key] = row
+        elif previous != row:
+            fields = diff_fields(previous, row)
+            if fields:
+                upserts[key] = fields
+            missing = [field for field in previous if field not in row]
+            if missing:
+                dropped[key] = missing
+
+    removed = [key for key in old if key not in new]
+    return upserts, removed, dropped
@@ -80,3 +80,16 @@ def parse_mac_address(mac):
     
     # Format as XX:XX:XX:XX:XX:XX
     return ':'.join(mac[i:i+2] for i in range(0, 12, 2)).upper()
+
+# IEEE OUIs (first three octets) registered to MikroTik (Routerboard.com)
+MIKROTIK_OUIS = frozenset({
+    '00:0C:42', '08:55:31', '18:FD:74', '2C:C8:1B', '48:8F:5A',
+    '48:A9:8A', '4C:5E:0C', '64:D1:54', '6C:3B:6B', '74:4D:28', '78:9A:18',
+    'B8:69:F4', 'C4:AD:34', 'CC:2D:E0', 'D4:01:C3', 'D4:CA:6D', 'DC:2C:6E',
+    'E4:8D:8C', 'F4:1E:57'
+})
+
+def is_mikrotik_mac(mac):
+    """Check whether a MAC address belongs to a MikroTik OUI"""
+    mac = parse_mac_address(mac)
+    return bool(mac) and mac[:8] in MIKROTIK_OUIS
@@ -1,62 +1,190 @@
 import logging
 import json
 from datetime import datetime, timedelta
-from mik.app.database.crud import get_metrics_for_device
+from mik.app.database.crud import (
+    get_metrics_for_device,
+    get_metric_rollups,
+    get_interface_samples,
+    get_interface_sample_buckets,
+    DEVICE_METRIC_FIELDS,
+    INTERFACE_SAMPLE_FIELDS
+)
 
 # Configure logger
 logger = logging.getLogger(__name__)
 
-def get_time_series_data(device_id, metric, start_time, end_time):
-    """Get time series data for a device metric"""
+def select_resolution(start_time, end_time, max_points=None):
+    """Pick the data resolution for a time range
+    
+    Raw samples are used while the range fits in max_points at the collection
+    interval, otherwise the finest rollup resolution that does.
+    
+    Returns:
+        int or None: Rollup bucket width in seconds, None for raw samples
+    """
+    from mik.app.config import Config
+    
+    if max_points is None:
+        max_points = Config.HISTORY_MAX_POINTS
+    
+    span = (end_time - start_time).total_seconds()
+    if span / Config.MONITORING_INTERVAL <= max_points:
+        return None
+    
+    for resolution in Config.ROLLUP_RESOLUTIONS:
+        if span / resolution <= max_points:
+            return resolution
+    return Config.ROLLUP_RESOLUTIONS[-1]
+
+def get_time_series_data(device_id, metric, start_time, end_time, resolution='auto',
+                         max_points=None, downsample='lttb'):
+    """Get time series data for a device metric
+    
+    Args:
+        device_id (int): Device ID
+        metric (str): Metric key, e.g. 'cpu_load'
+        start_time (datetime): Range start
+        end_time (datetime): Range end
+        resolution (int, str or None): Rollup bucket width in seconds, None for raw
+            samples, or 'auto' to pick one from the range
+        max_points (int, optional): Downsample the result to at most this many points
+        downsample (str): Downsampling method, 'lttb' or 'minmax'
+        
+    Returns:
+        Dictionary with chart-ready values
+    """
+    from mik.app.config import Config
+    
     try:
         # Parse metric into type and name
-        metric_type = None
-        metric_name = None
-        
-        if metric == 'cpu_load':
-            metric_type = 'cpu'
-            metric_name = 'load'
-        elif metric == 'memory_usage':
-            metric_type = 'memory'
-            metric_name = 'usage'
-        elif metric == 'disk_usage':
-            metric_type = 'disk'
-            metric_name = 'usage'
-        # Add more mappings as needed
-        
-        if not metric_type or not metric_name:
+        if metric not in DEVICE_METRIC_FIELDS:
             logger.error(f"Invalid metric: {metric}")
             return {"error": "Invalid metric"}
         
-        # Get metrics from database
-        metrics = get_metrics_for_device(
-            device_id=device_id,
-            metric_type=metric_type,
-            metric_name=metric_name,
-            start_time=start_time,
-            end_time=end_time,
-            limit=1000  # Set a reasonable limit
-        )
+        metric_type, metric_name = DEVICE_METRIC_FIELDS[metric]
+        
+        if resolution == 'auto':
+            resolution = select_resolution(start_time, end_time)
+        
+        values = []
+        if resolution is None:
+            # Get metrics from database
+            limit = Config.HISTORY_MAX_POINTS * 2
+            metrics = get_metrics_for_device(
+                device_id=device_id,
+                metric_type=metric_type,
+                metric_name=metric_name,
+                start_time=start_time,
+                end_time=end_time,
+                limit=limit
+            )
+            
+            if len(metrics) < limit:
+                for m in sorted(metrics, key=lambda x: x.timestamp):
+                    values.append({
+                        "timestamp": m.timestamp.isoformat(),
+                        "value": m.value
+                    })
+            else:
+                # More samples than expected, don't silently truncate the range
+                resolution = Config.ROLLUP_RESOLUTIONS[0]
+        
+        if resolution is not None:
+            for bucket in get_metric_rollups(device_id, metric_type, metric_name, resolution,
+                                             start_time=start_time, end_time=end_time):
+                values.append({
+                    "timestamp": bucket.bucket.isoformat(),
+                    "value": bucket.value_sum / bucket.sample_count if bucket.sample_count else None,
+                    "min": bucket.value_min,
+                    "max": bucket.value_max,
+                    "count": bucket.sample_count
+                })
+        
+        total_points = len(values)
+        if max_points:
+            values = downsample_time_series(values, max_points, downsample)
         
         # Format data for charts
-        data = {
+        return {
             "metric": metric,
             "device_id": device_id,
-            "data_points": len(metrics),
+            "resolution": resolution,
+            "data_points": len(values),
+            "total_points": total_points,
             "start_time": start_time.isoformat() if start_time else None,
             "end_time": end_time.isoformat() if end_time else None,
-            "values": []
+            "values": values
         }
+    except Exception as e:
+        logger.error(f"Error getting time series data: {str(e)}")
+        return {"error": str(e)}
+
+def get_interface_time_series(device_id, interface_name, field, start_time, end_time,
+                              max_points=None, downsample='lttb'):
+    """Get the time series of one interface traffic field
+    
+    Args:
+        device_id (int): Device ID
+        interface_name (str): Interface name
+        field (str): InterfaceSample column, e.g. 'rx_bps'
+        start_time (datetime): Range start
+        end_time (datetime): Range end
+        max_points (int, optional): Downsample the result to at most this many points
+        downsample (str): Downsampling method, 'lttb' or 'minmax'
+        
+    Returns:
+        Dictionary with chart-ready values
+    """
+    from mik.app.config import Config
+    
+    try:
+        if field not in INTERFACE_SAMPLE_FIELDS:
+            logger.error(f"Invalid interface field: {field}")
+            return {"error": "Invalid interface field"}
+        
+        # Raw samples while the range fits, otherwise buckets aggregated in the database
+        resolution = select_resolution(start_time, end_time)
+        values = []
+        if resolution is None:
+            limit = Config.HISTORY_MAX_POINTS * 2
+            samples = get_interface_samples(device_id, interface_name, start_time, end_time, limit=limit)
+            if len(samples) < limit:
+                values = [
+                    {"timestamp": sample.timestamp.isoformat(), "value": getattr(sample, field)}
+                    for sample in samples if getattr(sample, field) is not None
+                ]
+            else:
+                # More samples than expected, don't silently truncate the range
+                resolution = Config.ROLLUP_RESOLUTIONS[0]
         
-        for m in sorted(metrics, key=lambda x: x.timestamp):
-            data["values"].append({
-                "timestamp": m.timestamp.isoformat(),
-                "value": m.value
-            })
+        if resolution is not None:
+            for bucket in get_interface_sample_buckets(device_id, interface_name, field, resolution,
+                                                       start_time=start_time, end_time=end_time):
+                values.append({
+                    "timestamp": bucket.bucket.isoformat(),
+                    "value": bucket.avg,
+                    "min": bucket.min,
+                    "max": bucket.max,
+                    "count": bucket.count
+                })
         
-        return data
+        total_points = len(values)
+        if max_points:
+            values = downsample_time_series(values, max_points, downsample)
+        
+        return {
+            "metric": field,
+            "device_id": device_id,
+            "interface": interface_name,
+            "resolution": resolution,
+            "data_points": len(values),
+            "total_points": total_points,
+            "start_time": start_time.isoformat() if start_time else None,
+            "end_time": end_time.isoformat() if end_time else None,
+            "values": values
+        }
     except Exception as e:
-        logger.error(f"Error getting time series data: {str(e)}")
+        logger.error(f"Error getting interface time series: {str(e)}")
         return {"error": str(e)}
 
 def calculate_statistics(data_points):
@@ -82,48 +210,221 @@ def calculate_statistics(data_points):
         "last": data_points[-1]["value"]
     }
 
-def resample_time_series(data_points, interval_minutes=5):
-    """Resample time series data to a specified interval"""
+# Naive timestamps are treated as UTC, matching how metrics are stored
+EPOCH = datetime(1970, 1, 1)
+
+RESAMPLE_AGGREGATIONS = ('avg', 'min', 'max', 'last')
+
+def to_epoch(timestamp):
+    """Convert an ISO string, datetime or number to epoch seconds"""
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    if timestamp.tzinfo is not None:
+        return timestamp.timestamp()
+    return (timestamp - EPOCH).total_seconds()
+
+def from_epoch(seconds):
+    """Convert epoch seconds back to a naive UTC datetime"""
+    return EPOCH + timedelta(seconds=seconds)
+
+def resample_epochs(epochs, values, step, aggregation='avg', origin=None):
+    """Resample parallel epoch/value arrays into fixed-width buckets in one pass
+    
+    Args:
+        epochs (list): Sample times in epoch seconds, ascending
+        values (list): Sample values
+        step (float): Bucket width in seconds
+        aggregation (str): 'avg', 'min', 'max' or 'last'
+        origin (float, optional): Start of the first bucket. Defaults to the first sample.
+        
+    Returns:
+        tuple: (bucket start epochs, aggregated values), empty buckets omitted
+    """
+    if aggregation not in RESAMPLE_AGGREGATIONS:
+        raise ValueError(f"Invalid aggregation: {aggregation}")
+    if step <= 0:
+        raise ValueError("Resample step must be positive")
+    
+    bucket_epochs = []
+    bucket_values = []
+    if not epochs:
+        return bucket_epochs, bucket_values
+    
+    if origin is None:
+        origin = epochs[0]
+    
+    current = None
+    acc = None
+    count = 0
+    for epoch, value in zip(epochs, values):
+        index = int((epoch - origin) // step)
+        if index != current:
+            if current is not None:
+                bucket_epochs.append(origin + current * step)
+                bucket_values.append(acc / count if aggregation == 'avg' else acc)
+            current = index
+            acc = value
+            count = 1
+        else:
+            count += 1
+            if aggregation == 'avg':
+                acc += value
+            elif aggregation == 'min':
+                if value < acc:
+                    acc = value
+            elif aggregation == 'max':
+                if value > acc:
+                    acc = value
+            else:
+                acc = value
+    
+    bucket_epochs.append(origin + current * step)
+    bucket_values.append(acc / count if aggregation == 'avg' else acc)
+    
+    return bucket_epochs, bucket_values
+
+def resample_time_series(data_points, interval_minutes=5, aggregation='avg'):
+    """Resample time series data to a specified interval
+    
+    Timestamps are parsed once and bucketed in a single pass, so the cost is
+    linear in the number of points (plus a sort if the input is unordered).
+    Buckets start at the first point's timestamp; empty buckets are omitted.
+    
+    Args:
+        data_points (list): Dicts with "timestamp" (ISO string) and "value"
+        interval_minutes (int): Bucket width in minutes
+        aggregation (str): 'avg', 'min', 'max' or 'last'
+        
+    Returns:
+        List of {"timestamp", "value"} dicts, one per non-empty bucket
+    """
     if not data_points:
         return []
     
-    # Sort by timestamp
-    sorted_points = sorted(data_points, key=lambda x: x["timestamp"])
+    epochs = [to_epoch(p["timestamp"]) for p in data_points]
+    values = [p["value"] for p in data_points]
     
-    # Get time range
-    start_time = datetime.fromisoformat(sorted_points[0]["timestamp"])
-    end_time = datetime.fromisoformat(sorted_points[-1]["timestamp"])
+    # Only sort when needed; history queries already return ordered points
+    if any(epochs[i] > epochs[i + 1] for i in range(len(epochs) - 1)):
+        order = sorted(range(len(epochs)), key=epochs.__getitem__)
+        epochs = [epochs[i] for i in order]
+        values = [values[i] for i in order]
     
-    # Generate time intervals
-    intervals = []
-    current_time = start_time
+    bucket_epochs, bucket_values = resample_epochs(epochs, values, interval_minutes * 60, aggregation)
     
-    while current_time <= end_time:
-        intervals.append(current_time)
-        current_time += timedelta(minutes=interval_minutes)
+    return [
+        {"timestamp": from_epoch(epoch).isoformat(), "value": value}
+        for epoch, value in zip(bucket_epochs, bucket_values)
+    ]
+
+DOWNSAMPLE_METHODS = ('lttb', 'minmax')
+
+def lttb_indices(xs, ys, threshold):
+    """Largest-Triangle-Three-Buckets point selection
     
-    # Assign data points to intervals
-    result = []
+    Keeps the first and last points and, for each bucket in between, the
+    point forming the largest triangle with the previously kept point and the
+    average of the next bucket. Peaks and troughs survive because they
+    maximise that area.
     
-    for i in range(len(intervals) - 1):
-        interval_start = intervals[i]
-        interval_end = intervals[i + 1]
+    Args:
+        xs (list): X values (e.g. epoch seconds), ascending
+        ys (list): Y values
+        threshold (int): Number of points to keep
         
-        # Find points in this interval
-        interval_points = []
+    Returns:
+        List of indices of the kept points, ascending
+    """
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+    
+    indices = [0]
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0
+    
+    for i in range(threshold - 2):
+        # Average point of the next bucket
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        span = next_end - next_start
+        avg_x = sum(xs[next_start:next_end]) / span
+        avg_y = sum(ys[next_start:next_end]) / span
         
-        for point in sorted_points:
-            point_time = datetime.fromisoformat(point["timestamp"])
-            if interval_start <= point_time < interval_end:
-                interval_points.append(point)
+        # Point in the current bucket with the largest triangle area
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        ax, ay = xs[a], ys[a]
+        best_area = -1
+        best = start
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best = j
         
-        # Calculate average for interval
-        if interval_points:
-            avg_value = sum(p["value"] for p in interval_points) / len(interval_points)
-            
-            result.append({
-                "timestamp": interval_start.isoformat(),
-                "value": avg_value
-            })
+        indices.append(best)
+        a = best
+    
+    indices.append(n - 1)
+    return indices
+
+def minmax_indices(ys, threshold, lows=None):
+    """Keep the minimum and maximum point of each of threshold/2 buckets
+    
+    Args:
+        ys (list): Y values, the maximum is picked from these
+        threshold (int): Number of points to keep
+        lows (list, optional): Y values to pick the minimum from instead,
+            e.g. the bucket minimums of rollup points
+    """
+    n = len(ys)
+    if threshold >= n or threshold < 2:
+        return list(range(n))
+    if lows is None:
+        lows = ys
+    
+    buckets = threshold // 2
+    bucket_size = n / buckets
+    indices = []
+    for i in range(buckets):
+        start = int(i * bucket_size)
+        end = int((i + 1) * bucket_size)
+        if start >= end:
+            continue
+        low = min(range(start, end), key=lows.__getitem__)
+        high = max(range(start, end), key=ys.__getitem__)
+        indices.extend(sorted({low, high}))
+    return indices
+
+def downsample_time_series(data_points, max_points, method='lttb'):
+    """Reduce chart points to at most max_points while preserving their shape
+    
+    Args:
+        data_points (list): Dicts with "timestamp" and "value", ascending
+        max_points (int): Maximum number of points to return
+        method (str): 'lttb' (Largest-Triangle-Three-Buckets) or 'minmax'
+        
+    Returns:
+        List of the selected point dicts, unchanged
+    """
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"Invalid downsample method: {method}")
+    if not max_points or len(data_points) <= max_points:
+        return data_points
+    
+    ys = [p["value"] if p["value"] is not None else 0 for p in data_points]
+    
+    if method == 'lttb':
+        xs = [to_epoch(p["timestamp"]) for p in data_points]
+        indices = lttb_indices(xs, ys, max_points)
+    elif "max" in data_points[0]:
+        # Rollup points carry their bucket extremes; use them so spikes and troughs survive
+        indices = minmax_indices([p["max"] for p in data_points], max_points,
+                                 lows=[p["min"] for p in data_points])
+    else:
+        indices = minmax_indices(ys, max_points)
     
-    return result
+    return [data_points[i] for i in indices]
@@ -0,0 +1,88 @@
+"""Benchmark resample_time_series against the previous interval-scan implementation
+
+Usage:
+    python -m mik.benchmarks.resample --days 7 --interval 60 --bucket 5
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from mik.app.utils.time_series import resample_time_series
+
+def legacy_resample_time_series(data_points, interval_minutes=5):
+    """Previous implementation: rescans every point for every interval"""
+    if not data_points:
+        return []
+
+    sorted_points = sorted(data_points, key=lambda x: x["timestamp"])
+    start_time = datetime.fromisoformat(sorted_points[0]["timestamp"])
+    end_time = datetime.fromisoformat(sorted_points[-1]["timestamp"])
+
+    intervals = []
+    current_time = start_time
+    while current_time <= end_time:
+        intervals.append(current_time)
+        current_time += timedelta(minutes=interval_minutes)
+
+    result = []
+    for i in range(len(intervals) - 1):
+        interval_start = intervals[i]
+        interval_end = intervals[i + 1]
+        interval_points = []
+        for point in sorted_points:
+            point_time = datetime.fromisoformat(point["timestamp"])
+            if interval_start <= point_time < interval_end:
+                interval_points.append(point)
+        if interval_points:
+            avg_value = sum(p["value"] for p in interval_points) / len(interval_points)
+            result.append({"timestamp": interval_start.isoformat(), "value": avg_value})
+
+    return result
+
+def make_points(days, interval):
+    start = datetime(2024, 1, 1)
+    count = int(days * 86400 / interval)
+    return [
+        {"timestamp": (start + timedelta(seconds=i * interval)).isoformat(), "value": random.uniform(0, 100)}
+        for i in range(count)
+    ]
+
+def timed(func, *args, **kwargs):
+    begin = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, (time.perf_counter() - begin) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=float, default=7, help='Length of the series in days')
+    parser.add_argument('--interval', type=int, default=60, help='Seconds between samples')
+    parser.add_argument('--bucket', type=int, default=5, help='Resample bucket in minutes')
+    parser.add_argument('--skip-legacy', action='store_true', help='Only time the new implementation')
+    args = parser.parse_args()
+
+    points = make_points(args.days, args.interval)
+    print(f"{len(points):,} points, {args.bucket} minute buckets")
+
+    new_result, new_ms = timed(resample_time_series, points, args.bucket)
+    print(f"single pass:   {new_ms:10.1f} ms  ({len(new_result)} buckets)")
+
+    for aggregation in ('min', 'max', 'last'):
+        _, ms = timed(resample_time_series, points, args.bucket, aggregation)
+        print(f"  {aggregation:<4}         {ms:10.1f} ms")
+
+    if args.skip_legacy:
+        return
+
+    old_result, old_ms = timed(legacy_resample_time_series, points, args.bucket)
+    print(f"interval scan: {old_ms:10.1f} ms  ({len(old_result)} buckets)")
+    print(f"speedup:       {old_ms / new_ms:10.1f}x")
+
+    # The legacy version drops the trailing bucket; everything else must match
+    mismatches = sum(
+        1 for old, new in zip(old_result, new_result)
+        if old["timestamp"] != new["timestamp"] or abs(old["value"] - new["value"]) > 1e-9
+    )
+    print(f"mismatched buckets: {mismatches}")
+
+if __name__ == '__main__':
+    main()
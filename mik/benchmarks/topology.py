@@ -0,0 +1,127 @@
+"""Benchmark topology link merging on synthetic router meshes
+
+Builds a random mesh (a ring plus random chords) where every router sees
+its neighbors in its ARP table, and some only through a route, then times
+merge_links against the previous list-scanning merge of discover_topology.
+Also times choosing the gateway candidates that replace downloading the
+routing table.
+
+Usage:
+    python -m mik.benchmarks.topology --routers 1000 --degree 6
+"""
+import argparse
+import ipaddress
+import random
+import time
+from mik.app.core.discovery import merge_links, address_index, gateway_candidates
+
+def legacy_merge_links(device_links):
+    """Previous implementation: scans the whole topology for every link"""
+    topology = []
+    for links in device_links:
+        for link in links.values():
+            device_id, target_id = link['source_id'], link['target_id']
+            existing_link = False
+            if link['kind'] == 'arp':
+                for existing in topology:
+                    if existing['source_id'] == target_id and existing['target_id'] == device_id:
+                        existing_link = True
+                        existing['target_interface'] = link['source_interface']
+                        break
+            else:
+                for existing in topology:
+                    if (existing['source_id'] == device_id and existing['target_id'] == target_id) or \
+                       (existing['source_id'] == target_id and existing['target_id'] == device_id):
+                        existing_link = True
+                        break
+            if not existing_link:
+                topology.append({key: value for key, value in link.items() if key != 'kind'})
+    return topology
+
+def make_mesh(routers, degree, route_share, seed):
+    """Per-router links of a random mesh, plus every router's connected networks"""
+    rng = random.Random(seed)
+    neighbors = {router: set() for router in range(1, routers + 1)}
+    for router in range(1, routers + 1):
+        neighbors[router].add(router % routers + 1)
+        neighbors[router % routers + 1].add(router)
+    chords = routers * max(0, degree - 2) // 2
+    for _ in range(chords):
+        a, b = rng.sample(range(1, routers + 1), 2)
+        neighbors[a].add(b)
+        neighbors[b].add(a)
+
+    # One point-to-point /30 per pair; routers are monitored through the
+    # address of their first link, so route-only neighbors are candidates
+    ip_to_id = {}
+    device_links = []
+    networks = {}
+    subnet = ipaddress.ip_network('172.16.0.0/12').subnets(new_prefix=30)
+    pair_networks = {}
+    for router in range(1, routers + 1):
+        links = {}
+        networks[router] = []
+        for index, neighbor in enumerate(sorted(neighbors[router])):
+            pair = (min(router, neighbor), max(router, neighbor))
+            network = pair_networks.get(pair) or pair_networks.setdefault(pair, next(subnet))
+            hosts = list(network.hosts())
+            local, remote = (hosts[0], hosts[1]) if router < neighbor else (hosts[1], hosts[0])
+            networks[router].append((network, f"ether{index + 1}", str(local)))
+            ip_to_id.setdefault(str(local), router)
+            links[neighbor] = {
+                'source_id': router,
+                'target_id': neighbor,
+                'source_interface': f"ether{index + 1}",
+                'source_ip': str(local),
+                'target_ip': str(remote),
+                'kind': 'route' if rng.random() < route_share else 'arp'
+            }
+        device_links.append(links)
+    return device_links, networks, ip_to_id
+
+def timed(func, *args, **kwargs):
+    begin = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, (time.perf_counter() - begin) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--routers', type=int, default=1000, help='Number of routers in the mesh')
+    parser.add_argument('--degree', type=int, default=6, help='Average number of neighbors per router')
+    parser.add_argument('--route-share', type=float, default=0.2, help='Share of links only seen through a route')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--skip-legacy', action='store_true', help='Only time the new implementation')
+    args = parser.parse_args()
+
+    device_links, networks, ip_to_id = make_mesh(args.routers, args.degree, args.route_share, args.seed)
+    print(f"{args.routers:,} routers, {sum(len(links) for links in device_links):,} directed links")
+
+    new_result, new_ms = timed(merge_links, device_links)
+    print(f"edge set merge:  {new_ms:10.1f} ms  ({len(new_result):,} links)")
+
+    def all_candidates():
+        # As in refresh_topology: one index per refresh, ARP neighbors are not checked
+        index = address_index(ip_to_id)
+        return [gateway_candidates(router, networks[router], index,
+                                   {target for target, link in device_links[router - 1].items() if link['kind'] == 'arp'})
+                for router in networks]
+
+    candidates, candidates_ms = timed(all_candidates)
+    print(f"gateway candidates for all routers: {candidates_ms:10.1f} ms  "
+          f"({sum(len(found) for found in candidates):,} candidates)")
+
+    if args.skip_legacy:
+        return
+
+    old_result, old_ms = timed(legacy_merge_links, device_links)
+    print(f"list scan merge: {old_ms:10.1f} ms  ({len(old_result):,} links)")
+    print(f"speedup:         {old_ms / new_ms:10.1f}x")
+
+    def by_pair(topology):
+        return {(min(link['source_id'], link['target_id']), max(link['source_id'], link['target_id'])): link
+                for link in topology}
+    new_links = by_pair(new_result)
+    print(f"mismatched links: {sum(1 for pair, link in by_pair(old_result).items() if new_links.get(pair) != link)}")
+
+if __name__ == '__main__':
+    main()